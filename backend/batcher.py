@@ -0,0 +1,187 @@
+"""
+Dynamic micro-batching for single-row model inference
+
+Concurrent requests are queued and collected for up to `max_latency_ms` or
+`max_batch_size` rows, whichever comes first. The stacked batch is scored with
+one model call in a worker thread, and each result goes back to the waiting
+request's future. The event loop never runs sklearn itself.
+
+At most `max_queue` requests may wait; more are rejected with BatcherFull.
+A request that gets no result within `timeout` seconds raises
+asyncio.TimeoutError. Its row is dropped if its batch has not started yet.
+"""
+import asyncio
+import time
+from concurrent.futures import Executor
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class BatcherFull(RuntimeError):
+    """Too many requests are already waiting for a batch"""
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn: Callable[[List[Any]], List[Any]], max_batch_size: int = 64,
+                 max_latency_ms: float = 5.0, executor: Optional[Executor] = None,
+                 runner: Optional[Callable[..., Awaitable[Any]]] = None,
+                 max_queue: int = 0, timeout: float = 0.0):
+        """
+        predict_fn receives a list of payloads and must return one result per payload,
+        in the same order. It runs through `runner(predict_fn, payloads)` (e.g. OffloadLane.run,
+        whose exceptions are passed on to every request in the batch), or else in `executor`
+        (default thread pool). max_queue <= 0 and timeout <= 0 mean no limit.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        if max_latency_ms < 0:
+            raise ValueError("max_latency_ms must be >= 0")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_latency_ms = max_latency_ms
+        self.executor = executor
+        self.runner = runner
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker_task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.total_batches = 0
+        self.total_rows = 0
+        self.max_batch_seen = 0
+        self.last_batch_size = 0
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+        self.total_inference_time = 0.0
+        self.batch_size_histogram: Dict[str, int] = {}
+        self.rejected = 0
+        self.timeouts = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self.worker_task is not None and not self.worker_task.done()
+
+    async def start(self):
+        """Start the background collector on the running event loop"""
+        if self.is_running:
+            return
+        self.queue = asyncio.Queue(maxsize=max(0, self.max_queue))
+        self.worker_task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the collector and fail any requests still waiting"""
+        if self.worker_task is not None:
+            self.worker_task.cancel()
+            try:
+                await self.worker_task
+            except asyncio.CancelledError:
+                pass
+            self.worker_task = None
+        while self.queue is not None and not self.queue.empty():
+            _, future, _ = self.queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batcher stopped"))
+
+    async def submit(self, payload: Any) -> Any:
+        """Queue one payload and wait for its result"""
+        if not self.is_running:
+            raise RuntimeError("Batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((payload, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise BatcherFull(f"{self.max_queue} requests already waiting")
+        try:
+            # wait_for cancels the future on timeout, so the collector skips it
+            return await asyncio.wait_for(future, self.timeout if self.timeout > 0 else None)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    async def _collect(self) -> List:
+        """Block for the first item, then gather more until the batch is full or the deadline passes"""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_latency_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued without yielding
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Drop requests whose clients have already gone away
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+
+            dispatched = time.perf_counter()
+            self._record_batch(batch, dispatched)
+            payloads = [payload for payload, _, _ in batch]
+            try:
+                if self.runner is not None:
+                    results = await self.runner(self.predict_fn, payloads)
+                else:
+                    results = await loop.run_in_executor(self.executor, self.predict_fn, payloads)
+                if len(results) != len(batch):
+                    raise RuntimeError(f"predict_fn returned {len(results)} results for {len(batch)} inputs")
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self.total_inference_time += time.perf_counter() - dispatched
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _record_batch(self, batch: List, dispatched: float):
+        size = len(batch)
+        self.total_batches += 1
+        self.total_rows += size
+        self.last_batch_size = size
+        self.max_batch_seen = max(self.max_batch_seen, size)
+        # Power-of-two buckets: "1", "2-3", "4-7", ...
+        low = 1 << (size.bit_length() - 1)
+        bucket = str(low) if low == 1 else f"{low}-{2 * low - 1}"
+        self.batch_size_histogram[bucket] = self.batch_size_histogram.get(bucket, 0) + 1
+        for _, _, enqueued in batch:
+            wait = dispatched - enqueued
+            self.total_queue_wait += wait
+            self.max_queue_wait = max(self.max_queue_wait, wait)
+
+    def metrics(self) -> Dict:
+        """Snapshot of batch-size and queue-wait statistics"""
+        return {
+            "running": self.is_running,
+            "max_batch_size": self.max_batch_size,
+            "max_latency_ms": self.max_latency_ms,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "max_queue": self.max_queue,
+            "timeout_s": self.timeout,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "batches": self.total_batches,
+            "rows": self.total_rows,
+            "avg_batch_size": round(self.total_rows / self.total_batches, 2) if self.total_batches else 0.0,
+            "max_batch_seen": self.max_batch_seen,
+            "last_batch_size": self.last_batch_size,
+            "batch_size_histogram": dict(self.batch_size_histogram),
+            "avg_queue_wait_ms": round(1000.0 * self.total_queue_wait / self.total_rows, 3) if self.total_rows else 0.0,
+            "max_queue_wait_ms": round(1000.0 * self.max_queue_wait, 3),
+            "avg_inference_ms": round(1000.0 * self.total_inference_time / self.total_batches, 3) if self.total_batches else 0.0,
+        }
@@ -0,0 +1,139 @@
+"""
+Sensor and graph control shared by several API worker processes
+
+With `run_server.py --workers N` every worker serves predictions, but the
+synthetic sensor and the live graph must exist once. They are owned by a
+coordinator process. Workers send it their sensor/graph commands over a
+localhost socket, so every worker reports the same status. Readings still
+reach the workers through the shared memory-mapped sensor store.
+
+The protocol is one JSON object per line. A request is
+{"token": ..., "command": ..., "args": {...}}. The reply is
+{"ok": true, "content": ...}, or
+{"ok": false, "status_code": ..., "detail": ...} for an HTTPException.
+Bytes (graph frames) are sent base64-encoded. The token keeps other local
+processes from driving the sensor.
+"""
+import asyncio
+import base64
+import hmac
+import json
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024  # a graph frame is ~100 KB; this only guards against garbage
+
+
+def _encode(obj: Any) -> bytes:
+    def default(value):
+        if isinstance(value, (bytes, bytearray)):
+            return {"__bytes__": base64.b64encode(value).decode('ascii')}
+        raise TypeError(f"Cannot send {type(value).__name__} to the coordinator")
+    return json.dumps(obj, default=default).encode() + b"\n"
+
+
+def _decode(line: bytes) -> Any:
+    def object_hook(obj):
+        if len(obj) == 1 and "__bytes__" in obj:
+            return base64.b64decode(obj["__bytes__"])
+        return obj
+    return json.loads(line, object_hook=object_hook)
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+class CoordinatorServer:
+    def __init__(self, handlers: Dict[str, Callable[..., Awaitable[Any]]], host: str, port: int, token: str):
+        """handlers maps each command name to an async function called with the request's args"""
+        self.handlers = handlers
+        self.host = host
+        self.port = port
+        self.token = token
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.commands = 0
+        self.rejected = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_MESSAGE_BYTES)
+        print(f"✅ Coordinator listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = _decode(await reader.readline())
+            reply = await self._dispatch(request)
+        except Exception as e:
+            reply = {"ok": False, "status_code": 400, "detail": f"Bad coordinator request: {e}"}
+        try:
+            writer.write(_encode(reply))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request: Dict) -> Dict:
+        if not hmac.compare_digest(str(request.get("token", "")), self.token):
+            self.rejected += 1
+            return {"ok": False, "status_code": 403, "detail": "Invalid coordinator token"}
+        handler = self.handlers.get(request.get("command"))
+        if handler is None:
+            return {"ok": False, "status_code": 400, "detail": f"Unknown command: {request.get('command')}"}
+        self.commands += 1
+        try:
+            return {"ok": True, "content": await handler(**request.get("args", {}))}
+        except HTTPException as e:
+            return {"ok": False, "status_code": e.status_code, "detail": e.detail}
+        except Exception as e:
+            return {"ok": False, "status_code": 500, "detail": f"{type(e).__name__}: {e}"}
+
+
+class CoordinatorClient:
+    def __init__(self, address: str, token: str, timeout: float = 10.0,
+                 command_timeouts: Optional[Dict[str, Optional[float]]] = None):
+        """
+        timeout covers connecting and the whole command. command_timeouts overrides it per command
+        (starting the sensor can load its model); None waits for the coordinator's reply indefinitely.
+        """
+        self.address = address
+        self.host, self.port = parse_address(address)
+        self.token = token
+        self.timeout = timeout
+        self.command_timeouts = dict(command_timeouts or {})
+        self.errors = 0
+
+    async def call(self, command: str, **args) -> Any:
+        """Run `command` in the coordinator. Raises the coordinator's HTTPException, or 503 if it is unreachable"""
+        try:
+            reply = await asyncio.wait_for(self._round_trip(command, args),
+                                           self.command_timeouts.get(command, self.timeout))
+        except (OSError, asyncio.TimeoutError, ValueError) as e:
+            self.errors += 1
+            raise HTTPException(status_code=503, detail=f"Sensor coordinator at {self.address} not reachable: {e!r}")
+        if not reply.get("ok"):
+            raise HTTPException(status_code=reply.get("status_code", 500), detail=reply.get("detail"))
+        return reply.get("content")
+
+    async def _round_trip(self, command: str, args: Dict) -> Dict:
+        reader, writer = await asyncio.open_connection(self.host, self.port, limit=MAX_MESSAGE_BYTES)
+        try:
+            writer.write(_encode({"token": self.token, "command": command, "args": args}))
+            await writer.drain()
+            line = await reader.readline()
+            if not line:
+                raise ValueError("empty reply")
+            return _decode(line)
+        finally:
+            writer.close()
+
+    def stats(self) -> Dict:
+        return {"address": self.address, "errors": self.errors}
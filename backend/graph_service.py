@@ -0,0 +1,154 @@
+"""
+Live graph rendering inside the API process
+
+Replaces spawning run_live_graph.py as a subprocess and serving the PNG it
+writes to disk. The LiveGraphRenderer from extract/run_live_graph.py runs on
+a dedicated thread, driven by an asyncio task. Each frame is kept in memory
+with a content ETag and a Last-Modified time, so /api/graph/image can answer
+conditional requests with 304 and never serves a half-written file.
+"""
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class GraphService:
+    def __init__(self, store_path: Path, interval: float = 1.0, max_points: int = 50):
+        """interval is how often (seconds) the store is checked for new readings"""
+        self.store_path = store_path
+        self.interval = interval
+        self.max_points = max_points
+        # matplotlib is not thread-safe: every renderer call goes through this one thread
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="graph")
+        self.renderer = None
+        self.task: Optional[asyncio.Task] = None
+        self.refresh_lock: Optional[asyncio.Lock] = None
+
+        # Latest frame
+        self.png: Optional[bytes] = None
+        self.etag: Optional[str] = None
+        self.frame_time: Optional[float] = None
+        self.frame_seq = 0
+
+        # Metrics
+        self.frames_published = 0
+        self.not_modified = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        loop = asyncio.get_running_loop()
+        self.refresh_lock = asyncio.Lock()
+        self.renderer = await loop.run_in_executor(self.executor, self._create_renderer)
+        await self.refresh(force=True)
+        self.task = asyncio.create_task(self._run())
+
+    def _create_renderer(self):
+        # Imported here so matplotlib only loads when the graph is actually started
+        from run_live_graph import LiveGraphRenderer
+        return LiveGraphRenderer(self.store_path, max_points=self.max_points)
+
+    async def stop(self):
+        """Stop rendering; the last frame keeps being served"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.renderer is not None:
+            renderer, self.renderer = self.renderer, None
+            await asyncio.get_running_loop().run_in_executor(self.executor, renderer.close)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                print(f"⚠️  Graph render error: {e}")
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Render a new frame if new readings arrived (or `force`). Returns True if the frame changed"""
+        if self.renderer is None:
+            return False
+        async with self.refresh_lock:
+            renderer = self.renderer
+            loop = asyncio.get_running_loop()
+            if force:
+                await loop.run_in_executor(self.executor, self._force_render, renderer)
+                changed = True
+            else:
+                changed = await loop.run_in_executor(self.executor, renderer.update)
+            if changed:
+                self._publish(renderer)
+            return changed
+
+    @staticmethod
+    def _force_render(renderer):
+        renderer.poll()
+        renderer.render()
+
+    def _publish(self, renderer):
+        png = renderer.png
+        self.png = png
+        self.etag = '"' + hashlib.blake2b(png, digest_size=12).hexdigest() + '"'
+        self.frame_time = renderer.png_time or time.time()
+        self.frame_seq = renderer.last_seq
+        self.frames_published += 1
+
+    async def ensure_frame(self, seq: int):
+        """Render immediately if the client asks for a reading the current frame does not show yet"""
+        if self.running and seq > self.frame_seq:
+            await self.refresh()
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return formatdate(self.frame_time, usegmt=True) if self.frame_time else None
+
+    def is_not_modified(self, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+        """Conditional GET check: If-None-Match wins over If-Modified-Since (RFC 9110)"""
+        if self.png is None:
+            return False
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            matched = '*' in tags or self.etag in tags
+        elif if_modified_since is not None:
+            try:
+                matched = int(self.frame_time) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                matched = False
+        else:
+            matched = False
+        if matched:
+            self.not_modified += 1
+        return matched
+
+    def stats(self) -> Dict:
+        renderer = self.renderer
+        return {
+            "running": self.running,
+            "frames": self.frames_published,
+            "frame_seq": self.frame_seq,
+            "frame_bytes": len(self.png) if self.png else 0,
+            "not_modified": self.not_modified,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "render": renderer.stats() if renderer is not None else None,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
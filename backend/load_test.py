@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Load test for a running API: /health latency while predictions and sensor start/stop are in flight
+
+Threads poll /health and post random /api/predict requests. Random inputs
+miss the prediction cache. Meanwhile another thread starts and stops the
+sensors every --sensor-cycle seconds. The report gives latency percentiles
+per endpoint. For /health it also splits the latencies into those measured
+while a sensor command was in flight and all others, so a blocked event loop
+shows up as a p99 gap.
+
+Usage:
+    python load_test.py --url http://localhost:8000 --duration 20
+    python load_test.py --duration 30 --predict-concurrency 8 --json
+    python load_test.py --max-health-p99-ms 50         # exit 1 if /health p99 is over budget
+"""
+import argparse
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+FEATURE_RANGES = {
+    'Temp': (15, 35), 'DO': (1, 12), 'pH': (5.5, 9.5), 'Conductivity': (50, 3000),
+    'BOD': (0.5, 15), 'Nitrate': (0.1, 40), 'FecalColiform': (0, 5000), 'TotalColiform': (10, 20000)
+}
+
+
+class Client:
+    """One keep-alive connection per thread"""
+    def __init__(self, url: str, timeout: float = 30.0):
+        parsed = urlparse(url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.timeout = timeout
+        self.conn: Optional[http.client.HTTPConnection] = None
+
+    def request(self, method: str, path: str, body: Optional[Dict] = None) -> int:
+        payload = json.dumps(body) if body is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                response.read()
+                return response.status
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+        return 0
+
+
+def percentiles(latencies: List[float]) -> Dict:
+    if not latencies:
+        return {'count': 0}
+    values = sorted(latencies)
+    def pick(p):
+        return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 2)
+    return {'count': len(values), 'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99),
+            'max_ms': round(values[-1] * 1000, 2)}
+
+
+def run_load_test(url: str, duration: float, health_concurrency: int, predict_concurrency: int,
+                  sensor_cycle: float) -> Dict:
+    deadline = time.perf_counter() + duration
+    lock = threading.Lock()
+    samples: Dict[str, List[Tuple[float, float]]] = {'health': [], 'predict': []}  # (start, latency)
+    errors: Dict[str, int] = {'health': 0, 'predict': 0, 'sensors': 0}
+    sensor_windows: List[Tuple[float, float, str]] = []
+
+    def poll(kind: str, method: str, path: str, make_body):
+        client = Client(url)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = client.request(method, path, make_body())
+            except (http.client.HTTPException, OSError):
+                status = 0
+            latency = time.perf_counter() - start
+            with lock:
+                if status == 200:
+                    samples[kind].append((start, latency))
+                else:
+                    errors[kind] += 1
+
+    def random_reading():
+        return {feature: round(random.uniform(lo, hi), 3) for feature, (lo, hi) in FEATURE_RANGES.items()}
+
+    def toggle_sensors():
+        client = Client(url)
+        action = 'start'
+        while time.perf_counter() + sensor_cycle < deadline:
+            time.sleep(sensor_cycle)
+            start = time.perf_counter()
+            try:
+                status = client.request('POST', f'/api/sensors/{action}')
+            except (http.client.HTTPException, OSError):
+                status = 0
+            with lock:
+                sensor_windows.append((start, time.perf_counter(), action))
+                if status != 200:
+                    errors['sensors'] += 1
+            action = 'stop' if action == 'start' else 'start'
+        if action == 'stop':
+            client.request('POST', '/api/sensors/stop')  # leave the sensors as we found them
+
+    threads = [threading.Thread(target=poll, args=('health', 'GET', '/health', lambda: None))
+               for _ in range(health_concurrency)]
+    threads += [threading.Thread(target=poll, args=('predict', 'POST', '/api/predict', random_reading))
+                for _ in range(predict_concurrency)]
+    if sensor_cycle > 0:
+        threads.append(threading.Thread(target=toggle_sensors))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    def during_sensor_command(start: float, latency: float) -> bool:
+        return any(s < start + latency and start < e for s, e, _ in sensor_windows)
+
+    health_busy = [lat for start, lat in samples['health'] if during_sensor_command(start, lat)]
+    health_idle = [lat for start, lat in samples['health'] if not during_sensor_command(start, lat)]
+    return {
+        'duration_s': duration,
+        'health': percentiles([lat for _, lat in samples['health']]),
+        'health_during_sensor_commands': percentiles(health_busy),
+        'health_otherwise': percentiles(health_idle),
+        'predict': percentiles([lat for _, lat in samples['predict']]),
+        'sensor_commands': [{'action': action, 'ms': round((e - s) * 1000, 1)} for s, e, action in sensor_windows],
+        'errors': errors,
+    }
+
+
+def print_report(report: Dict):
+    print(f"Load test ({report['duration_s']:g}s):")
+    for name in ('health', 'health_during_sensor_commands', 'health_otherwise', 'predict'):
+        stats = report[name]
+        if not stats['count']:
+            print(f"  {name:<30} no samples")
+            continue
+        print(f"  {name:<30} n={stats['count']:<6} p50 {stats['p50_ms']:7.2f} ms  p95 {stats['p95_ms']:7.2f} ms  "
+              f"p99 {stats['p99_ms']:7.2f} ms  max {stats['max_ms']:7.2f} ms")
+    commands = ', '.join(f"{c['action']} {c['ms']:.0f} ms" for c in report['sensor_commands'])
+    print(f"  Sensor commands: {commands or 'none'}")
+    print(f"  Errors: {report['errors']}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Load test /health, /api/predict and sensor start/stop')
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds to run')
+    parser.add_argument('--health-concurrency', type=int, default=2, help='Threads polling /health')
+    parser.add_argument('--predict-concurrency', type=int, default=4, help='Threads posting /api/predict')
+    parser.add_argument('--sensor-cycle', type=float, default=4.0, help='Seconds between sensor start/stop (0 = never)')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    parser.add_argument('--max-health-p99-ms', type=float, default=None, help='Fail if /health p99 is above this')
+    args = parser.parse_args(argv)
+
+    report = run_load_test(args.url, args.duration, args.health_concurrency, args.predict_concurrency,
+                           args.sensor_cycle)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    p99 = report['health'].get('p99_ms')
+    if args.max_health_p99_ms is not None and (p99 is None or p99 > args.max_health_p99_ms):
+        print(f"❌ /health p99 {p99} ms is over the {args.max_health_p99_ms:g} ms budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,36 @@
 """
 FastAPI backend for AWARE ML Model Prediction
+
+pandas, joblib/sklearn and the sensor modules are imported on first use, so
+importing this module stays cheap. With AWARE_STARTUP_MODE=background the
+model is loaded and warmed up after the server starts accepting connections;
+/health/live answers at once and /health/ready turns 200 when predictions can
+be served.
 """
-from fastapi import FastAPI, HTTPException
+import time
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
-import pandas as pd
-import joblib
+import asyncio
+import numpy as np
 import os
-import subprocess
 import threading
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Union
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+from batcher import BatcherFull, MicroBatcher
+from prediction_cache import PredictionCache, parse_quantization
+from graph_service import GraphService
+from model_registry import ModelRegistry
+from coordinator import CoordinatorClient, CoordinatorServer
+from offload import OffloadLane
+from sensor_stream import SensorBroadcaster
 
 # Initialize FastAPI app
 app = FastAPI(title="AWARE ML Prediction API", version="1.0.0")
@@ -25,60 +44,290 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load model on startup (for ML prediction API)
-ML_MODEL_PATH = Path(__file__).parent.parent / "extract" / "rf_water_model.joblib"
-model_data = None
-model = None
-imputer = None
-label_encoder = None
-features = None
-uses_pipeline = False
+# Model artifacts are loaded once by the registry and hot-swapped when their files change.
+# "joblib" (default) unpickles rf_*.joblib; "bundle" maps the rf_*.model/ directories that
+# extract/model_bundle.py converts them into (raw .npy arrays, no sklearn needed)
+MODEL_FORMAT = os.getenv("AWARE_MODEL_FORMAT", "joblib").lower()
+
+def model_path(stem: str) -> Path:
+    """The file the registry watches for artifact `stem` in the configured MODEL_FORMAT"""
+    extract_dir = Path(__file__).parent.parent / "extract"
+    if MODEL_FORMAT == "bundle":
+        # convert replaces manifest.json last, in one rename, so its fingerprint marks a new version
+        return extract_dir / f"{stem}.model" / "manifest.json"
+    return extract_dir / f"{stem}.joblib"
+
+def load_model_bundle(path: Path):
+    """Registry loader for model bundles: always memory-mapped"""
+    from model_bundle import is_stale, load_bundle
+    if is_stale(path):
+        print(f"⚠️  {path.parent.name} was converted from an older {path.parent.stem}.joblib; "
+              f"re-run `python model_bundle.py convert`")
+    return load_bundle(path, mmap_mode="r"), True
+
+def model_label(path: Path) -> str:
+    """What /health reports for a model: the bundle directory rather than its manifest.json"""
+    return path.parent.name if MODEL_FORMAT == "bundle" else path.name
+
+MODEL_LOADER = load_model_bundle if MODEL_FORMAT == "bundle" else None
+ML_MODEL_PATH = model_path("rf_water_model")
+MODEL_MMAP = os.getenv("AWARE_MODEL_MMAP", "0").lower() in ("1", "true", "yes")
+MODEL_WATCH_INTERVAL = float(os.getenv("AWARE_MODEL_WATCH_INTERVAL", "2"))
+model_registry = ModelRegistry(mmap_mode="r" if MODEL_MMAP else None, watch_interval=MODEL_WATCH_INTERVAL)
+
+# "eager": load and warm up the model before serving (default); "background": serve at once, warm up in a task
+STARTUP_MODE = os.getenv("AWARE_STARTUP_MODE", "eager").lower()
+
+# Use the sklearn-free evaluator when a fresh rf_water_model.forest.npz sidecar exists
+USE_COMPILED_FOREST = os.getenv("AWARE_COMPILED_FOREST", "1").lower() in ("1", "true", "yes")
+
+# Risk score assigned to each readable class; riskScore is the probability-weighted sum
+DEFAULT_SCORE_MAP = {'Low': 0.0, 'Medium': 50.0, 'High': 100.0}
+
+# Rule-based WHO/BIS risk (extract/risk_rules.py, the labels the model is trained on): served by
+# /api/predict/rules, and every model prediction is cross-checked against it
+RULES_AGG_METHOD = os.getenv("AWARE_RULES_AGG", "max")
+RULES_MIN_NON_MISSING = int(os.getenv("AWARE_RULES_MIN_NON_MISSING", "2"))
+RULES_CROSS_CHECK = os.getenv("AWARE_RULES_CROSS_CHECK", "1").lower() in ("1", "true", "yes")
+
+# Blocking work runs in bounded thread pools (see offload.py) so the event loop keeps serving other requests.
+# Inference gets its own threads; sensor start/stop run one at a time in a separate pool.
+PREDICT_THREADS = int(os.getenv("AWARE_PREDICT_THREADS", str(min(4, os.cpu_count() or 1))))
+predict_lane = OffloadLane(
+    "predict",
+    max_concurrency=PREDICT_THREADS,
+    timeout=float(os.getenv("AWARE_PREDICT_TIMEOUT", "10")),
+    max_waiting=int(os.getenv("AWARE_PREDICT_MAX_WAITING", "256"))
+)
+control_lane = OffloadLane(
+    "sensor_control",
+    max_concurrency=1,
+    timeout=float(os.getenv("AWARE_CONTROL_TIMEOUT", "30")),
+    max_waiting=8
+)
+
+# Optional dynamic batching of concurrent /api/predict calls (off by default)
+PREDICT_BATCHING = os.getenv("AWARE_PREDICT_BATCHING", "0").lower() in ("1", "true", "yes")
+BATCH_MAX_SIZE = int(os.getenv("AWARE_BATCH_MAX_SIZE", "64"))
+BATCH_MAX_LATENCY_MS = float(os.getenv("AWARE_BATCH_MAX_LATENCY_MS", "5"))
+prediction_batcher = None
+
+# Cache of /api/predict results keyed on (optionally quantized) inputs; size 0 disables it.
+# The registry clears it whenever a new model version is loaded.
+PREDICT_CACHE_SIZE = int(os.getenv("AWARE_PREDICT_CACHE_SIZE", "4096"))
+PREDICT_CACHE_TTL = float(os.getenv("AWARE_PREDICT_CACHE_TTL", "300"))
+PREDICT_CACHE_QUANTIZE = parse_quantization(os.getenv("AWARE_PREDICT_CACHE_QUANTIZE", ""))
+prediction_cache = PredictionCache(
+    max_entries=PREDICT_CACHE_SIZE,
+    ttl_seconds=PREDICT_CACHE_TTL,
+    quantization=PREDICT_CACHE_QUANTIZE
+) if PREDICT_CACHE_SIZE > 0 else None
+
+class WaterModel:
+    """Everything /api/predict needs from one version of rf_water_model.joblib"""
+    def __init__(self, model, imputer, label_encoder, features, uses_pipeline, readable_classes,
+                 class_scores, compiled_forest):
+        self.model = model
+        self.imputer = imputer
+        self.label_encoder = label_encoder
+        self.features = features
+        self.uses_pipeline = uses_pipeline
+        self.readable_classes = readable_classes
+        self.class_scores = class_scores
+        self.compiled_forest = compiled_forest
+
+def prepare_water_model(model_data, path: Path) -> WaterModel:
+    """Validate a loaded rf_water_model artifact and resolve what inference needs"""
+    if isinstance(model_data, dict):
+        # Newer artifact format (recommended)
+        if 'model' in model_data:
+            model = model_data['model']
+            imputer = model_data.get('imputer')
+            label_encoder = model_data.get('label_encoder')
+            features = model_data.get('features')
+            uses_pipeline = False
+        elif 'pipeline' in model_data:
+            # Backward compatibility for pipeline artifacts
+            model = model_data['pipeline']
+            imputer = None
+            label_encoder = model_data.get('label_encoder')
+            features = model_data.get('features')
+            uses_pipeline = True
+        else:
+            raise KeyError("Model artifact must contain either 'model' or 'pipeline'.")
+    else:
+        # Fallback: assume the entire object is a trained estimator/pipeline
+        model = model_data
+        imputer = None
+        label_encoder = getattr(model_data, 'label_encoder_', None)
+        features = getattr(model_data, 'feature_names_in_', None)
+        uses_pipeline = True
+
+    if label_encoder is None or features is None:
+        raise ValueError("Model artifact missing required keys: 'label_encoder' and/or 'features'.")
+
+    # Resolve class names and their scores once so inference is a single matrix product
+    if hasattr(model, 'classes_'):
+        try:
+            readable_classes = np.asarray(label_encoder.inverse_transform(model.classes_))
+        except Exception:
+            readable_classes = np.asarray([str(c) for c in model.classes_])
+    else:
+        readable_classes = np.asarray([str(c) for c in label_encoder.classes_])
+    class_scores = np.array([DEFAULT_SCORE_MAP.get(str(lbl), 50.0) for lbl in readable_classes])
+
+    # Only trust a sidecar exported from these exact artifact bytes (see extract/compiled_forest.py)
+    compiled_forest = None
+    if isinstance(model_data, dict) and 'manifest' in model_data:
+        # A model bundle's model is already the compiled forest
+        compiled_forest = model
+    elif USE_COMPILED_FOREST:
+        try:
+            from compiled_forest import load_if_fresh
+            compiled_forest = load_if_fresh(path)
+            if compiled_forest is not None and hasattr(model, 'classes_') and \
+                    not np.array_equal(compiled_forest.classes_, model.classes_):
+                print("⚠️  Compiled forest classes do not match the model. Ignoring it.")
+                compiled_forest = None
+        except Exception as e:
+            print(f"⚠️  Could not load compiled forest: {e}")
+            compiled_forest = None
+
+    return WaterModel(model, imputer, label_encoder, features, uses_pipeline, readable_classes,
+                      class_scores, compiled_forest)
+
+def water_model() -> Optional[WaterModel]:
+    """The current prediction model (take it once per request so a hot swap cannot change it mid-request)"""
+    loaded = model_registry.current("water")
+    return loaded.artifact if loaded is not None else None
+
+def on_water_model_loaded(loaded):
+    # Cached predictions from any previously loaded model are no longer valid
+    if prediction_cache is not None:
+        prediction_cache.set_version(loaded.version)
+    wm = loaded.artifact
+    print(f"✅ Model loaded successfully from {loaded.path} ({loaded.load_seconds * 1000:.0f} ms, mmap={loaded.mmap})")
+    print(f"   Features: {wm.features}")
+    print(f"   Classes: {wm.label_encoder.classes_}")
+    print(f"   Compiled forest: {'enabled' if wm.compiled_forest is not None else 'not available'}")
+
+model_registry.register("water", ML_MODEL_PATH, prepare=prepare_water_model, loader=MODEL_LOADER,
+                        label=model_label(ML_MODEL_PATH))
+model_registry.add_listener("water", on_water_model_loaded)
+
+risk_rules = None
+rule_check = {"checked": 0, "disagreements": 0}
+rule_check_lock = threading.Lock()
+
+def rule_engine():
+    """The compiled WHO/BIS rules, built on first use"""
+    global risk_rules
+    if risk_rules is None:
+        from risk_rules import RiskRules
+        risk_rules = RiskRules(agg_method=RULES_AGG_METHOD, min_non_missing=RULES_MIN_NON_MISSING)
+    return risk_rules
+
+def rules_stats() -> Dict:
+    with rule_check_lock:
+        checked, disagreements = rule_check["checked"], rule_check["disagreements"]
+    return {
+        "config": risk_rules.config() if risk_rules is not None else None,
+        "cross_check": RULES_CROSS_CHECK,
+        "checked": checked,
+        "disagreements": disagreements,
+        "agreement": round(1 - disagreements / checked, 4) if checked else None,
+    }
+
+# Startup progress and its time breakdown, reported on /health
+startup_state = {"mode": STARTUP_MODE, "stage": "importing", "error": None, "timings_ms": {}}
+warmup_task: Optional[asyncio.Task] = None
+
+def record_startup_time(step: str, seconds: float):
+    startup_state["timings_ms"][step] = round(seconds * 1000, 1)
+
+def warm_up():
+    """Load the water model and run one prediction so the first request pays no first-call costs"""
+    startup_state["stage"] = "loading"
+    loaded = model_registry.get("water")
+    record_startup_time("unpickle", loaded.unpickle_seconds)
+    record_startup_time("prepare", loaded.load_seconds - loaded.unpickle_seconds)
+
+    startup_state["stage"] = "warming_up"
+    start = time.perf_counter()
+    wm = loaded.artifact
+    model_predict_rows([{feature: 0.0 for feature in wm.features}], wm)
+    rule_engine()
+    record_startup_time("warmup_inference", time.perf_counter() - start)
+    record_startup_time("ready", time.perf_counter() - IMPORT_STARTED)
+    startup_state["stage"] = "ready"
+
+def warm_up_failed(e: Exception):
+    startup_state["stage"] = "failed"
+    startup_state["error"] = f"{type(e).__name__}: {e}"
+    print(f"❌ Error loading model: {e}")
+
+async def warm_up_in_background():
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, warm_up)
+        print(f"✅ Ready after {startup_state['timings_ms']['ready']:.0f} ms")
+    except Exception as e:
+        warm_up_failed(e)
+
+def is_ready() -> bool:
+    return startup_state["stage"] == "ready" and model_registry.current("water") is not None
 
 @app.on_event("startup")
 async def load_model():
-    """Load the ML model, imputer, and label encoder on startup"""
-    global model_data, model, imputer, label_encoder, features, uses_pipeline
-    
+    """Load the ML model, imputer, and label encoder on startup and start watching for new versions"""
+    global warmup_task
     if not ML_MODEL_PATH.exists():
         raise FileNotFoundError(f"Model file not found at {ML_MODEL_PATH}. Please train the model first.")
     
-    try:
-        model_data = joblib.load(ML_MODEL_PATH)
-        
-        if isinstance(model_data, dict):
-            # Newer artifact format (recommended)
-            if 'model' in model_data:
-                model = model_data['model']
-                imputer = model_data.get('imputer')
-                label_encoder = model_data.get('label_encoder')
-                features = model_data.get('features')
-                uses_pipeline = False
-            elif 'pipeline' in model_data:
-                # Backward compatibility for pipeline artifacts
-                model = model_data['pipeline']
-                imputer = None
-                label_encoder = model_data.get('label_encoder')
-                features = model_data.get('features')
-                uses_pipeline = True
-            else:
-                raise KeyError("Model artifact must contain either 'model' or 'pipeline'.")
-        else:
-            # Fallback: assume the entire object is a trained estimator/pipeline
-            model = model_data
-            imputer = None
-            label_encoder = getattr(model_data, 'label_encoder_', None)
-            features = getattr(model_data, 'feature_names_in_', None)
-            uses_pipeline = True
+    if STARTUP_MODE == "background":
+        # Start serving now; /health/ready reports when the model can answer
+        warmup_task = asyncio.create_task(warm_up_in_background())
+    else:
+        try:
+            warm_up()
+        except Exception as e:
+            warm_up_failed(e)
+            raise
+    await model_registry.start()
 
-        if label_encoder is None or features is None:
-            raise ValueError("Model artifact missing required keys: 'label_encoder' and/or 'features'.")
+@app.on_event("shutdown")
+async def stop_model_registry():
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    await model_registry.stop()
 
-        print(f"✅ Model loaded successfully from {ML_MODEL_PATH}")
-        print(f"   Features: {features}")
-        print(f"   Classes: {label_encoder.classes_}")
-    except Exception as e:
-        print(f"❌ Error loading model: {e}")
-        raise
+@app.on_event("startup")
+async def start_prediction_batcher():
+    """Start the micro-batcher for /api/predict when AWARE_PREDICT_BATCHING is enabled"""
+    global prediction_batcher
+    if not PREDICT_BATCHING:
+        return
+    # Batches go through the predict lane (concurrency limit, 504 on slow inference); the queue in
+    # front of it has the lane's waiting limit, and a request's whole wait the lane's timeout
+    prediction_batcher = MicroBatcher(
+        predict_rows,
+        max_batch_size=BATCH_MAX_SIZE,
+        max_latency_ms=BATCH_MAX_LATENCY_MS,
+        runner=predict_lane.run,
+        max_queue=predict_lane.max_waiting,
+        timeout=predict_lane.timeout
+    )
+    await prediction_batcher.start()
+    print(f"✅ Prediction batching enabled: max_batch_size={BATCH_MAX_SIZE}, max_latency_ms={BATCH_MAX_LATENCY_MS}")
+
+@app.on_event("shutdown")
+async def stop_prediction_batcher():
+    """Stop the micro-batcher and fail any requests still queued"""
+    global prediction_batcher
+    if prediction_batcher is not None:
+        await prediction_batcher.stop()
+        prediction_batcher = None
+    predict_lane.shutdown()
+    control_lane.shutdown()
 
 # Pydantic model for request validation
 class WaterQualityInput(BaseModel):
@@ -113,6 +362,132 @@ class PredictionResponse(BaseModel):
     riskScore: Optional[float] = None
     confidence: Optional[float] = None
     message: str
+    ruleRiskLevel: Optional[str] = None  # the WHO/BIS rules' level for the same input (see /api/predict/rules)
+
+class RulePredictionResponse(BaseModel):
+    riskLevel: Optional[str] = None
+    riskScore: Optional[float] = None
+    scores: Dict[str, Optional[str]]
+    drivers: List[str]
+    message: str
+
+# Pydantic models for batch prediction
+class BatchPredictionInput(BaseModel):
+    """Either row-oriented `rows` or columnar `columns` ({feature: [values, ...]})"""
+    rows: Optional[List[WaterQualityInput]] = None
+    columns: Optional[Dict[str, List[float]]] = None
+
+class BatchPredictionResponse(BaseModel):
+    results: List[PredictionResponse]
+    count: int
+
+def input_to_dict(input_data: BaseModel) -> Dict:
+    """Dump a pydantic model to a dict on both pydantic v1 and v2"""
+    return input_data.model_dump() if hasattr(input_data, 'model_dump') else input_data.dict()
+
+def require_water_model():
+    """The current LoadedModel for /api/predict*, or a 503 while it is not available"""
+    loaded = model_registry.current("water")
+    if loaded is None:
+        if startup_state["stage"] != "failed":
+            raise HTTPException(status_code=503, detail="Model is still loading.", headers={"Retry-After": "1"})
+        raise HTTPException(
+            status_code=503,
+            detail="Model not loaded. Please check server logs."
+        )
+    return loaded
+
+def predict_proba_frame(model, x_ready: "pd.DataFrame") -> Optional[np.ndarray]:
+    """Return the (n_rows, n_classes) probability matrix, or None if unavailable"""
+    if not hasattr(model, 'predict_proba'):
+        return None
+    try:
+        return model.predict_proba(x_ready)
+    except Exception:
+        try:
+            clf = getattr(model, 'named_steps', {}).get('clf', model)
+            X_for_clf = x_ready
+            if hasattr(model, 'named_steps') and 'preproc' in model.named_steps:
+                X_for_clf = model.named_steps['preproc'].transform(x_ready)
+            return clf.predict_proba(X_for_clf)
+        except Exception:
+            return None
+
+def build_responses(wm: WaterModel, probs: np.ndarray) -> List[PredictionResponse]:
+    """Turn an (n_rows, n_classes) probability matrix into per-row responses"""
+    # predict() is argmax(predict_proba) for forests, so reuse the probabilities
+    risk_levels = wm.readable_classes[np.argmax(probs, axis=1)]
+    risk_scores = probs @ wm.class_scores
+    confidences = probs.max(axis=1) * 100.0
+    return [
+        PredictionResponse(
+            riskLevel=risk_level,
+            riskScore=round(float(risk_scores[i]), 2),
+            confidence=round(float(confidences[i]), 2),
+            message=f"Prediction successful: {risk_level} risk level"
+        )
+        for i, risk_level in enumerate(risk_levels)
+    ]
+
+def predict_rows(rows: List[Dict], wm: Optional[WaterModel] = None) -> List[PredictionResponse]:
+    """
+    Vectorized inference over every input dict in `rows` in one pass, with `wm` (default: the current model).
+
+    Imputation, predict_proba and the riskScore/confidence reductions all run
+    on the whole matrix, so a batch costs one model call instead of one per row.
+    """
+    results = model_predict_rows(rows, wm or water_model())
+    return cross_check_rules(rows, results) if RULES_CROSS_CHECK else results
+
+def cross_check_rules(rows: List[Dict], results: List[PredictionResponse]) -> List[PredictionResponse]:
+    """Attach the rule-based level to each model result and count where the two disagree"""
+    disagreements = 0
+    for result, level in zip(results, rule_engine().levels(rows)):
+        result.ruleRiskLevel = level
+        disagreements += level is not None and level != result.riskLevel
+    with rule_check_lock:
+        rule_check["checked"] += len(results)
+        rule_check["disagreements"] += disagreements
+    return results
+
+def model_predict_rows(rows: List[Dict], wm: WaterModel) -> List[PredictionResponse]:
+    """The model's responses for `rows`, without the rules cross-check"""
+    if wm.compiled_forest is not None:
+        # Imputation and scaling are folded into the compiled arrays; no DataFrame needed
+        x_new = np.array([[row.get(feature, np.nan) for feature in wm.features] for row in rows], dtype=np.float64)
+        probs = wm.compiled_forest.predict_proba(x_new)
+        return build_responses(wm, probs)
+
+    import pandas as pd  # only the sklearn path needs it
+    # Ensure columns are in the correct order and include all required features
+    x_new = pd.DataFrame(rows).reindex(columns=wm.features)
+
+    if wm.imputer is not None and not wm.uses_pipeline:
+        # Legacy artifact: impute manually before feeding raw model
+        x_new_imputed = wm.imputer.transform(x_new)
+        x_ready = pd.DataFrame(x_new_imputed, columns=wm.features, index=x_new.index)
+    else:
+        # Pipeline-based artifact handles preprocessing itself
+        x_ready = x_new
+
+    probs = predict_proba_frame(wm.model, x_ready)
+    if probs is not None:
+        return build_responses(wm, probs)
+
+    prediction = wm.model.predict(x_ready)
+    try:
+        risk_levels = wm.label_encoder.inverse_transform(prediction)
+    except Exception:
+        risk_levels = prediction
+    return [
+        PredictionResponse(
+            riskLevel=risk_level,
+            riskScore=float(DEFAULT_SCORE_MAP.get(str(risk_level), 50.0)),
+            confidence=None,
+            message=f"Prediction successful: {risk_level} risk level"
+        )
+        for risk_level in risk_levels
+    ]
 
 @app.get("/")
 async def root():
@@ -120,10 +495,15 @@ async def root():
     return {
         "message": "AWARE ML Prediction API",
         "status": "running",
-        "model_loaded": model is not None,
+        "model_loaded": water_model() is not None,
         "endpoints": {
             "predict": "/api/predict",
+            "predict_batch": "/api/predict/batch",
+            "predict_rules": "/api/predict/rules",
+            "sensor_stream": "/api/sensor-stream",
             "health": "/health",
+            "liveness": "/health/live",
+            "readiness": "/health/ready",
             "docs": "/docs"
         }
     }
@@ -131,12 +511,35 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    wm = water_model()
     return {
         "status": "healthy",
-        "model_loaded": model is not None,
-        "features": features if features else None
+        "ready": is_ready(),
+        "model_loaded": wm is not None,
+        "features": list(wm.features) if wm is not None else None,
+        "startup": startup_state,
+        "models": model_registry.stats(),
+        "batcher": prediction_batcher.metrics() if prediction_batcher is not None else None,
+        "cache": prediction_cache.stats() if prediction_cache is not None else None,
+        "rules": rules_stats(),
+        "offload": {"predict": predict_lane.stats(), "sensor_control": control_lane.stats()},
+        "sensor_stream": sensor_broadcaster.metrics(),
+        "graph": graph_service.stats() if coordinator_client is None else None,
+        "coordinator": coordinator_client.stats() if coordinator_client is not None else None,
+        "pid": os.getpid()
     }
 
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving (the model may still be loading)"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe: 200 once the model is loaded and warmed up, 503 before that"""
+    content = {"ready": is_ready(), "stage": startup_state["stage"], "error": startup_state["error"]}
+    return JSONResponse(status_code=200 if content["ready"] else 503, content=content)
+
 @app.post("/api/predict", response_model=PredictionResponse)
 async def predict_risk(input_data: WaterQualityInput):
     """
@@ -148,152 +551,223 @@ async def predict_risk(input_data: WaterQualityInput):
     - confidence: Optional prediction confidence
     """
     # Debug: print received data
-    try:
-        input_dict = input_data.model_dump() if hasattr(input_data, 'model_dump') else input_data.dict()
-        print(f"✅ Received valid prediction request: {input_dict}")
-    except Exception as e:
-        print(f"❌ Error processing input: {e}")
+    input_dict = input_to_dict(input_data)
+    print(f"✅ Received valid prediction request: {input_dict}")
     
-    if model is None or label_encoder is None or features is None:
-        raise HTTPException(
-            status_code=503,
-            detail="Model not loaded. Please check server logs."
-        )
+    loaded = require_water_model()
+    wm = loaded.artifact
     
+    cache_key = None
+    if prediction_cache is not None:
+        cache_key = prediction_cache.make_key(input_dict, wm.features)
+        cached = prediction_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
     try:
-        # Convert input to dictionary
-        input_dict = input_data.model_dump() if hasattr(input_data, 'model_dump') else input_data.dict()
-        
-        # Create DataFrame with the input data
-        x_new = pd.DataFrame([input_dict])
-        
-        # Ensure columns are in the correct order and include all required features
-        x_new = x_new.reindex(columns=features)
-        
-        if imputer is not None and not uses_pipeline:
-            # Legacy artifact: impute manually before feeding raw model
-            x_new_imputed = imputer.transform(x_new)
-            x_ready = pd.DataFrame(x_new_imputed, columns=features, index=x_new.index)
+        version = loaded.version
+        if prediction_batcher is not None:
+            # Stacked with other concurrent requests and scored in a worker thread
+            try:
+                result = await prediction_batcher.submit(input_dict)
+            except BatcherFull:
+                raise HTTPException(status_code=503, detail="Server busy (predict); try again shortly.",
+                                    headers={"Retry-After": "1"})
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=504,
+                                    detail=f"predict did not finish within {prediction_batcher.timeout:g}s.")
         else:
-            # Pipeline-based artifact handles preprocessing itself
-            x_ready = x_new
-        
-        # Make prediction
-        prediction = model.predict(x_ready)
-        
-        # Try to derive readable predicted label
+            # Run the shared vectorized path on a single row, off the event loop
+            result = (await predict_lane.run(predict_rows, [input_dict], wm))[0]
+
+        if cache_key is not None:
+            prediction_cache.put(cache_key, result, version=version)
+        return result
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Prediction error: {str(e)}"
+        )
+
+@app.post("/api/predict/batch", response_model=BatchPredictionResponse)
+async def predict_risk_batch(input_data: Union[List[WaterQualityInput], BatchPredictionInput]):
+    """
+    Predict risk levels for many readings in one vectorized pass
+
+    Accepts either a JSON array of WaterQualityInput objects, `{"rows": [...]}`,
+    or columnar `{"columns": {"Temp": [...], "DO": [...], ...}}`.
+    Results are returned in input order.
+    """
+    wm = require_water_model().artifact
+
+    if isinstance(input_data, list):
+        rows = input_data
+    elif input_data.columns is not None:
+        lengths = {len(values) for values in input_data.columns.values()}
+        if len(lengths) > 1:
+            raise HTTPException(status_code=422, detail="All columns must have the same length.")
+        names = list(input_data.columns.keys())
         try:
-            risk_level = label_encoder.inverse_transform(prediction)[0]
-        except Exception:
-            risk_level = prediction[0]
+            # Validate each row against the same bounds as the single-row endpoint
+            rows = [WaterQualityInput(**dict(zip(names, values)))
+                    for values in zip(*input_data.columns.values())]
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"Invalid columnar input: {str(e)}")
+    else:
+        rows = input_data.rows or []
 
-        # Probabilities / confidence / risk score
-        probabilities = None
-        confidence = None
-        risk_score = None
-        DEFAULT_SCORE_MAP = {'Low': 0.0, 'Medium': 50.0, 'High': 100.0}
+    if not rows:
+        return BatchPredictionResponse(results=[], count=0)
 
-        if hasattr(model, 'predict_proba'):
-            probs = None
-            try:
-                probs = model.predict_proba(x_ready)[0]
-            except Exception:
-                try:
-                    clf = getattr(model, 'named_steps', {}).get('clf', model)
-                    X_for_clf = x_ready
-                    if hasattr(model, 'named_steps') and 'preproc' in model.named_steps:
-                        X_for_clf = model.named_steps['preproc'].transform(x_ready)
-                    probs = clf.predict_proba(X_for_clf)[0]
-                except Exception:
-                    probs = None
-
-            if probs is not None:
-                probabilities = probs
-                if hasattr(model, 'classes_'):
-                    model_classes = model.classes_
-                    try:
-                        readable_classes = label_encoder.inverse_transform(model_classes)
-                    except Exception:
-                        readable_classes = [str(c) for c in model_classes]
-                else:
-                    readable_classes = [str(c) for c in label_encoder.classes_]
-
-                score_map = DEFAULT_SCORE_MAP
-                scores = [score_map.get(str(lbl), 50.0) for lbl in readable_classes]
-                risk_score_val = float(sum(p * s for p, s in zip(probabilities, scores)))
-                confidence = float(max(probabilities)) * 100.0
-                risk_score = round(risk_score_val, 2)
-                confidence = round(confidence, 2)
-            else:
-                probabilities = None
-                confidence = None
-                risk_score = float(DEFAULT_SCORE_MAP.get(str(risk_level), 50.0))
-        else:
-            probabilities = None
-            confidence = None
-            risk_score = float(DEFAULT_SCORE_MAP.get(str(risk_level), 50.0))
-        
-        return PredictionResponse(
-            riskLevel=risk_level,
-            riskScore=risk_score,
-            confidence=confidence,
-            message=f"Prediction successful: {risk_level} risk level"
-        )
-    
+    try:
+        results = await predict_lane.run(predict_rows, [input_to_dict(row) for row in rows], wm)
+        return BatchPredictionResponse(results=results, count=len(results))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Prediction error: {str(e)}"
         )
 
+@app.post("/api/predict/rules", response_model=RulePredictionResponse)
+async def predict_risk_rules(input_data: WaterQualityInput):
+    """
+    Rule-based risk level from the WHO/BIS thresholds the model's training labels come from
+
+    Needs no model, so it also answers while the model is loading. It takes
+    microseconds, so it runs on the event loop instead of the predict lane.
+    Also returns each parameter's level and the parameters that set the result.
+    """
+    result = rule_engine().explain(input_to_dict(input_data))
+    level = result['level']
+    return RulePredictionResponse(
+        riskLevel=level,
+        riskScore=DEFAULT_SCORE_MAP.get(level) if level is not None else None,
+        scores=result['scores'],
+        drivers=result['drivers'],
+        message=f"Rule-based: {level} risk level" if level is not None else "Too few parameters for a rule-based level"
+    )
+
 # Sensor and graph control state
 synthetic_sensor = None
 sensor_running = False
-graph_process = None
-graph_running = False
 
 # Get the project root directory (parent of backend)
 BACKEND_DIR = Path(__file__).parent.absolute()
 PROJECT_ROOT = BACKEND_DIR.parent
 EXTRACT_DIR = PROJECT_ROOT / "extract"
-SENSOR_DATA_FILE = EXTRACT_DIR / "sensor_live_data.csv"
-GRAPH_SCRIPT = EXTRACT_DIR / "run_live_graph.py"
+SENSOR_DATA_FILE = EXTRACT_DIR / "sensor_live_data.ring"
 
-# Print paths for debugging
-print(f"Backend directory: {BACKEND_DIR}")
-print(f"Project root: {PROJECT_ROOT}")
-print(f"Extract directory: {EXTRACT_DIR}")
-print(f"Extract directory exists: {EXTRACT_DIR.exists()}")
-
-# Import SyntheticSensor class directly
 import sys
 sys.path.insert(0, str(EXTRACT_DIR))
-SENSOR_MODEL_PATH = EXTRACT_DIR / "rf_forecast_model.joblib"
+SENSOR_MODEL_PATH = model_path("rf_forecast_model")
 DATA_PATH = EXTRACT_DIR / "water_dataX.csv"
 SyntheticSensor = None
+validate_forecast_model = None
+dataset_exists = Path.exists
+sensor_import_error = None
+
+def import_sensor_module() -> bool:
+    """Import SyntheticSensor (which pulls in pandas) on the first sensor start. Returns False if unavailable"""
+    global SyntheticSensor, validate_forecast_model, dataset_exists, sensor_import_error
+    if SyntheticSensor is not None or sensor_import_error is not None:
+        return SyntheticSensor is not None
+    try:
+        from synthetic_sensors import SyntheticSensor, validate_forecast_model
+        from wq_dataset import dataset_exists
+        print(f"Sensor model path: {SENSOR_MODEL_PATH}")
+        print(f"Sensor model exists: {SENSOR_MODEL_PATH.exists()}")
+        print(f"Data path: {DATA_PATH}")
+        print(f"Data exists: {dataset_exists(DATA_PATH)}")
+    except ImportError as e:
+        sensor_import_error = str(e)
+        print(f"Warning: Could not import SyntheticSensor: {e}")
+        print(f"  Extract directory: {EXTRACT_DIR} (exists: {EXTRACT_DIR.exists()})")
+        import traceback
+        traceback.print_exc()
+        SyntheticSensor = None
+    return SyntheticSensor is not None
 
+def prepare_forecast_model(model_data, path: Path):
+    if not import_sensor_module():
+        raise RuntimeError(f"SyntheticSensor not available: {sensor_import_error}")
+    return validate_forecast_model(model_data)
+
+def on_forecast_model_loaded(loaded):
+    # Hand a reloaded forecast model to the sensor; a running one switches between ticks
+    if synthetic_sensor is not None:
+        synthetic_sensor.load_model(loaded.artifact)
+
+# The sensor's forecast model is loaded on first start and then hot-reloaded like the water model
+model_registry.register("forecast", SENSOR_MODEL_PATH, prepare=prepare_forecast_model, loader=MODEL_LOADER,
+                        label=model_label(SENSOR_MODEL_PATH))
+model_registry.add_listener("forecast", on_forecast_model_loaded)
+
+# Read side of the sensor ring-buffer store (maps the file lazily once the sensor creates it)
+sensor_reader = None
 try:
-    from synthetic_sensors import SyntheticSensor
-    print(f"Sensor model path: {SENSOR_MODEL_PATH}")
-    print(f"Sensor model exists: {SENSOR_MODEL_PATH.exists()}")
-    print(f"Data path: {DATA_PATH}")
-    print(f"Data exists: {DATA_PATH.exists()}")
+    from sensor_store import SensorStore, records_to_columns
+    sensor_reader = SensorStore.open_reader(SENSOR_DATA_FILE)
 except ImportError as e:
-    print(f"Warning: Could not import SyntheticSensor: {e}")
-    import traceback
-    traceback.print_exc()
-    SyntheticSensor = None
+    print(f"Warning: Could not import SensorStore: {e}")
 
-@app.post("/api/sensors/start")
-async def start_sensors():
-    """Start synthetic sensors"""
+# Pushes each new reading from the sensor thread to /api/sensor-stream clients
+sensor_broadcaster = SensorBroadcaster(store_reader=sensor_reader)
+
+# Multi-worker mode (run_server.py --workers N): a coordinator process owns the sensor and the graph,
+# and every worker forwards sensor/graph commands to it. Unset when a single process serves everything.
+COORDINATOR_ADDRESS = os.getenv("AWARE_COORDINATOR")
+# Sensor start/stop wait in the coordinator's control lane (queue, then call); the worker waits that long
+# plus a margin, so the coordinator's own 503/504 decides and a slow cold start is not reported as failed
+CONTROL_ROUND_TRIP_TIMEOUT = control_lane.queue_timeout + control_lane.timeout + 5.0 \
+    if control_lane.queue_timeout > 0 and control_lane.timeout > 0 else None
+coordinator_client = CoordinatorClient(
+    COORDINATOR_ADDRESS, os.getenv("AWARE_COORDINATOR_TOKEN", ""),
+    command_timeouts={"sensor_start": CONTROL_ROUND_TRIP_TIMEOUT, "sensor_stop": CONTROL_ROUND_TRIP_TIMEOUT}
+) if COORDINATOR_ADDRESS else None
+follow_task: Optional[asyncio.Task] = None
+
+async def coordinator_sensor_running() -> bool:
+    return (await coordinator_client.call("sensor_status"))["running"]
+
+@app.on_event("startup")
+async def attach_sensor_broadcaster():
+    global follow_task
+    sensor_broadcaster.attach(asyncio.get_running_loop())
+    if coordinator_client is not None:
+        # The sensor runs in the coordinator: pick its readings up from the shared store
+        follow_task = asyncio.create_task(sensor_broadcaster.follow_store(status=coordinator_sensor_running))
+
+@app.on_event("shutdown")
+async def stop_following_store():
+    if follow_task is not None:
+        follow_task.cancel()
+
+# Live graph rendered in-process from the sensor store
+graph_service = GraphService(SENSOR_DATA_FILE)
+
+@app.on_event("shutdown")
+async def stop_graph_service():
+    await graph_service.stop()
+    graph_service.shutdown()
+
+async def start_sensors_here():
+    # Imports, model loading and opening the store all block
+    return await control_lane.run(start_sensors_blocking)
+
+def start_sensors_blocking():
+    """Start synthetic sensors in this process"""
     global synthetic_sensor, sensor_running
     
     # Check if already running
     if sensor_running and synthetic_sensor is not None and synthetic_sensor.is_running:
         return {"status": "already_running", "message": "Sensors are already running"}
     
-    if SyntheticSensor is None:
+    if not import_sensor_module():
         raise HTTPException(status_code=503, detail="SyntheticSensor class not available. Check backend logs.")
     
     # Validate required files exist with better error messages
@@ -301,16 +775,24 @@ async def start_sensors():
         abs_path = SENSOR_MODEL_PATH.absolute()
         raise HTTPException(
             status_code=404, 
-            detail=f"Model file not found at: {abs_path}. Please ensure rf_forecast_model.joblib exists in the extract directory."
+            detail=f"Model file not found at: {abs_path}. Please ensure {SENSOR_MODEL_PATH.relative_to(EXTRACT_DIR)} exists in the extract directory."
         )
     
     # Check data file (optional - sensor can use defaults)
-    if not DATA_PATH.exists():
+    if not dataset_exists(DATA_PATH):
         print(f"⚠️  Warning: Data file not found at {DATA_PATH.absolute()}. Sensor will use default value ranges.")
     
     try:
-        # Create and start sensor instance
-        synthetic_sensor = SyntheticSensor(SENSOR_MODEL_PATH, DATA_PATH, SENSOR_DATA_FILE)
+        if synthetic_sensor is not None and not synthetic_sensor.is_running:
+            # Restart the stopped sensor: the registry keeps its forecast model current, so
+            # only the value ranges are refreshed (from the statistics sidecar, milliseconds)
+            synthetic_sensor.load_data_ranges()
+        else:
+            # Create sensor instance around the registry's shared copy of the forecast model
+            forecast = model_registry.get("forecast")
+            synthetic_sensor = SyntheticSensor(SENSOR_MODEL_PATH, DATA_PATH, SENSOR_DATA_FILE,
+                                               model_data=forecast.artifact)
+            synthetic_sensor.add_listener(sensor_broadcaster.publish)
         synthetic_sensor.start()
         
         # Verify it actually started
@@ -318,6 +800,7 @@ async def start_sensors():
             raise Exception("Sensor failed to start - is_running is False")
         
         sensor_running = True
+        sensor_broadcaster.publish_status(True)
         
         return {"status": "started", "message": "Synthetic sensors started successfully"}
     except FileNotFoundError as e:
@@ -340,9 +823,12 @@ async def start_sensors():
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to start sensors: {error_msg}")
 
-@app.post("/api/sensors/stop")
-async def stop_sensors():
-    """Stop synthetic sensors"""
+async def stop_sensors_here():
+    # stop() waits for the sensor thread to finish its current tick
+    return await control_lane.run(stop_sensors_blocking)
+
+def stop_sensors_blocking():
+    """Stop synthetic sensors in this process"""
     global synthetic_sensor, sensor_running
     
     if not sensor_running:
@@ -351,95 +837,199 @@ async def stop_sensors():
     try:
         if synthetic_sensor:
             synthetic_sensor.stop()
+        # The stopped instance is kept so the next start can reuse its loaded model
         sensor_running = False
-        synthetic_sensor = None
+        sensor_broadcaster.publish_status(False)
         return {"status": "stopped", "message": "Synthetic sensors stopped successfully"}
     except Exception as e:
         sensor_running = False
         synthetic_sensor = None
+        sensor_broadcaster.publish_status(False)
         error_msg = str(e)
         print(f"Error stopping sensors: {error_msg}")
         raise HTTPException(status_code=500, detail=f"Failed to stop sensors: {error_msg}")
 
-@app.get("/api/sensors/status")
-async def get_sensor_status():
-    """Get sensor status"""
+async def sensor_status_here():
     global sensor_running, synthetic_sensor
     is_running = sensor_running and synthetic_sensor is not None and synthetic_sensor.is_running
     return {"running": is_running}
 
-@app.post("/api/graph/start")
-async def start_live_graph():
-    """Start live graph visualization"""
-    global graph_process, graph_running
-    
-    if graph_running:
+async def start_graph_here():
+    """Start live graph visualization in this process"""
+    if graph_service.running:
         return {"status": "already_running", "message": "Live graph is already running"}
     
     try:
-        graph_process = subprocess.Popen(
-            ["python", str(GRAPH_SCRIPT)],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            cwd=str(EXTRACT_DIR)
-        )
-        graph_running = True
+        await graph_service.start()
         return {"status": "started", "message": "Live graph started successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to start live graph: {str(e)}")
 
-@app.post("/api/graph/stop")
-async def stop_live_graph():
-    """Stop live graph visualization"""
-    global graph_process, graph_running
-    
-    if not graph_running:
+async def stop_graph_here():
+    """Stop live graph visualization in this process"""
+    if not graph_service.running:
         return {"status": "not_running", "message": "Live graph is not running"}
     
     try:
-        if graph_process:
-            graph_process.terminate()
-            graph_process.wait(timeout=5)
-        graph_running = False
+        await graph_service.stop()
         return {"status": "stopped", "message": "Live graph stopped successfully"}
     except Exception as e:
-        graph_running = False
         raise HTTPException(status_code=500, detail=f"Failed to stop live graph: {str(e)}")
 
+async def graph_status_here():
+    return {"running": graph_service.running}
+
+async def graph_image_here(v: Optional[int] = None, if_none_match: Optional[str] = None,
+                           if_modified_since: Optional[str] = None):
+    """The current graph frame, without the PNG bytes if the client's copy is still current"""
+    if v is not None:
+        await graph_service.ensure_frame(v)
+    if graph_service.png is None:
+        raise HTTPException(status_code=404, detail="Graph image not found. Make sure the live graph is running.")
+    not_modified = graph_service.is_not_modified(if_none_match, if_modified_since)
+    return {
+        "etag": graph_service.etag,
+        "last_modified": graph_service.last_modified,
+        "not_modified": not_modified,
+        "png": None if not_modified else graph_service.png
+    }
+
+# Sensor/graph commands, run here or (multi-worker mode) in the coordinator process
+CONTROL_HANDLERS = {
+    "sensor_start": start_sensors_here,
+    "sensor_stop": stop_sensors_here,
+    "sensor_status": sensor_status_here,
+    "graph_start": start_graph_here,
+    "graph_stop": stop_graph_here,
+    "graph_status": graph_status_here,
+    "graph_image": graph_image_here,
+}
+
+async def control(command: str, **args):
+    if coordinator_client is not None:
+        return await coordinator_client.call(command, **args)
+    return await CONTROL_HANDLERS[command](**args)
+
+async def run_coordinator(host: str, port: int, token: str):
+    """Own the sensor and graph for the workers of a multi-worker server (see run_server.py) until cancelled"""
+    server = CoordinatorServer(CONTROL_HANDLERS, host, port, token)
+    await server.start()
+    await model_registry.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+        await model_registry.stop()
+        if synthetic_sensor is not None and synthetic_sensor.is_running:
+            synthetic_sensor.stop()
+        await stop_graph_service()
+
+@app.post("/api/sensors/start")
+async def start_sensors():
+    """Start synthetic sensors"""
+    return await control("sensor_start")
+
+@app.post("/api/sensors/stop")
+async def stop_sensors():
+    """Stop synthetic sensors"""
+    return await control("sensor_stop")
+
+@app.get("/api/sensors/status")
+async def get_sensor_status():
+    """Get sensor status"""
+    return await control("sensor_status")
+
+@app.post("/api/graph/start")
+async def start_live_graph():
+    """Start live graph visualization"""
+    return await control("graph_start")
+
+@app.post("/api/graph/stop")
+async def stop_live_graph():
+    """Stop live graph visualization"""
+    return await control("graph_stop")
+
 @app.get("/api/graph/status")
 async def get_graph_status():
     """Get graph status"""
-    global graph_running
-    return {"running": graph_running}
+    return await control("graph_status")
 
 @app.get("/api/sensor-data")
 async def get_sensor_data():
-    """Get latest sensor data from CSV"""
+    """Get latest sensor data from the ring-buffer store"""
     try:
-        sensor_data_file = EXTRACT_DIR / "sensor_live_data.csv"
-        if not sensor_data_file.exists():
-            return {"data": [], "message": "No sensor data available yet"}
-        
-        df = pd.read_csv(sensor_data_file)
+        if sensor_reader is None:
+            raise RuntimeError("SensorStore not available")
         # Return last 50 readings
-        latest_data = df.tail(50).to_dict('records')
+        latest_data = sensor_reader.latest(50)
+        if not latest_data:
+            return {"data": [], "message": "No sensor data available yet"}
         return {"data": latest_data, "count": len(latest_data)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to read sensor data: {str(e)}")
 
-@app.get("/api/graph/image")
-async def get_graph_image():
-    """Get the live graph image"""
-    graph_image_file = EXTRACT_DIR / "live_graph.png"
-    if not graph_image_file.exists():
-        raise HTTPException(status_code=404, detail="Graph image not found. Make sure the live graph is running.")
-    return FileResponse(
-        graph_image_file,
-        media_type="image/png",
-        headers={"Cache-Control": "no-cache, no-store, must-revalidate"}
+@app.get("/api/sensor-stream")
+async def stream_sensor_data(request: Request, since: Optional[int] = None, backlog: int = 50,
+                             last_event_id: Optional[str] = Header(None)):
+    """
+    Server-Sent Events stream of sensor readings and sensor status.
+    
+    Each reading is sent as `event: reading` with its store sequence number as the
+    event id. Reconnecting clients resume after Last-Event-ID (sent automatically
+    by EventSource) or ?since=<seq>. New clients first get the newest `backlog` readings.
+    """
+    if since is None and last_event_id:
+        try:
+            since = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID must be a sequence number")
+    return StreamingResponse(
+        sensor_broadcaster.stream(since=since, backlog=max(0, backlog), is_disconnected=request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
+@app.get("/api/graph/image")
+async def get_graph_image(v: Optional[int] = None, if_none_match: Optional[str] = Header(None),
+                          if_modified_since: Optional[str] = Header(None)):
+    """
+    Get the live graph image.
+    
+    `v` is the newest reading sequence number the client knows about; the frame is
+    brought up to date first if it does not include that reading yet. Responses carry
+    an ETag and Last-Modified so repeat requests are answered with 304 Not Modified.
+    """
+    frame = await control("graph_image", v=v, if_none_match=if_none_match, if_modified_since=if_modified_since)
+    headers = {
+        "ETag": frame["etag"],
+        "Last-Modified": frame["last_modified"],
+        "Cache-Control": "no-cache"  # cache, but revalidate every time
+    }
+    if frame["not_modified"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=frame["png"], media_type="image/png", headers=headers)
+
+@app.get("/api/graph/series")
+async def get_graph_series(points: int = 50, if_none_match: Optional[str] = Header(None)):
+    """
+    Latest readings as columns (timestamp, features, Risk, Confidence) for client-side charts.
+    Works whether or not the server-side graph is running.
+    """
+    if sensor_reader is None:
+        raise HTTPException(status_code=503, detail="SensorStore not available")
+    points = max(1, min(points, 5000))
+    etag = f'"{int(sensor_reader.created * 1000)}-{sensor_reader.last_seq}-{points}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match is not None and etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]:
+        return Response(status_code=304, headers=headers)
+    records = sensor_reader.latest_records(points)
+    content = {"count": len(records), "last_seq": int(records['seq'][-1]) if len(records) else 0}
+    content.update(records_to_columns(records))
+    return JSONResponse(content=content, headers=headers)
+
+record_startup_time("import", time.perf_counter() - IMPORT_STARTED)
+startup_state["stage"] = "starting"
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,220 @@
+"""
+Shared, hot-reloadable registry of model artifacts
+
+Each artifact (rf_water_model.joblib for /api/predict, rf_forecast_model.joblib
+for the synthetic sensor) is loaded once and handed out as an immutable
+LoadedModel. A request takes one LoadedModel at its start and uses only that,
+so swapping in a new version never changes a model under a request that is
+already running. The old version is freed when its last user lets go.
+
+A background task polls the files (mtime and size) and reloads an artifact
+once its new version has been stable for one poll. Writers should still
+replace files atomically (write to a temp file, then rename). The load runs in
+a worker thread, and the old version keeps serving until the new one is fully
+loaded and prepared. An artifact that fails to load is not retried until the
+file changes again, and the previous version stays in service.
+
+With mmap_mode='r', joblib memory-maps the NumPy arrays of uncompressed
+artifacts so several worker processes share those pages. Compressed files, or
+files that cannot be mapped, are loaded normally. An entry registered with its
+own loader (e.g. a model bundle from extract/model_bundle.py) skips joblib.
+"""
+import asyncio
+import os
+import threading
+import time
+import warnings
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def file_fingerprint(path: Path) -> Optional[str]:
+    """Cheap change detector for a model artifact: mtime and size"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns}-{st.st_size}"
+
+
+class LoadedModel:
+    """One loaded version of an artifact. Never mutated after creation"""
+    __slots__ = ('name', 'path', 'version', 'artifact', 'loaded_at', 'load_seconds', 'unpickle_seconds', 'mmap')
+
+    def __init__(self, name: str, path: Path, version: str, artifact: Any, loaded_at: float,
+                 load_seconds: float, unpickle_seconds: float, mmap: bool):
+        self.name = name
+        self.path = path
+        self.version = version
+        self.artifact = artifact  # the prepared object (see ModelRegistry.register)
+        self.loaded_at = loaded_at
+        self.load_seconds = load_seconds  # unpickle + prepare
+        self.unpickle_seconds = unpickle_seconds
+        self.mmap = mmap
+
+
+class _Entry:
+    def __init__(self, name: str, path: Path, prepare: Optional[Callable[[Any, Path], Any]],
+                 loader: Optional[Callable[[Path], Tuple[Any, bool]]] = None, label: Optional[str] = None):
+        self.name = name
+        self.path = Path(path)
+        self.prepare = prepare
+        self.loader = loader
+        self.label = label or self.path.name
+        self.current: Optional[LoadedModel] = None
+        self.listeners: List[Callable[[LoadedModel], None]] = []
+        self.load_lock = threading.Lock()  # one load of this artifact at a time
+        self.pending_version: Optional[str] = None  # changed on disk, waiting to settle
+        self.failed_version: Optional[str] = None
+        self.loads = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+
+class ModelRegistry:
+    def __init__(self, mmap_mode: Optional[str] = None, watch_interval: float = 2.0):
+        """watch_interval is how often (seconds) registered files are checked; <= 0 disables hot reload"""
+        self.mmap_mode = mmap_mode
+        self.watch_interval = watch_interval
+        self.entries: Dict[str, _Entry] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, path: Path, prepare: Optional[Callable[[Any, Path], Any]] = None,
+                 loader: Optional[Callable[[Path], Tuple[Any, bool]]] = None, label: Optional[str] = None):
+        """
+        Register an artifact. prepare(raw_artifact, path) turns what joblib loaded into the object
+        handed out as LoadedModel.artifact; it runs before the swap, so errors keep the old version.
+        loader(path) -> (raw_artifact, mmapped) replaces joblib.load for other file formats.
+        label is what stats() reports as the path (default: the file name).
+        """
+        self.entries[name] = _Entry(name, path, prepare, loader, label)
+
+    def add_listener(self, name: str, callback: Callable[[LoadedModel], None]):
+        """callback(loaded) runs after every successful load of `name`, in the loading thread"""
+        self.entries[name].listeners.append(callback)
+
+    def current(self, name: str) -> Optional[LoadedModel]:
+        """The loaded version, or None if it has not been loaded yet (never loads)"""
+        return self.entries[name].current
+
+    def get(self, name: str) -> LoadedModel:
+        """The loaded version, loading it first if needed"""
+        entry = self.entries[name]
+        return entry.current or self.load(name)
+
+    def load(self, name: str) -> LoadedModel:
+        """
+        Load `name` from disk and make it current, unless the current version is already what is
+        on disk (e.g. another caller loaded it while this one waited for the lock). Raises if it
+        cannot be loaded
+        """
+        entry = self.entries[name]
+        with entry.load_lock:
+            version = file_fingerprint(entry.path)
+            if version is None:
+                raise FileNotFoundError(f"Model file not found at {entry.path}")
+            if entry.current is not None and entry.current.version == version:
+                return entry.current
+            start = time.perf_counter()
+            try:
+                raw, mmapped = entry.loader(entry.path) if entry.loader else self._load_artifact(entry.path)
+                unpickled = time.perf_counter()
+                artifact = entry.prepare(raw, entry.path) if entry.prepare else raw
+                if file_fingerprint(entry.path) != version:
+                    raise RuntimeError("file changed while it was being loaded")
+            except Exception as e:
+                entry.failures += 1
+                entry.failed_version = version
+                entry.last_error = f"{type(e).__name__}: {e}"
+                raise
+            loaded = LoadedModel(name, entry.path, version, artifact, time.time(),
+                                 time.perf_counter() - start, unpickled - start, mmapped)
+            entry.current = loaded  # the swap: a single reference assignment
+            entry.loads += 1
+            entry.pending_version = None
+            entry.failed_version = None
+            entry.last_error = None
+        for callback in entry.listeners:
+            try:
+                callback(loaded)
+            except Exception as e:
+                print(f"⚠️  Model '{name}' reload listener error: {e}")
+        return loaded
+
+    def _load_artifact(self, path: Path):
+        """joblib.load, memory-mapped if configured and possible. Returns (artifact, mmapped)"""
+        import joblib  # imported on first load, not when the API module is imported
+        if self.mmap_mode:
+            try:
+                with warnings.catch_warnings(record=True) as caught:
+                    warnings.simplefilter('always')
+                    artifact = joblib.load(path, mmap_mode=self.mmap_mode)
+                # joblib ignores mmap_mode for compressed files (and says so)
+                compressed = any('compressed' in str(w.message) for w in caught)
+                return artifact, not compressed
+            except Exception as e:
+                print(f"⚠️  Could not memory-map {path.name} ({e}); loading it normally")
+        return joblib.load(path), False
+
+    def check_for_updates(self) -> List[str]:
+        """Reload every loaded artifact whose file changed and has settled. Returns the names reloaded"""
+        reloaded = []
+        for name, entry in self.entries.items():
+            current = entry.current
+            if current is None:
+                continue  # never requested yet; it will be loaded from the current file when it is
+            version = file_fingerprint(entry.path)
+            if version is None or version == current.version or version == entry.failed_version:
+                entry.pending_version = None
+                continue
+            if version != entry.pending_version:
+                # First time this version is seen: wait one interval so a file still being written settles
+                entry.pending_version = version
+                continue
+            try:
+                loaded = self.load(name)
+                print(f"🔄 Reloaded model '{name}' from {entry.path.name} in {loaded.load_seconds * 1000:.0f} ms")
+                reloaded.append(name)
+            except Exception as e:
+                print(f"⚠️  Could not reload model '{name}', keeping version {current.version}: {e}")
+        return reloaded
+
+    async def start(self):
+        if self.watch_interval > 0 and (self.task is None or self.task.done()):
+            self.task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _watch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            try:
+                await loop.run_in_executor(None, self.check_for_updates)
+            except Exception as e:
+                print(f"⚠️  Model watch error: {e}")
+
+    def stats(self) -> Dict:
+        models = {}
+        for name, entry in self.entries.items():
+            current = entry.current
+            models[name] = {
+                "path": entry.label,
+                "loaded": current is not None,
+                "version": current.version if current else None,
+                "loaded_at": current.loaded_at if current else None,
+                "load_ms": round(current.load_seconds * 1000, 1) if current else None,
+                "unpickle_ms": round(current.unpickle_seconds * 1000, 1) if current else None,
+                "mmap": current.mmap if current else None,
+                "loads": entry.loads,
+                "failures": entry.failures,
+                "last_error": entry.last_error,
+            }
+        return {"watching": self.task is not None and not self.task.done(), "models": models}
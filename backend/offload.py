@@ -0,0 +1,109 @@
+"""
+Bounded offloading of blocking handler work to thread pools
+
+Each OffloadLane runs one kind of blocking call (model inference, sensor
+start/stop) in its own executor, so a slow call of one kind cannot use up the
+threads another kind needs. The event loop keeps serving everything else, such
+as /health.
+
+A lane caps how many calls run at once and how many may wait for a slot.
+Beyond that it sheds load with 503. A call that waits too long for a slot
+also gets 503, and one that runs past its timeout gets 504. Python cannot
+interrupt a thread, so a timed-out call keeps running and keeps its slot until
+it returns. The concurrency limit therefore holds even under timeouts.
+"""
+import asyncio
+import functools
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+
+class OffloadLane:
+    def __init__(self, name: str, max_concurrency: int, timeout: float, max_waiting: int = 64,
+                 queue_timeout: Optional[float] = None, executor: Optional[Executor] = None):
+        """
+        timeout is how long (seconds) a request waits for the call itself; queue_timeout
+        (default: timeout) how long it may wait for a free slot. <= 0 disables a timeout.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be >= 1")
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_waiting = max_waiting
+        self.queue_timeout = timeout if queue_timeout is None else queue_timeout
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=name)
+        # Created on first use, inside the server's event loop
+        self.semaphore: Optional[asyncio.Semaphore] = None
+
+        # Metrics
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) in the lane's executor and return its result (or raise its exception)"""
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail=f"Server busy ({self.name}); try again shortly.",
+                                headers={"Retry-After": "1"})
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout if self.queue_timeout > 0 else None)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail=f"Server busy ({self.name}); try again shortly.",
+                                headers={"Retry-After": "1"})
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+        future.add_done_callback(functools.partial(self._finished, start))
+        try:
+            # shield: a timeout or client disconnect must not orphan the slot the call still holds
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout if self.timeout > 0 else None)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise HTTPException(status_code=504, detail=f"{self.name} did not finish within {self.timeout:g}s.")
+
+    def _finished(self, start: float, future: asyncio.Future):
+        elapsed = time.perf_counter() - start
+        self.running -= 1
+        self.total_seconds += elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+        self.semaphore.release()
+
+    def stats(self) -> Dict:
+        calls = self.completed + self.failed
+        return {
+            "max_concurrency": self.max_concurrency,
+            "timeout_s": self.timeout,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "avg_ms": round(1000 * self.total_seconds / calls, 2) if calls else None,
+            "max_ms": round(1000 * self.max_seconds, 2),
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
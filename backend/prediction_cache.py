@@ -0,0 +1,140 @@
+"""
+LRU/TTL cache for single-row predictions
+
+Keys are built from the WaterQualityInput fields. An optional per-feature
+quantization step (e.g. Temp=0.1) maps near-duplicate readings to the same key.
+Entries are tagged with the model version that produced them. The model
+registry reports every newly loaded version through set_version(), which
+clears the cache.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+
+def parse_quantization(spec: str) -> Dict[str, float]:
+    """Parse 'Temp=0.1,pH=0.05' into {'Temp': 0.1, 'pH': 0.05}"""
+    steps = {}
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        name, sep, value = part.partition('=')
+        if not sep:
+            raise ValueError(f"Invalid quantization entry '{part}', expected FEATURE=STEP")
+        step = float(value)
+        if step <= 0:
+            raise ValueError(f"Quantization step for {name.strip()} must be > 0")
+        steps[name.strip()] = step
+    return steps
+
+
+class PredictionCache:
+    def __init__(self, max_entries: int = 4096, ttl_seconds: float = 300.0,
+                 quantization: Optional[Dict[str, float]] = None):
+        """
+        max_entries bounds memory (oldest entries are evicted first).
+        ttl_seconds <= 0 disables expiry.
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be >= 1")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.quantization = dict(quantization or {})
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.version: Optional[str] = None
+        self.entry_bytes: Optional[int] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def make_key(self, input_dict: Dict[str, float], features: List[str]) -> tuple:
+        """Ordered, optionally quantized tuple of feature values"""
+        key = []
+        for feat in features:
+            value = input_dict.get(feat)
+            step = self.quantization.get(feat)
+            if step is not None and value is not None:
+                value = int(round(value / step))
+            key.append(value)
+        return tuple(key)
+
+    def set_version(self, version: Optional[str]):
+        """Tag the cache with the current model version, clearing it if that changed"""
+        with self.lock:
+            if version != self.version:
+                if self.entries:
+                    self.invalidations += 1
+                self.entries.clear()
+                self.version = version
+
+    def clear(self):
+        with self.lock:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at is not None and now >= expires_at:
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, version: Optional[str] = None):
+        """Store a result; skipped if it was computed by a model version that is no longer current"""
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else None
+        with self.lock:
+            if version is not None and version != self.version:
+                return
+            if self.entry_bytes is None:
+                self.entry_bytes = self._estimate_entry_bytes(key, value)
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    @staticmethod
+    def _estimate_entry_bytes(key: tuple, value: Any) -> int:
+        """Rough per-entry footprint: key tuple, its floats, the cached object and its fields"""
+        size = sys.getsizeof(key) + sum(sys.getsizeof(v) for v in key)
+        size += sys.getsizeof(value) + sys.getsizeof((None, None))
+        fields = getattr(value, '__dict__', {})
+        size += sum(sys.getsizeof(v) for v in fields.values())
+        return size
+
+    def stats(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "quantization": self.quantization,
+                "model_version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "approx_bytes": len(self.entries) * (self.entry_bytes or 0),
+                "max_approx_bytes": self.max_entries * (self.entry_bytes or 0),
+            }
@@ -1 +1,115 @@
+#!/usr/bin/env python3
+"""
+Start the AWARE API, optionally with several worker processes
 
+With --workers 1 (the default) this is the same as `python main.py`: one
+process serves predictions and runs the sensor and graph itself.
+
+With --workers N, uvicorn starts N workers that share the port and spread
+/api/predict across cores. The sensor and the live graph must exist once, so
+this script first starts a coordinator process that owns them. Each worker
+forwards sensor/graph commands to it (see coordinator.py), and every worker
+reads readings from the shared sensor store.
+
+Usage:
+    python run_server.py                      # single process
+    python run_server.py --workers 4          # 4 prediction workers + coordinator
+"""
+import argparse
+import asyncio
+import os
+import secrets
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+BACKEND_DIR = Path(__file__).parent.absolute()
+
+
+def free_port(host: str) -> int:
+    with socket.socket() as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(host: str, port: int, proc: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Coordinator exited with code {proc.returncode}")
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Coordinator did not start listening on {host}:{port} within {timeout:.0f}s")
+
+
+def run_coordinator(address: str, token: str):
+    """Coordinator process: serve sensor/graph commands until terminated"""
+    import main
+    from coordinator import parse_address
+
+    host, port = parse_address(address)
+
+    async def serve():
+        task = asyncio.create_task(main.run_coordinator(host, port, token))
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, task.cancel)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: the parent terminates the process
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(serve())
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Run the AWARE API server')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes serving requests')
+    parser.add_argument('--coordinator', default=None, help=argparse.SUPPRESS)  # internal: run as coordinator
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    import uvicorn
+
+    if args.coordinator:
+        run_coordinator(args.coordinator, os.environ.get("AWARE_COORDINATOR_TOKEN", ""))
+        return
+
+    if args.workers <= 1:
+        uvicorn.run("main:app", host=args.host, port=args.port, app_dir=str(BACKEND_DIR))
+        return
+
+    # The coordinator only listens on loopback; the token keeps other local processes out
+    coordinator_host = "127.0.0.1"
+    address = f"{coordinator_host}:{os.environ.get('AWARE_COORDINATOR_PORT') or free_port(coordinator_host)}"
+    os.environ["AWARE_COORDINATOR"] = address
+    os.environ["AWARE_COORDINATOR_TOKEN"] = secrets.token_hex(16)
+
+    coordinator = subprocess.Popen([sys.executable, str(Path(__file__).absolute()), '--coordinator', address],
+                                   cwd=BACKEND_DIR)
+    try:
+        wait_for_port(coordinator_host, int(address.rsplit(':', 1)[1]), coordinator)
+        print(f"🚀 Starting {args.workers} workers on {args.host}:{args.port} (coordinator {address})")
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers, app_dir=str(BACKEND_DIR))
+    finally:
+        coordinator.terminate()
+        try:
+            coordinator.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            coordinator.kill()
+
+
+if __name__ == "__main__":
+    main()
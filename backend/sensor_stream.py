@@ -0,0 +1,194 @@
+"""
+In-memory fan-out of live sensor readings to Server-Sent Events clients
+
+The sensor thread publishes each stored reading once. The broadcaster hands it
+to the event loop, which copies it into every subscriber's bounded queue, so N
+dashboards cost N queue puts instead of N file reads. Events carry the
+reading's ring-store sequence number as their SSE id. A client that reconnects
+with Last-Event-ID (or ?since=) is backfilled from the store before it gets
+live events. A subscriber that falls too far behind is disconnected; its
+EventSource reconnects and resumes from its last id. Workers that do not run
+the sensor (run_server.py --workers) follow the store instead (follow_store).
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+
+class Subscription:
+    def __init__(self, max_queue: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+
+class SensorBroadcaster:
+    def __init__(self, store_reader=None, max_queue: int = 256, max_backfill: int = 500,
+                 keepalive_seconds: float = 15.0):
+        """
+        store_reader is a SensorStore reader used to backfill reconnecting clients.
+        max_queue bounds per-client memory. max_backfill caps how many stored
+        readings one (re)connect can replay.
+        """
+        self.store_reader = store_reader
+        self.max_queue = max_queue
+        self.max_backfill = max_backfill
+        self.keepalive_seconds = keepalive_seconds
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.subscribers: List[Subscription] = []
+        self.running = False
+
+        # Metrics
+        self.published = 0
+        self.delivered = 0
+        self.backfilled = 0
+        self.dropped_subscribers = 0
+        self.total_connections = 0
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Bind to the server's event loop; publish() calls from other threads are routed onto it"""
+        self.loop = loop
+
+    # ------------------------------------------------------------------ publishing
+
+    def publish(self, reading: Dict[str, Any]):
+        """Publish a stored reading (must carry 'seq'). Safe to call from any thread"""
+        self._post(('reading', reading))
+
+    def publish_status(self, running: bool):
+        """Tell every client whether the sensor is running"""
+        self.running = running
+        self._post(('status', {'running': running}))
+
+    def _post(self, event: tuple):
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is loop:
+            self._dispatch(event)
+        else:
+            try:
+                loop.call_soon_threadsafe(self._dispatch, event)
+            except RuntimeError:  # loop shut down between the check and the call
+                pass
+
+    def _dispatch(self, event: tuple):
+        if event[0] == 'reading':
+            self.published += 1
+        for sub in self.subscribers:
+            if sub.overflowed:
+                continue
+            try:
+                sub.queue.put_nowait(event)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                # Slow client: drop it rather than buffer without bound; it resumes on reconnect
+                sub.overflowed = True
+                self.dropped_subscribers += 1
+
+    async def follow_store(self, interval: float = 0.25, status: Optional[Callable[[], Awaitable[bool]]] = None,
+                           status_every: float = 2.0):
+        """
+        Publish readings another process appends to the store, for workers that do not
+        run the sensor themselves (multi-worker mode). `status` is polled every
+        `status_every` seconds for the sensor's running state. Runs until cancelled.
+        """
+        last = self.store_reader.last_seq if self.store_reader is not None else 0
+        next_status = 0.0
+        loop = asyncio.get_running_loop()
+        while True:
+            if self.store_reader is not None:
+                seq = self.store_reader.last_seq
+                if seq < last:
+                    last = 0  # store was recreated
+                if seq > last:
+                    for row in self.store_reader.since(max(last, seq - self.max_backfill), limit=self.max_backfill):
+                        self.publish(row)
+                    last = seq
+            if status is not None and loop.time() >= next_status:
+                next_status = loop.time() + status_every
+                try:
+                    running = await status()
+                    if running != self.running:
+                        self.publish_status(running)
+                except Exception:
+                    pass  # coordinator briefly unreachable; keep the last known state
+            await asyncio.sleep(interval)
+
+    # ------------------------------------------------------------------ subscribing
+
+    def _backfill(self, since: Optional[int], backlog: int) -> List[Dict]:
+        if self.store_reader is None:
+            return []
+        last = self.store_reader.last_seq
+        if since is None or since > last:
+            # Fresh client, or the store was recreated since the client's last id
+            return self.store_reader.latest(min(backlog, self.max_backfill))
+        since = max(since, last - self.max_backfill)
+        return self.store_reader.since(since, limit=self.max_backfill)
+
+    async def stream(self, since: Optional[int] = None, backlog: int = 50,
+                     is_disconnected=None) -> AsyncIterator[str]:
+        """
+        SSE body for one client: current status, readings after `since` (or the
+        newest `backlog` readings), then live events until the client goes away.
+        """
+        sub = Subscription(self.max_queue)
+        # Register before reading the store so nothing published in between is lost;
+        # duplicates are filtered by sequence number below.
+        self.subscribers.append(sub)
+        self.total_connections += 1
+        last_seq = since or 0
+        if self.store_reader is not None and last_seq > self.store_reader.last_seq:
+            last_seq = 0  # store was recreated since the client's last id and numbering restarted
+        try:
+            yield f"retry: 3000\n\n{format_event('status', {'running': self.running})}"
+            for row in self._backfill(since, backlog):
+                last_seq = row['seq']
+                self.backfilled += 1
+                yield format_event('reading', row, event_id=row['seq'])
+
+            while True:
+                try:
+                    kind, payload = await asyncio.wait_for(sub.queue.get(), self.keepalive_seconds)
+                except asyncio.TimeoutError:
+                    if is_disconnected is not None and await is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                if kind == 'reading':
+                    if payload['seq'] <= last_seq:
+                        if self.store_reader is None or self.store_reader.last_seq >= last_seq:
+                            continue
+                        # The store was recreated while this client was connected
+                    last_seq = payload['seq']
+                    yield format_event('reading', payload, event_id=payload['seq'])
+                else:
+                    yield format_event(kind, payload)
+                if sub.overflowed and sub.queue.empty():
+                    break
+        finally:
+            self.subscribers.remove(sub)
+
+    def metrics(self) -> Dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "connections": self.total_connections,
+            "published": self.published,
+            "delivered": self.delivered,
+            "backfilled": self.backfilled,
+            "dropped_subscribers": self.dropped_subscribers,
+            "max_queue": self.max_queue,
+        }
+
+
+def format_event(event: str, data: Dict, event_id: Optional[int] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
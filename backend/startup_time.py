@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Cold-start time of the API, broken down by step
+
+Each run starts a fresh Python process that imports main.py, runs the
+FastAPI startup hooks and waits until /health/ready would report ready. It
+prints how long each step took: import, unpickle, prepare (compiled forest
+check, class decoding), the warm-up inference and the total time to ready.
+The medians can be tracked in CI, and --budget-ms fails the run when
+time-to-ready exceeds it.
+
+Usage:
+    python startup_time.py --runs 5
+    python startup_time.py --mode background --json
+    python startup_time.py --budget-ms 3000            # exit 1 if slower
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).parent.absolute()
+STEPS = ['import', 'unpickle', 'prepare', 'warmup_inference', 'ready']
+MARKER = 'STARTUP_TIMINGS '
+
+# Runs in the child process: everything main.py does before it can serve a prediction
+CHILD = f'''
+import asyncio, json, sys
+import main
+
+async def run():
+    await main.app.router.startup()
+    while not main.is_ready() and main.startup_state["stage"] != "failed":
+        await asyncio.sleep(0.005)
+    await main.app.router.shutdown()
+
+asyncio.run(run())
+state = main.startup_state
+print({MARKER!r} + json.dumps({{"stage": state["stage"], "error": state["error"], "timings_ms": state["timings_ms"],
+                                 "heavy_modules": [m for m in ("pandas", "sklearn") if m in sys.modules]}}))
+'''
+
+
+def measure_once(mode: str) -> Dict:
+    env = dict(os.environ, AWARE_STARTUP_MODE=mode, AWARE_MODEL_WATCH_INTERVAL='0', PYTHONUNBUFFERED='1')
+    proc = subprocess.run([sys.executable, '-c', CHILD], cwd=BACKEND_DIR, env=env,
+                          capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith(MARKER):
+            return json.loads(line[len(MARKER):])
+    raise RuntimeError(f"Startup run failed (exit {proc.returncode}):\n{proc.stderr[-2000:]}")
+
+
+def summarize(runs: List[Dict]) -> Dict:
+    summary = {}
+    for step in STEPS:
+        values = [run['timings_ms'][step] for run in runs if step in run['timings_ms']]
+        if values:
+            summary[step] = {'median_ms': round(statistics.median(values), 1), 'max_ms': max(values)}
+    return summary
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Measure API cold-start time by step')
+    parser.add_argument('--runs', type=int, default=3, help='Fresh processes to start')
+    parser.add_argument('--mode', choices=['eager', 'background'], default='eager', help='AWARE_STARTUP_MODE')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    parser.add_argument('--budget-ms', type=float, default=None, help='Fail if median time-to-ready is above this')
+    args = parser.parse_args(argv)
+
+    runs = [measure_once(args.mode) for _ in range(args.runs)]
+    failed = [run for run in runs if run['stage'] != 'ready']
+    report = {'mode': args.mode, 'runs': len(runs), 'steps': summarize(runs),
+              'heavy_modules_loaded': runs[-1]['heavy_modules'], 'failed': len(failed)}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Startup ({args.mode}, {len(runs)} runs):")
+        for step, values in report['steps'].items():
+            print(f"  {step:<17} median {values['median_ms']:8.1f} ms   max {values['max_ms']:8.1f} ms")
+        print(f"  Heavy modules loaded: {', '.join(report['heavy_modules_loaded']) or 'none'}")
+
+    if failed:
+        print(f"❌ {len(failed)} run(s) did not become ready: {failed[0]['error']}", file=sys.stderr)
+        return 1
+    ready = report['steps'].get('ready', {}).get('median_ms')
+    if args.budget_ms is not None and ready is not None and ready > args.budget_ms:
+        print(f"❌ Time to ready {ready:.0f} ms is over the {args.budget_ms:.0f} ms budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Compiled tree-ensemble evaluator for AWARE RandomForest artifacts
+
+Flattens a fitted RandomForestClassifier, plus the SimpleImputer/StandardScaler
+preprocessing from its pipeline, into plain NumPy node arrays. At request time
+the forest is scored by stepping every tree down one level at a time for all
+rows at once. sklearn is only needed for the export step.
+
+Probabilities match sklearn's: inputs are cast to float32 before the threshold
+comparisons, per-tree leaf distributions are taken exactly as
+DecisionTreeClassifier.predict_proba returns them, and trees are accumulated
+in estimator order.
+
+Usage:
+    python compiled_forest.py export rf_water_model.joblib
+    python compiled_forest.py bench rf_water_model.joblib --rows 1 --repeat 200
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from file_hash import file_sha256
+
+# Sidecar written next to the joblib artifact, e.g. rf_water_model.forest.npz
+COMPILED_SUFFIX = ".forest.npz"
+# Rows scored per traversal block; bounds the (rows, trees, classes) gather
+BLOCK_ROWS = 1024
+
+
+def compiled_path_for(artifact_path: Path) -> Path:
+    """Default location of the compiled sidecar for a joblib artifact"""
+    artifact_path = Path(artifact_path)
+    return artifact_path.with_name(artifact_path.stem + COMPILED_SUFFIX)
+
+
+def flatten_forest(forest) -> Dict[str, np.ndarray]:
+    """
+    Concatenate the node arrays of every tree in a fitted forest.
+
+    Leaves are turned into self-loops (both children point at the leaf itself)
+    so traversal can run a fixed number of steps without masking.
+    """
+    import sklearn
+
+    # sklearn >= 1.4 stores class fractions in tree_.value and returns them as-is;
+    # older releases store weighted counts and normalise at predict time
+    normalize_leaves = tuple(int(p) for p in sklearn.__version__.split('.')[:2]) < (1, 4)
+
+    lefts, rights, feats, thresholds, missing_left, probas, roots = [], [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for est in forest.estimators_:
+        tree = est.tree_
+        n = tree.node_count
+        idx = np.arange(n, dtype=np.int64)
+        is_leaf = tree.children_left == -1
+
+        left = np.where(is_leaf, idx, tree.children_left) + offset
+        right = np.where(is_leaf, idx, tree.children_right) + offset
+        feat = np.where(is_leaf, 0, tree.feature)
+        thr = np.where(is_leaf, np.inf, tree.threshold)
+        nodes = tree.__getstate__()['nodes']
+        if 'missing_go_to_left' in nodes.dtype.names:
+            mgl = nodes['missing_go_to_left'].astype(bool) & ~is_leaf
+        else:
+            mgl = np.zeros(n, dtype=bool)
+
+        # Same leaf distribution as DecisionTreeClassifier.predict_proba
+        value = tree.value[:, 0, :forest.n_classes_].astype(np.float64)
+        if normalize_leaves:
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            value = value / normalizer
+        proba = value
+
+        lefts.append(left)
+        rights.append(right)
+        feats.append(feat)
+        thresholds.append(thr)
+        missing_left.append(mgl)
+        probas.append(proba)
+        roots.append(offset)
+        max_depth = max(max_depth, tree.max_depth)
+        offset += n
+
+    return {
+        'left': np.concatenate(lefts).astype(np.int64),
+        'right': np.concatenate(rights).astype(np.int64),
+        'feature': np.concatenate(feats).astype(np.int64),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'missing_left': np.concatenate(missing_left),
+        'proba': np.concatenate(probas),
+        'roots': np.asarray(roots, dtype=np.int64),
+        'max_depth': np.asarray(max_depth, dtype=np.int64),
+        'classes': np.asarray(forest.classes_),
+    }
+
+
+def _fold_preprocessor(step, arrays: Dict[str, Optional[np.ndarray]]):
+    """Record the parameters of a supported preprocessing step into `arrays`"""
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    if isinstance(step, Pipeline):
+        for _, sub in step.steps:
+            _fold_preprocessor(sub, arrays)
+    elif isinstance(step, SimpleImputer):
+        if arrays['impute'] is not None or arrays['mean'] is not None or arrays['scale'] is not None:
+            raise ValueError("Imputer must be the first preprocessing step")
+        if not (isinstance(step.missing_values, float) and np.isnan(step.missing_values)):
+            raise ValueError("Only SimpleImputer(missing_values=np.nan) is supported")
+        if step.add_indicator:
+            raise ValueError("SimpleImputer(add_indicator=True) is not supported")
+        stats = np.asarray(step.statistics_, dtype=np.float64)
+        if np.isnan(stats).any():
+            raise ValueError("Imputer dropped all-missing features; cannot compile")
+        arrays['impute'] = stats
+    elif isinstance(step, StandardScaler):
+        if arrays['mean'] is not None or arrays['scale'] is not None:
+            raise ValueError("Only one StandardScaler is supported")
+        arrays['mean'] = np.asarray(step.mean_, dtype=np.float64) if step.with_mean else None
+        arrays['scale'] = np.asarray(step.scale_, dtype=np.float64) if step.with_std else None
+    elif step is None or step == 'passthrough':
+        pass
+    else:
+        raise ValueError(f"Unsupported preprocessing step: {type(step).__name__}")
+
+
+def unpack_artifact(artifact) -> Tuple[object, Dict[str, Optional[np.ndarray]], List[str], object]:
+    """
+    Split an AWARE model artifact into (forest, preprocessing arrays, features, label_encoder).
+
+    Handles the pipeline artifact from AWARE_random_forest_updated.ipynb,
+    the legacy {'model', 'imputer'} layout and the forecast model
+    ({'model', 'lag_features'}).
+    """
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import Pipeline
+
+    arrays = {'impute': None, 'mean': None, 'scale': None}
+    if not isinstance(artifact, dict):
+        raise ValueError("Expected a dict artifact with 'pipeline' or 'model'")
+
+    features = artifact.get('features') or artifact.get('lag_features')
+    if not features:
+        raise ValueError("Artifact missing 'features' / 'lag_features'")
+    features = list(features)
+
+    if 'pipeline' in artifact:
+        pipeline = artifact['pipeline']
+        if not isinstance(pipeline, Pipeline):
+            raise ValueError("artifact['pipeline'] is not a sklearn Pipeline")
+        forest = pipeline.steps[-1][1]
+        for _, step in pipeline.steps[:-1]:
+            if isinstance(step, ColumnTransformer):
+                active = [(name, trans, cols) for name, trans, cols in step.transformers_
+                          if trans != 'drop' and len(cols) > 0]
+                if len(active) != 1 or list(active[0][2]) != features:
+                    raise ValueError("ColumnTransformer must apply one transformer to all features in order")
+                _fold_preprocessor(active[0][1], arrays)
+            else:
+                _fold_preprocessor(step, arrays)
+    elif 'model' in artifact:
+        forest = artifact['model']
+        if artifact.get('imputer') is not None:
+            _fold_preprocessor(artifact['imputer'], arrays)
+    else:
+        raise ValueError("Artifact must contain either 'pipeline' or 'model'")
+
+    if not isinstance(forest, RandomForestClassifier):
+        raise ValueError(f"Only RandomForestClassifier can be compiled, got {type(forest).__name__}")
+    if forest.n_outputs_ != 1:
+        raise ValueError("Multi-output forests are not supported")
+    return forest, arrays, features, artifact.get('label_encoder')
+
+
+class CompiledForest:
+    """sklearn-free evaluator over flattened forest arrays"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], features: List[str], meta: Optional[Dict] = None):
+        if 'children' in arrays:
+            # Interleaved [left, right] pairs, as model_bundle.py stores them; no copy of a mapped array
+            self.children = arrays['children']
+            self.left = self.children[0::2]
+            self.right = self.children[1::2]
+        else:
+            self.left = arrays['left']
+            self.right = arrays['right']
+            self.children = np.stack([self.left, self.right], axis=1).ravel()
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.missing_left = arrays['missing_left']
+        self.proba = arrays['proba']
+        self.roots = arrays['roots']
+        self.max_depth = int(arrays['max_depth'])
+        self.classes_ = arrays['classes']
+        self.impute = arrays.get('impute')
+        self.mean = arrays.get('mean')
+        self.scale = arrays.get('scale')
+        self.features = list(features)
+        self.meta = meta or {}
+        self.has_missing_routing = bool(self.missing_left.any())
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    @classmethod
+    def from_artifact(cls, artifact, source: Optional[Path] = None) -> 'CompiledForest':
+        """Compile an in-memory artifact dict"""
+        forest, pre, features, label_encoder = unpack_artifact(artifact)
+        arrays = flatten_forest(forest)
+        arrays.update(pre)
+        meta = {'features': features}
+        if label_encoder is not None:
+            meta['labels'] = [str(c) for c in label_encoder.inverse_transform(forest.classes_)]
+        if source is not None:
+            meta['source'] = Path(source).name
+            meta['source_sha256'] = file_sha256(source)
+        return cls(arrays, features, meta)
+
+    def save(self, path: Path):
+        """Write arrays and metadata to a single .npz file"""
+        arrays = {
+            'left': self.left, 'right': self.right, 'feature': self.feature,
+            'threshold': self.threshold, 'missing_left': self.missing_left,
+            'proba': self.proba, 'roots': self.roots,
+            'max_depth': np.asarray(self.max_depth), 'classes': self.classes_,
+        }
+        for key in ('impute', 'mean', 'scale'):
+            if getattr(self, key) is not None:
+                arrays[key] = getattr(self, key)
+        arrays['meta'] = np.asarray(json.dumps(self.meta))
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: Path) -> 'CompiledForest':
+        """Load a forest written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files}
+        meta = json.loads(str(arrays.pop('meta')))
+        return cls(arrays, meta['features'], meta)
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """Apply the folded imputer/scaler and cast to float32 like sklearn's tree input"""
+        X = np.array(X, dtype=np.float64, copy=True)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != len(self.features):
+            raise ValueError(f"Expected {len(self.features)} features, got {X.shape[1]}")
+        if self.impute is not None:
+            missing = np.isnan(X)
+            if missing.any():
+                X[missing] = np.broadcast_to(self.impute, X.shape)[missing]
+        if self.mean is not None:
+            X -= self.mean
+        if self.scale is not None:
+            X /= self.scale
+        return X.astype(np.float32)
+
+    def apply(self, X32: np.ndarray) -> np.ndarray:
+        """Global leaf index reached in every tree, shape (rows, trees)"""
+        n_rows, n_features = X32.shape
+        flat = np.ascontiguousarray(X32).ravel()
+        row_base = (np.arange(n_rows) * n_features)[:, np.newaxis]
+        node = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            x = flat.take(row_base + self.feature.take(node))
+            go_left = x <= self.threshold.take(node)
+            if self.has_missing_routing:
+                go_left |= np.isnan(x) & self.missing_left.take(node)
+            # children holds [left, right] pairs, so index 2*node + went_right
+            node = self.children.take(2 * node + ~go_left)
+        return node
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Class probabilities in the order of `classes_`"""
+        X32 = self.transform(X)
+        n_trees = len(self.roots)
+        out = np.empty((X32.shape[0], self.proba.shape[1]), dtype=np.float64)
+        for start in range(0, X32.shape[0], BLOCK_ROWS):
+            leaves = self.apply(X32[start:start + BLOCK_ROWS])
+            # Reducing over the non-contiguous tree axis sums trees in estimator order
+            # (in float64 also when the leaf table is stored as float32)
+            out[start:start + BLOCK_ROWS] = self.proba.take(leaves, axis=0).sum(axis=1, dtype=np.float64)
+        out /= n_trees
+        return out
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Encoded class labels, as RandomForestClassifier.predict"""
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+def sklearn_predict_proba(artifact, X: np.ndarray) -> np.ndarray:
+    """Reference probabilities from the original sklearn objects"""
+    import pandas as pd
+
+    forest, _, features, _ = unpack_artifact(artifact)
+    if 'pipeline' in artifact:
+        return artifact['pipeline'].predict_proba(pd.DataFrame(X, columns=features))
+    X_ready = X
+    if artifact.get('imputer') is not None:
+        X_ready = artifact['imputer'].transform(pd.DataFrame(X, columns=features))
+    if getattr(forest, 'feature_names_in_', None) is not None:
+        X_ready = pd.DataFrame(X_ready, columns=features)
+    return forest.predict_proba(X_ready)
+
+
+def parity_sample(compiled: CompiledForest, n_rows: int = 2000, seed: int = 42) -> np.ndarray:
+    """Random rows spanning the split thresholds of every feature, with some NaNs when imputation exists"""
+    rng = np.random.default_rng(seed)
+    n_features = len(compiled.features)
+    X = np.empty((n_rows, n_features))
+    internal = np.isfinite(compiled.threshold)
+    for j in range(n_features):
+        thr = compiled.threshold[internal & (compiled.feature == j)]
+        if len(thr) == 0:
+            X[:, j] = rng.normal(size=n_rows)
+            continue
+        # Values in the scaled space the thresholds live in
+        picks = rng.choice(thr, size=n_rows)
+        jitter = rng.normal(scale=max(np.std(thr), 1e-6) * 0.05, size=n_rows)
+        X[:, j] = picks + jitter
+        # Exact thresholds exercise the <= boundary
+        X[: n_rows // 20, j] = picks[: n_rows // 20]
+    # Map from scaled space back to raw inputs
+    if compiled.scale is not None:
+        X *= compiled.scale
+    if compiled.mean is not None:
+        X += compiled.mean
+    if compiled.impute is not None:
+        X[rng.random(X.shape) < 0.05] = np.nan
+    return X
+
+
+def verify_parity(artifact, compiled: CompiledForest, X: np.ndarray, atol: float = 1e-12) -> Dict:
+    """Compare compiled and sklearn probabilities; raise AssertionError on mismatch"""
+    import warnings
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        expected = sklearn_predict_proba(artifact, X)
+    actual = compiled.predict_proba(X)
+    max_diff = float(np.max(np.abs(expected - actual))) if len(X) else 0.0
+    label_match = bool(np.array_equal(np.argmax(expected, axis=1), np.argmax(actual, axis=1)))
+    if max_diff > atol or not label_match:
+        raise AssertionError(f"Compiled forest mismatch: max |diff|={max_diff:.3e}, labels match={label_match}")
+    return {'rows': int(len(X)), 'max_abs_diff': max_diff, 'labels_match': label_match}
+
+
+def export(artifact_path: Path, out_path: Optional[Path] = None, verify: bool = True) -> Path:
+    """Compile a joblib artifact, check parity against sklearn and write the sidecar"""
+    import joblib
+
+    artifact_path = Path(artifact_path)
+    out_path = Path(out_path) if out_path else compiled_path_for(artifact_path)
+    artifact = joblib.load(artifact_path)
+    compiled = CompiledForest.from_artifact(artifact, source=artifact_path)
+    if verify:
+        report = verify_parity(artifact, compiled, parity_sample(compiled))
+        print(f"✅ Parity check passed on {report['rows']} rows (max |diff| = {report['max_abs_diff']:.2e})")
+    compiled.save(out_path)
+    print(f"✅ Compiled {compiled.n_estimators} trees ({len(compiled.left)} nodes) -> {out_path}")
+    return out_path
+
+
+def load_if_fresh(artifact_path: Path, compiled_path: Optional[Path] = None) -> Optional[CompiledForest]:
+    """Load the compiled sidecar only if it was exported from the current artifact bytes"""
+    artifact_path = Path(artifact_path)
+    compiled_path = Path(compiled_path) if compiled_path else compiled_path_for(artifact_path)
+    if not compiled_path.exists() or not artifact_path.exists():
+        return None
+    compiled = CompiledForest.load(compiled_path)
+    if compiled.meta.get('source_sha256') != file_sha256(artifact_path):
+        return None
+    return compiled
+
+
+def benchmark(artifact_path: Path, rows: int = 1, repeat: int = 200) -> Dict:
+    """Time sklearn predict_proba vs the compiled evaluator on identical inputs"""
+    import warnings
+
+    import joblib
+
+    artifact = joblib.load(artifact_path)
+    compiled = CompiledForest.from_artifact(artifact)
+    X = parity_sample(compiled, n_rows=max(rows, 1))
+    parity = verify_parity(artifact, compiled, parity_sample(compiled))
+
+    def timed(fn) -> List[float]:
+        fn()  # warm-up
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        sk = timed(lambda: sklearn_predict_proba(artifact, X))
+    cf = timed(lambda: compiled.predict_proba(X))
+
+    def summary(samples: List[float]) -> Dict:
+        ms = np.asarray(samples) * 1000.0
+        return {'p50_ms': round(float(np.percentile(ms, 50)), 4), 'p99_ms': round(float(np.percentile(ms, 99)), 4)}
+
+    return {'rows': rows, 'repeat': repeat, 'parity': parity, 'sklearn': summary(sk), 'compiled': summary(cf)}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Export and benchmark compiled RandomForest artifacts')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_export = sub.add_parser('export', help='Flatten a joblib artifact into a .forest.npz sidecar')
+    p_export.add_argument('artifact', type=Path)
+    p_export.add_argument('--out', type=Path, default=None)
+    p_export.add_argument('--no-verify', action='store_true', help='Skip the sklearn parity check')
+
+    p_bench = sub.add_parser('bench', help='Compare sklearn and compiled predict_proba latency')
+    p_bench.add_argument('artifact', type=Path)
+    p_bench.add_argument('--rows', type=int, default=1, help='Rows per predict call')
+    p_bench.add_argument('--repeat', type=int, default=200)
+
+    args = parser.parse_args()
+    if args.command == 'export':
+        export(args.artifact, args.out, verify=not args.no_verify)
+    else:
+        result = benchmark(args.artifact, rows=args.rows, repeat=args.repeat)
+        print(f"Parity: {result['parity']}")
+        print(f"{'path':10s} {'p50 ms':>10s} {'p99 ms':>10s}   ({result['rows']} row(s) x {result['repeat']})")
+        for name in ('sklearn', 'compiled'):
+            print(f"{name:10s} {result[name]['p50_ms']:10.4f} {result[name]['p99_ms']:10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""
+Post-training compression of AWARE RandomForest artifacts
+
+Predict latency, artifact size and per-worker memory all grow with the number
+of trees and nodes. This tool prunes a fitted forest three ways and measures
+what each variant costs in accuracy:
+  - depth capping: nodes at depth d become leaves with their own class
+    distribution (what the tree would predict had it stopped growing there)
+  - leaf merging: two sibling leaves whose class distributions differ by at
+    most --merge-tol (largest absolute difference) are replaced by their
+    parent, bottom-up until no pair qualifies. tol 0 keeps every probability.
+  - tree subset selection: trees are added greedily, each time the one that
+    raises the held-out macro-F1 most (ties: the higher mean probability of
+    the true class). The first k trees of that order form the k-tree variant.
+
+The held-out rows are the artifact's own test split (the notebooks' and
+train_risk_model.py's test_size=0.2, random_state=42, stratified). F1 is
+cross-fitted: trees chosen on one half of those rows score the other half
+and the other way round, so no row is scored by trees it helped choose. The
+written variant uses the order chosen on all held-out rows.
+
+Every variant gets macro-F1, single-row p50/p99 latency through sklearn (what
+the forecast sensor and a backend without the sidecar run) and through
+compiled_forest.py, its node count and its joblib size. Variants that no other
+variant beats on F1, size and serving latency at once are the Pareto front.
+The chosen variant is written in the artifact's own dict format ('pipeline' or
+'model', 'label_encoder', 'features' / 'lag_features', ...) plus a
+'compression' entry, with a compiled sidecar for backend models.
+
+Usage:
+    python compress_forest.py rf_water_model.joblib                       # Pareto table only
+    python compress_forest.py rf_water_model.joblib --output rf_water_model.small.joblib
+    python compress_forest.py rf_forecast_model.joblib --max-f1-drop 0.005 --output /tmp/forecast.joblib
+    python compress_forest.py rf_water_model.joblib --trees 500,100,50 --depths none,6 --merge-tol none,0
+    python compress_forest.py rf_water_model.joblib --pick 7 --output /tmp/rf.joblib --json
+"""
+
+import argparse
+import copy
+import gc
+import io
+import json
+import sys
+import time
+import warnings
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_DATA = BASE_DIR / 'water_dataX.csv'
+TREE_LEAF = -1        # sklearn.tree._tree.TREE_LEAF
+TREE_UNDEFINED = -2   # sklearn.tree._tree.TREE_UNDEFINED
+DEFAULT_DEPTHS = (12, 10, 8, 6, 4)  # caps below the forest's own depth are tried
+DEFAULT_MERGE_TOLS = (0.0, 0.2, 0.5)
+
+
+# ---------------------------------------------------------------------------
+# Pruning
+# ---------------------------------------------------------------------------
+
+def node_depths(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Depth of every node reachable from the root (-1 for unreachable ones)"""
+    depth = np.full(len(left), -1, dtype=np.int64)
+    frontier = np.array([0])
+    d = 0
+    while len(frontier):
+        depth[frontier] = d
+        internal = frontier[left[frontier] != TREE_LEAF]
+        frontier = np.concatenate([left[internal], right[internal]])
+        d += 1
+    return depth
+
+
+def prune_tree(tree, max_depth: Optional[int] = None, merge_tol: Optional[float] = None):
+    """
+    A new sklearn Tree with nodes at depth >= max_depth turned into leaves and
+    close sibling leaves merged, unreachable nodes dropped. `tree` is unchanged.
+    """
+    cls, args, state = tree.__reduce__()
+    nodes, values = state['nodes'], state['values']
+    left, right = nodes['left_child'], nodes['right_child']
+    depth = node_depths(left, right)
+
+    leaf = left == TREE_LEAF
+    if max_depth is not None:
+        leaf |= depth >= max_depth
+    if merge_tol is not None:
+        # Compare distributions even where older sklearn stores weighted counts
+        dist = values[:, 0, :].astype(np.float64)
+        totals = dist.sum(axis=1, keepdims=True)
+        dist = dist / np.where(totals == 0.0, 1.0, totals)
+        for d in range(int(depth.max()) - 1, -1, -1):
+            parents = np.flatnonzero((depth == d) & ~leaf)
+            if not len(parents):
+                continue
+            l, r = left[parents], right[parents]
+            close = np.abs(dist[l] - dist[r]).max(axis=1) <= merge_tol
+            leaf[parents[leaf[l] & leaf[r] & close]] = True
+
+    # Keep what is still reachable, in the original (depth-first) node order
+    keep = []
+    frontier = np.array([0])
+    while len(frontier):
+        keep.append(frontier)
+        internal = frontier[~leaf[frontier]]
+        frontier = np.concatenate([left[internal], right[internal]])
+    keep = np.sort(np.concatenate(keep))
+    new_id = np.full(len(nodes), TREE_LEAF, dtype=np.int64)
+    new_id[keep] = np.arange(len(keep))
+
+    kept_leaf = leaf[keep]
+    new_nodes = nodes[keep].copy()
+    new_nodes['left_child'] = np.where(kept_leaf, TREE_LEAF, new_id[left[keep]])
+    new_nodes['right_child'] = np.where(kept_leaf, TREE_LEAF, new_id[right[keep]])
+    new_nodes['feature'][kept_leaf] = TREE_UNDEFINED
+    new_nodes['threshold'][kept_leaf] = TREE_UNDEFINED
+    if 'missing_go_to_left' in new_nodes.dtype.names:
+        new_nodes['missing_go_to_left'][kept_leaf] = 0
+
+    pruned = cls(*args)
+    pruned.__setstate__({
+        'max_depth': int(depth[keep].max()),
+        'node_count': len(keep),
+        'nodes': new_nodes,
+        'values': np.ascontiguousarray(values[keep]),
+    })
+    return pruned
+
+
+def prune_forest(forest, max_depth: Optional[int] = None, merge_tol: Optional[float] = None):
+    """A copy of a fitted RandomForestClassifier with every tree pruned"""
+    if max_depth is None and merge_tol is None:
+        return forest
+    pruned = copy.copy(forest)
+    pruned.estimators_ = []
+    for est in forest.estimators_:
+        est = copy.copy(est)
+        est.tree_ = prune_tree(est.tree_, max_depth, merge_tol)
+        if max_depth is not None:
+            est.max_depth = max_depth
+        pruned.estimators_.append(est)
+    if max_depth is not None:
+        pruned.max_depth = max_depth
+    return pruned
+
+
+def subset_forest(forest, order: Sequence[int]):
+    """A copy of the forest holding only the trees in `order`"""
+    subset = copy.copy(forest)
+    subset.estimators_ = [forest.estimators_[i] for i in order]
+    subset.n_estimators = len(subset.estimators_)
+    return subset
+
+
+# ---------------------------------------------------------------------------
+# Tree selection
+# ---------------------------------------------------------------------------
+
+def macro_f1(y_true: np.ndarray, y_pred: np.ndarray, n_classes: int) -> np.ndarray:
+    """
+    Macro-F1 of each row of y_pred (shape (..., rows)) against y_true, as
+    sklearn's f1_score(average='macro', zero_division=0): classes that are in
+    neither y_true nor the predictions are left out.
+    """
+    f1_sum = np.zeros(y_pred.shape[:-1])
+    present = np.zeros(y_pred.shape[:-1])
+    for c in range(n_classes):
+        truth = y_true == c
+        pred = y_pred == c
+        tp = (truth & pred).sum(axis=-1)
+        denom = truth.sum() + pred.sum(axis=-1)
+        f1_sum += np.where(denom > 0, 2.0 * tp / np.maximum(denom, 1), 0.0)
+        present += denom > 0
+    return f1_sum / np.maximum(present, 1)
+
+
+def greedy_tree_order(tree_proba: np.ndarray, y: np.ndarray, steps: Optional[int] = None) -> List[int]:
+    """
+    Forward selection over per-tree probabilities (rows, trees, classes):
+    each step adds the tree whose addition gives the best macro-F1 on y,
+    ties broken by the mean probability of the true class. Trees left after
+    `steps` follow in their original order.
+    """
+    n_rows, n_trees, n_classes = tree_proba.shape
+    per_tree = np.ascontiguousarray(tree_proba.transpose(1, 0, 2))  # (trees, rows, classes)
+    true_proba = per_tree[:, np.arange(n_rows), y]                # (trees, rows)
+    total = np.zeros((n_rows, n_classes))
+    total_true = np.zeros(n_rows)
+    remaining = np.arange(n_trees)
+    order = []
+    for _ in range(n_trees if steps is None else min(steps, n_trees)):
+        candidates = total + per_tree[remaining]                  # (remaining, rows, classes)
+        f1 = macro_f1(y, candidates.argmax(axis=2), n_classes)
+        margin = (total_true + true_proba[remaining]).mean(axis=1)
+        best = np.lexsort((-margin, -f1))[0]
+        tree = remaining[best]
+        order.append(int(tree))
+        total += per_tree[tree]
+        total_true += true_proba[tree]
+        remaining = np.delete(remaining, best)
+    return order + [int(tree) for tree in remaining]
+
+
+def per_tree_proba(forest, X: np.ndarray) -> np.ndarray:
+    """Leaf class distributions each tree gives each row, (rows, trees, classes)"""
+    X32 = np.asarray(X, dtype=np.float32)
+    return np.stack([est.predict_proba(X32) for est in forest.estimators_], axis=1)
+
+
+# ---------------------------------------------------------------------------
+# Artifacts and held-out data
+# ---------------------------------------------------------------------------
+
+def forest_of(artifact):
+    from compiled_forest import unpack_artifact
+    return unpack_artifact(artifact)[0]
+
+
+def with_forest(artifact: Dict, forest) -> Dict:
+    """The artifact dict with its forest replaced (preprocessing objects are shared)"""
+    if 'pipeline' in artifact:
+        pipeline = copy.copy(artifact['pipeline'])
+        pipeline.steps = list(pipeline.steps[:-1]) + [(pipeline.steps[-1][0], forest)]
+        return dict(artifact, pipeline=pipeline)
+    return dict(artifact, model=forest)
+
+
+def preprocess(artifact: Dict, X: np.ndarray) -> np.ndarray:
+    """Rows as the forest itself sees them (after the pipeline's preprocessing or imputer)"""
+    import pandas as pd
+
+    from compiled_forest import unpack_artifact
+    _, _, features, _ = unpack_artifact(artifact)
+    if 'pipeline' in artifact:
+        return artifact['pipeline'][:-1].transform(pd.DataFrame(X, columns=features))
+    if artifact.get('imputer') is not None:
+        return artifact['imputer'].transform(pd.DataFrame(X, columns=features))
+    return X
+
+
+def holdout(artifact: Dict, data: Path, test_size: float = 0.2, random_state: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """The artifact's test split of `data`: raw feature rows and encoded labels"""
+    from sklearn.model_selection import train_test_split
+
+    le = artifact['label_encoder']
+    if 'lag_features' in artifact:
+        X, target = forecast_rows(artifact, data)
+    else:
+        from risk_rules import RiskRules
+        from wq_dataset import load_dataset
+        df = load_dataset(data)
+        # train_risk_model.py / the updated notebook's labels
+        df['Risk'] = RiskRules().label(df)
+        df = df[df['Risk'].notna()].reset_index(drop=True)
+        features = list(artifact['features'])
+        X = df.reindex(columns=features).to_numpy(dtype=np.float64)
+        target = df['Risk'].astype(str).to_numpy()
+    known = np.isin(target, le.classes_)
+    X, y = X[known], le.transform(target[known])
+    _, X_test, _, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state, stratify=y)
+    return X_test, y_test
+
+
+def forecast_rows(artifact: Dict, data: Path) -> Tuple[np.ndarray, np.ndarray]:
+    """The forecast notebook's lagged rows (station encoded, NaNs filled with medians) and targets"""
+    from lag_features import build_lagged_dataset, load_training_frame
+
+    lag_features = list(artifact['lag_features'])
+    features = list(dict.fromkeys(name.rsplit('_lag', 1)[0] for name in lag_features if '_lag' in name))
+    df = load_training_frame(data)
+    X_df = build_lagged_dataset(df, features, L=artifact.get('L', 3), H=artifact.get('H', 1),
+                                station_col=artifact.get('station_col'))
+    if 'station_encoded' in lag_features:
+        X_df['station_encoded'] = artifact['station_encoder'].transform(X_df[['station_id']])
+    X = X_df[lag_features].fillna(X_df[lag_features].median())
+    return X.to_numpy(dtype=np.float64), X_df['target'].astype(str).to_numpy()
+
+
+def split_halves(y: np.ndarray, random_state: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """Row indices of two (stratified where possible) halves of the held-out rows"""
+    from sklearn.model_selection import train_test_split
+
+    stratify = y if np.bincount(y).min(initial=len(y)) >= 2 else None
+    return train_test_split(np.arange(len(y)), test_size=0.5, random_state=random_state, stratify=stratify)
+
+
+def cross_fitted_predictions(tree_proba: np.ndarray, y: np.ndarray, halves, orders, k: int) -> np.ndarray:
+    """Each half's labels from the first k trees chosen on the other half"""
+    pred = np.empty(len(y), dtype=np.int64)
+    for rows, order in zip(halves, reversed(orders)):
+        pred[rows] = tree_proba[rows][:, order[:k]].sum(axis=1).argmax(axis=1)
+    return pred
+
+
+def artifact_bytes(artifact: Dict, compress: int = 3) -> int:
+    """Size of the artifact as save_artifact() writes it"""
+    import joblib
+
+    buffer = io.BytesIO()
+    joblib.dump(artifact, buffer, compress=compress)
+    return buffer.tell()
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def latency(predict, X: np.ndarray, repeat: int) -> Dict:
+    """p50/p99 of single-row calls, cycling through the rows of X"""
+    for i in range(min(20, len(X))):  # warm-up
+        predict(X[i:i + 1])
+    gc.collect()  # don't bill this variant for garbage the previous one left
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        row = X[i % len(X):i % len(X) + 1]
+        start = time.perf_counter()
+        predict(row)
+        samples[i] = time.perf_counter() - start
+    ms = samples * 1000.0
+    return {'p50_ms': round(float(np.percentile(ms, 50)), 4), 'p99_ms': round(float(np.percentile(ms, 99)), 4)}
+
+
+def measure(artifact: Dict, y: np.ndarray, pred: np.ndarray, X: np.ndarray, repeat: int) -> Dict:
+    """Scores of the held-out predictions `pred`, then size and latency of the artifact itself"""
+    from compiled_forest import CompiledForest, sklearn_predict_proba
+
+    forest = forest_of(artifact)
+    compiled = CompiledForest.from_artifact(artifact)
+    return {
+        'trees': len(forest.estimators_),
+        'depth': max(est.tree_.max_depth for est in forest.estimators_),
+        'nodes': int(sum(est.tree_.node_count for est in forest.estimators_)),
+        'f1_macro': round(float(macro_f1(y, pred, len(forest.classes_))), 4),
+        'accuracy': round(float(np.mean(pred == y)), 4),
+        'bytes': artifact_bytes(artifact),
+        'sklearn': latency(lambda row: sklearn_predict_proba(artifact, row), X, repeat),
+        'compiled': latency(compiled.predict_proba, X, repeat),
+    }
+
+
+def pareto_front(rows: List[Dict], path: str) -> List[bool]:
+    """True for variants no other variant matches or beats on F1, size and `path` p99 with one strictly better"""
+    keys = [(r['f1_macro'], -r['bytes'], -r[path]['p99_ms']) for r in rows]
+    front = []
+    for a in keys:
+        dominated = any(all(bv >= av for av, bv in zip(a, b)) and b != a for b in keys)
+        front.append(not dominated)
+    return front
+
+
+def tree_counts(n_trees: int) -> List[int]:
+    """n, n/2, n/4, ... down to at least 5 trees"""
+    counts, k = [], n_trees
+    while k >= 5 or not counts:
+        counts.append(k)
+        k //= 2
+    return counts
+
+
+def compress(artifact: Dict, data: Path, trees: Optional[Sequence[int]] = None,
+             depths: Optional[Sequence[Optional[int]]] = None,
+             merge_tols: Sequence[Optional[float]] = DEFAULT_MERGE_TOLS, repeat: int = 200,
+             path: Optional[str] = None, random_state: int = 42) -> Dict:
+    """Measure the original forest and every pruned variant; returns the report with its 'variants'"""
+    forest = forest_of(artifact)
+    # The backend scores water models with the compiled sidecar; the forecast sensor calls sklearn
+    path = path or ('sklearn' if 'lag_features' in artifact else 'compiled')
+    own_depth = max(est.tree_.max_depth for est in forest.estimators_)
+    if depths is None:
+        depths = [None] + [d for d in DEFAULT_DEPTHS if d < own_depth]
+    trees = sorted({min(k, len(forest.estimators_)) for k in (trees or tree_counts(len(forest.estimators_)))},
+                   reverse=True)
+
+    start = time.perf_counter()
+    X, y = holdout(artifact, data, random_state=random_state)
+    Z = preprocess(artifact, X)
+    halves = split_halves(y, random_state)
+    report = {'rows': int(len(y)), 'path': path, 'variants': []}
+
+    original_pred = per_tree_proba(forest, Z).sum(axis=1).argmax(axis=1)
+    original = measure(artifact, y, original_pred, X, repeat)
+    original.update(id=0, max_depth=None, merge_tol=None, original=True)
+    report['variants'].append(original)
+    for depth in depths:
+        for tol in merge_tols:
+            pruned = prune_forest(forest, depth, tol)
+            tree_proba = per_tree_proba(pruned, Z)
+            # Only subsets smaller than the forest depend on the order
+            steps = max([k for k in trees if k < len(forest.estimators_)], default=0)
+            orders = [greedy_tree_order(tree_proba[rows], y[rows], steps) for rows in halves]
+            order = greedy_tree_order(tree_proba, y, steps)
+            for k in trees:
+                if depth is None and tol is None and k == len(forest.estimators_):
+                    continue  # the original
+                pred = cross_fitted_predictions(tree_proba, y, halves, orders, k)
+                variant = with_forest(artifact, subset_forest(pruned, order[:k]))
+                row = measure(variant, y, pred, X, repeat)
+                row.update(id=len(report['variants']), max_depth=depth, merge_tol=tol, order=order[:k])
+                report['variants'].append(row)
+
+    front = pareto_front(report['variants'], path)
+    for row, on_front in zip(report['variants'], front):
+        row['pareto'] = on_front
+    report['seconds'] = round(time.perf_counter() - start, 1)
+    return report
+
+
+def choose(report: Dict, max_f1_drop: float) -> Dict:
+    """The Pareto variant with the lowest serving p99 (then size) within max_f1_drop of the original"""
+    path = report['path']
+    baseline = report['variants'][0]['f1_macro']
+    eligible = [r for r in report['variants'] if r['pareto'] and r['f1_macro'] >= baseline - max_f1_drop]
+    return min(eligible or [report['variants'][0]], key=lambda r: (r[path]['p99_ms'], r['bytes']))
+
+
+def build_variant(artifact: Dict, row: Dict) -> Dict:
+    """Rebuild a measured variant and record how it was made"""
+    forest = forest_of(artifact)
+    variant = artifact
+    if not row.get('original'):
+        pruned = prune_forest(forest, row['max_depth'], row['merge_tol'])
+        variant = with_forest(artifact, subset_forest(pruned, row['order']))
+    variant = dict(variant)
+    variant['compression'] = {
+        'trees': row['trees'], 'original_trees': len(forest.estimators_),
+        'max_depth': row['max_depth'], 'merge_tol': row['merge_tol'],
+        'nodes': row['nodes'], 'f1_macro': row['f1_macro'],
+    }
+    return variant
+
+
+def print_report(report: Dict, chosen: Optional[Dict] = None, pareto_only: bool = False):
+    path = report['path']
+    print(f"{report['rows']} held-out rows (cross-fitted F1); latency is single-row; "
+          f"Pareto on F1 / size / {path} p99  ({report['seconds']:.0f}s)")
+    print(f"{'id':>3} {'trees':>5} {'depth':>5} {'tol':>5} {'nodes':>7} {'F1':>6} {'acc':>6} {'KB':>7} "
+          f"{'sk p50':>7} {'sk p99':>7} {'cf p50':>7} {'cf p99':>7}")
+    for r in report['variants']:
+        if pareto_only and not r['pareto'] and r is not chosen:
+            continue
+        depth = '-' if r['max_depth'] is None else str(r['max_depth'])
+        tol = '-' if r['merge_tol'] is None else f"{r['merge_tol']:g}"
+        mark = ('*' if r['pareto'] else ' ') + ('<' if r is chosen else '')
+        print(f"{r['id']:>3} {r['trees']:>5} {depth:>5} {tol:>5} {r['nodes']:>7} {r['f1_macro']:>6.4f} "
+              f"{r['accuracy']:>6.4f} {r['bytes'] / 1024:>7.0f} {r['sklearn']['p50_ms']:>7.2f} "
+              f"{r['sklearn']['p99_ms']:>7.2f} {r['compiled']['p50_ms']:>7.3f} {r['compiled']['p99_ms']:>7.3f} {mark}")
+    print("(* Pareto front, < chosen; depth/tol '-' = unchanged; times in ms)")
+
+
+def parse_list(text: str, cast):
+    return [None if item.strip().lower() == 'none' else cast(item) for item in text.split(',') if item.strip()]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Prune a RandomForest artifact and tabulate F1 vs latency and size')
+    parser.add_argument('artifact', type=Path, help='rf_water_model.joblib or rf_forecast_model.joblib')
+    parser.add_argument('--data', type=Path, default=DEFAULT_DATA, help='Dataset the artifact was trained on')
+    parser.add_argument('--trees', default=None, help='Tree counts to try (default: n, n/2, n/4, ...)')
+    parser.add_argument('--depths', default=None,
+                        help=f"Depth caps to try, 'none' = uncapped (default: none and {DEFAULT_DEPTHS} below the forest's)")
+    parser.add_argument('--merge-tol', default='0,0.2,0.5', help="Leaf-merge tolerances, 'none' = no merging")
+    parser.add_argument('--repeat', type=int, default=200, help='Single-row calls timed per variant and path')
+    parser.add_argument('--path', choices=['sklearn', 'compiled'], default=None,
+                        help='Latency the Pareto front and choice use (default: how the artifact is served)')
+    parser.add_argument('--max-f1-drop', type=float, default=0.01, help='F1 the chosen variant may lose')
+    parser.add_argument('--pick', type=int, default=None, help='Write this variant id instead of the automatic choice')
+    parser.add_argument('--output', type=Path, default=None, help='Write the chosen variant here')
+    parser.add_argument('--no-compile', action='store_true', help='Do not export a compiled-forest sidecar')
+    parser.add_argument('--pareto-only', action='store_true', help='Only list Pareto-front variants')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args(argv)
+
+    import joblib
+
+    for path in (args.artifact, args.data):
+        if not path.exists():
+            print(f"❌ {path} not found", file=sys.stderr)
+            return 1
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # sklearn version / feature-name warnings
+        artifact = joblib.load(args.artifact)
+        report = compress(artifact, args.data,
+                          trees=parse_list(args.trees, int) if args.trees else None,
+                          depths=parse_list(args.depths, int) if args.depths else None,
+                          merge_tols=parse_list(args.merge_tol, float), repeat=args.repeat, path=args.path)
+    if args.pick is not None:
+        if not 0 <= args.pick < len(report['variants']):
+            print(f"❌ No variant {args.pick}", file=sys.stderr)
+            return 1
+        chosen = report['variants'][args.pick]
+    else:
+        chosen = choose(report, args.max_f1_drop)
+    report['chosen'] = chosen['id']
+
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print_report(report, chosen, args.pareto_only)
+        original = report['variants'][0]
+        path = report['path']
+        print(f"Chosen: variant {chosen['id']} - F1 {chosen['f1_macro']:.4f} (original {original['f1_macro']:.4f}), "
+              f"{chosen['bytes'] / original['bytes']:.0%} of the size, "
+              f"{path} p99 {chosen[path]['p99_ms']:.2f} ms (original {original[path]['p99_ms']:.2f} ms)")
+
+    if args.output:
+        from train_risk_model import save_artifact
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            # Forecast models are served by sklearn, so they get no sidecar
+            info = save_artifact(build_variant(artifact, chosen), args.output,
+                                 compile_forest=not args.no_compile and 'lag_features' not in artifact)
+        print(f"✅ Saved {args.output} ({info['bytes'] / 1e6:.2f} MB)"
+              + (f" and {Path(info['compiled']).name}" if info['compiled'] else ""), file=sys.stderr if args.json else sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
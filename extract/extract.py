@@ -1,20 +1,257 @@
-import camelot
-import pandas as pd
+#!/usr/bin/env python3
+"""
+Extract every table from a CPCB water-quality PDF into table_{i}.csv files.
+
+Pages are split into shards and parsed with camelot (lattice mode) across a
+process pool. Each worker parses its shard one page at a time and writes that
+page's tables to disk right away, so no process ever holds more than one page
+of tables. Tables keep the same global numbering as a single
+camelot.read_pdf(pages="all") call: page order, then order on the page.
+
+A manifest (tables_manifest.json) records each page's content hash and, per
+table, its page, index on the page, shape and checksum. Re-runs only parse
+pages whose content changed (or whose cached output is missing).
+
+If any page fails to parse, no table_*.csv is published: later tables would
+be renumbered. The pages that did parse are cached, the run exits non-zero,
+and the next run retries only the failed pages.
+
+Usage:
+    python extract.py                                   # WQuality_River-Data-2023.pdf -> ./table_*.csv
+    python extract.py report.pdf --workers 8 --pages-per-shard 2
+    python extract.py report.pdf --force                # ignore the manifest and re-parse every page
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from file_hash import file_sha256
 
 # Path to your PDF
-pdf_path = r"WQuality_River-Data-2023.pdf"
+DEFAULT_PDF = "WQuality_River-Data-2023.pdf"
+MANIFEST_NAME = "tables_manifest.json"
+CACHE_DIR_NAME = ".extract_cache"
+MANIFEST_VERSION = 1
+
+
+class ExtractionError(RuntimeError):
+    """Some pages failed to parse; the published table_*.csv files were left as they were"""
+
+
+def page_hashes(pdf_path: Path) -> List[str]:
+    """SHA-256 of each page's content stream and size; pages that did not change keep their hash"""
+    try:
+        from pypdf import PdfReader
+    except ImportError:  # older camelot releases depend on PyPDF2 instead
+        from PyPDF2 import PdfReader
+
+    hashes = []
+    for page in PdfReader(str(pdf_path)).pages:
+        digest = hashlib.sha256()
+        contents = page.get_contents()
+        if contents is not None:
+            digest.update(contents.get_data())
+        digest.update(repr([float(v) for v in page.mediabox]).encode())
+        digest.update(str(page.get('/Rotate', 0)).encode())
+        hashes.append(digest.hexdigest())
+    return hashes
+
+
+def write_atomic_csv(df, path: Path):
+    tmp_path = path.with_name(path.name + '.tmp')
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def extract_pages(pdf_path: str, pages: List[int], cache_dir: str, flavor: str) -> List[Dict]:
+    """
+    Worker: parse `pages` one at a time and write each page's tables to cache_dir as soon as
+    they are parsed. Returns one result per page (tables with shape and checksum, or the error).
+    """
+    import camelot
+
+    results = []
+    for page in pages:
+        start = time.perf_counter()
+        result = {'page': page, 'tables': [], 'error': None}
+        try:
+            tables = camelot.read_pdf(pdf_path, pages=str(page), flavor=flavor)
+            for k, table in enumerate(tables):
+                df = table.df
+                path = Path(cache_dir) / f"page{page:05d}_table{k:03d}.csv"
+                write_atomic_csv(df, path)
+                result['tables'].append({
+                    'index_on_page': k,
+                    'cache_file': path.name,
+                    'shape': list(df.shape),
+                    'sha256': file_sha256(path),
+                })
+                del df
+        except Exception as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+        result['seconds'] = round(time.perf_counter() - start, 3)
+        results.append(result)
+    return results
+
+
+def load_manifest(path: Path) -> Optional[Dict]:
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+        return manifest if manifest.get('version') == MANIFEST_VERSION else None
+    except (OSError, ValueError):
+        return None
+
+
+def cached_page_is_valid(entry: Optional[Dict], page_hash: str, flavor: str, cache_dir: Path) -> bool:
+    if not entry or entry.get('page_sha256') != page_hash or entry.get('flavor') != flavor or entry.get('error'):
+        return False
+    for table in entry['tables']:
+        path = cache_dir / table['cache_file']
+        if not path.exists() or file_sha256(path) != table['sha256']:
+            return False
+    return True
+
+
+def make_shards(pages: List[int], pages_per_shard: int) -> List[List[int]]:
+    return [pages[i:i + pages_per_shard] for i in range(0, len(pages), pages_per_shard)]
+
+
+def extract_tables(pdf_path: Path, out_dir: Path = Path('.'), workers: Optional[int] = None,
+                   pages_per_shard: int = 4, flavor: str = 'lattice', force: bool = False) -> Dict:
+    """Extract (or refresh) table_{i}.csv files for `pdf_path` in `out_dir` and return the manifest"""
+    pdf_path = Path(pdf_path)
+    out_dir = Path(out_dir)
+    cache_dir = out_dir / CACHE_DIR_NAME
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / MANIFEST_NAME
+    published = load_manifest(manifest_path)
+    previous = None if force else published
+    if previous is not None and previous.get('pdf') != pdf_path.name:
+        previous = None
+
+    hashes = page_hashes(pdf_path)
+    print(f"📄 {pdf_path.name}: {len(hashes)} pages")
+
+    page_entries: Dict[int, Dict] = {}
+    todo = []
+    for page, page_hash in enumerate(hashes, start=1):
+        entry = (previous or {}).get('pages', {}).get(str(page))
+        if not force and cached_page_is_valid(entry, page_hash, flavor, cache_dir):
+            page_entries[page] = entry
+        else:
+            todo.append(page)
+    print(f"   {len(hashes) - len(todo)} pages unchanged (cached), {len(todo)} to parse")
+
+    start = time.perf_counter()
+    failures = []
+    if todo:
+        shards = make_shards(todo, max(1, pages_per_shard))
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as pool:
+            futures = {pool.submit(extract_pages, str(pdf_path), shard, str(cache_dir), flavor): shard
+                       for shard in shards}
+            for future in as_completed(futures):
+                try:
+                    results = future.result()
+                except Exception as e:
+                    results = [{'page': page, 'tables': [], 'error': f"{type(e).__name__}: {e}", 'seconds': 0.0}
+                               for page in futures[future]]
+                for result in results:
+                    page = result['page']
+                    page_entries[page] = {
+                        'page_sha256': hashes[page - 1],
+                        'flavor': flavor,
+                        'tables': result['tables'],
+                        'error': result['error'],
+                        'seconds': result['seconds'],
+                    }
+                    if result['error']:
+                        failures.append(page)
+                        print(f"   ❌ page {page}: {result['error']}")
+                    else:
+                        print(f"   page {page}: {len(result['tables'])} tables in {result['seconds']:.2f}s")
+
+    if failures:
+        # A failed page would shift every later table's number; keep the published tables until all pages parse
+        tables = (published or {}).get('tables', [])
+    else:
+        # Publish in page order so numbering matches camelot.read_pdf(pages="all")
+        tables = []
+        for page in sorted(page_entries):
+            for table in page_entries[page]['tables']:
+                index = len(tables)
+                out_file = out_dir / f"table_{index}.csv"
+                if not (out_file.exists() and file_sha256(out_file) == table['sha256']):
+                    shutil.copyfile(cache_dir / table['cache_file'], out_file)
+                tables.append({
+                    'table': index,
+                    'file': out_file.name,
+                    'page': page,
+                    'index_on_page': table['index_on_page'],
+                    'shape': table['shape'],
+                    'sha256': table['sha256'],
+                })
+
+        # Remove every other table_*.csv (earlier runs, other PDFs): merge_clean.py merges all of them
+        current = {table['file'] for table in tables}
+        for stale in out_dir.glob('table_*.csv'):
+            if stale.name not in current:
+                stale.unlink()
+
+    # Drop cached page outputs no manifest entry refers to any more
+    referenced = {table['cache_file'] for entry in page_entries.values() for table in entry['tables']}
+    for cached in cache_dir.glob('page*_table*.csv'):
+        if cached.name not in referenced:
+            cached.unlink()
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'pdf': pdf_path.name,
+        'pdf_sha256': file_sha256(pdf_path),
+        'flavor': flavor,
+        'page_count': len(hashes),
+        'pages': {str(page): entry for page, entry in sorted(page_entries.items())},
+        'tables': tables,
+    }
+    tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+    elapsed = time.perf_counter() - start
+    print(f"   Parsed {len(todo)} pages in {elapsed:.1f}s, manifest: {manifest_path}")
+    if failures:
+        raise ExtractionError(f"{len(failures)} pages failed and will be retried next run: {sorted(failures)}; "
+                              f"table files not updated")
+    print("Total tables found:", len(tables))
+    return manifest
+
 
-# Extract all tables using lattice mode
-tables = camelot.read_pdf(pdf_path, pages="all", flavor="lattice")
+def main():
+    parser = argparse.ArgumentParser(description='Extract tables from a water-quality PDF into table_{i}.csv files')
+    parser.add_argument('pdf', nargs='?', default=DEFAULT_PDF, help='PDF to extract')
+    parser.add_argument('--out-dir', type=Path, default=Path('.'), help='Where to write table_*.csv and the manifest')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--pages-per-shard', type=int, default=4, help='Pages handed to a worker at a time')
+    parser.add_argument('--flavor', default='lattice', choices=['lattice', 'stream'], help='camelot parsing flavor')
+    parser.add_argument('--force', action='store_true', help='Re-parse every page even if unchanged')
+    args = parser.parse_args()
 
-print("Total tables found:", tables.n)
+    try:
+        extract_tables(Path(args.pdf), out_dir=args.out_dir, workers=args.workers,
+                       pages_per_shard=args.pages_per_shard, flavor=args.flavor, force=args.force)
+    except ExtractionError as e:
+        print(f"   ❌ {e}")
+        raise SystemExit(1)
 
-# Example: Convert first table into DataFrame
-df = tables[0].df
-print(df)
 
-# Save each table as CSV
-for i, table in enumerate(tables):
-    df = table.df
-    df.to_csv(f"table_{i}.csv", index=False)
-    print(f"Saved table_{i}.csv -> shape={df.shape}")
+if __name__ == "__main__":
+    main()
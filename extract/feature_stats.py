@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Precomputed feature statistics sidecar for the synthetic sensors
+
+SyntheticSensor and SensorFleet only need a few numbers per feature from the
+historical data: min/max/mean/std for their value ranges, plus quantiles and a
+histogram so baseline readings follow the historical distribution. This module
+computes them once and stores them next to the dataset
+(water_dataX.csv -> water_dataX.stats.json).
+
+load_feature_stats() returns the sidecar in milliseconds and recomputes it only
+when the source data changed. The source's size and mtime are checked first;
+the SHA-256 is compared only if they differ, so a touched but unchanged file
+does not trigger a recompute.
+
+Usage:
+    python feature_stats.py build water_dataX.csv      # (re)write water_dataX.stats.json
+    python feature_stats.py show water_dataX.csv
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from file_hash import file_sha256
+from wq_dataset import FEATURES, find_columnar, load_dataset
+
+STATS_VERSION = 1
+QUANTILE_PROBS = [round(p, 2) for p in np.linspace(0.0, 1.0, 21)]  # every 5%
+HISTOGRAM_BINS = 20
+
+
+def stats_path(data_path: Path) -> Path:
+    data_path = Path(data_path)
+    return data_path.with_name(data_path.stem + '.stats.json')
+
+
+def source_file(data_path: Path) -> Optional[Path]:
+    """The file load_dataset() actually reads for data_path"""
+    data_path = Path(data_path)
+    columnar = find_columnar(data_path)
+    if columnar is not None:
+        return columnar
+    return data_path if data_path.exists() else None
+
+
+def _signature(path: Path) -> Dict:
+    stat = path.stat()
+    return {'source': path.name, 'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns}
+
+
+def compute_feature_stats(data_path: Path) -> Dict:
+    """Statistics for every model feature present in the data (only the feature columns are read)"""
+    source = source_file(data_path)
+    if source is None:
+        raise FileNotFoundError(f"No data at {data_path}")
+    df = load_dataset(data_path, columns=FEATURES)
+
+    features = {}
+    for feat in FEATURES:
+        if feat not in df.columns:
+            continue
+        col = df[feat].dropna().to_numpy(dtype=float)
+        if len(col) == 0:
+            continue
+        lo, hi = float(col.min()), float(col.max())
+        std_val = float(np.std(col, ddof=1)) if len(col) > 1 else float('nan')
+        # Handle case where std is 0 or NaN (single value or all same)
+        if np.isnan(std_val) or std_val == 0:
+            std_val = (hi - lo) / 4.0 if hi != lo else 1.0
+        counts, edges = np.histogram(col, bins=HISTOGRAM_BINS, range=(lo, hi) if hi > lo else (lo - 0.5, hi + 0.5))
+        features[feat] = {
+            'min': lo,
+            'max': hi,
+            'mean': float(col.mean()),
+            'std': std_val,
+            'count': int(len(col)),
+            'quantiles': [float(q) for q in np.quantile(col, QUANTILE_PROBS)],
+            'histogram': {'edges': [float(e) for e in edges], 'counts': [int(c) for c in counts]},
+        }
+
+    return {
+        'version': STATS_VERSION,
+        **_signature(source),
+        'source_sha256': file_sha256(source),
+        'computed_at': time.time(),
+        'quantile_probs': QUANTILE_PROBS,
+        'features': features,
+    }
+
+
+def write_stats(stats: Dict, path: Path):
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(stats, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def read_stats(path: Path) -> Optional[Dict]:
+    try:
+        with open(path) as f:
+            stats = json.load(f)
+        return stats if stats.get('version') == STATS_VERSION else None
+    except (OSError, ValueError):
+        return None
+
+
+def load_feature_stats(data_path: Path, write: bool = True) -> Dict:
+    """
+    Feature statistics for data_path from its sidecar, recomputed (and rewritten if `write`)
+    when the data changed. With no data but a sidecar present, the sidecar is used as is.
+    """
+    path = stats_path(data_path)
+    stats = read_stats(path)
+    source = source_file(data_path)
+    if source is None:
+        if stats is None:
+            raise FileNotFoundError(f"No data or statistics sidecar at {data_path}")
+        return stats
+
+    if stats is not None and stats.get('source') == source.name:
+        signature = _signature(source)
+        if all(stats.get(k) == v for k, v in signature.items()):
+            return stats
+        if stats.get('source_sha256') == file_sha256(source):
+            # Same content, new mtime (checkout, copy): remember the new signature
+            stats.update(signature)
+            if write:
+                write_stats(stats, path)
+            return stats
+
+    stats = compute_feature_stats(data_path)
+    if write:
+        try:
+            write_stats(stats, path)
+        except OSError as e:
+            print(f"⚠️  Could not write statistics sidecar {path}: {e}")
+    return stats
+
+
+def value_ranges_from_stats(stats: Dict) -> Dict[str, Dict[str, float]]:
+    return {feat: {k: s[k] for k in ('min', 'max', 'mean', 'std')} for feat, s in stats['features'].items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Feature statistics sidecar for the synthetic sensors')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='Recompute and write <data>.stats.json')
+    build.add_argument('data', type=Path)
+    show = sub.add_parser('show', help='Print the statistics (recomputed first if the data changed)')
+    show.add_argument('data', type=Path)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        stats = compute_feature_stats(args.data)
+        write_stats(stats, stats_path(args.data))
+        print(f"Wrote {stats_path(args.data)} ({len(stats['features'])} features from {stats['source']})")
+    else:
+        stats = load_feature_stats(args.data)
+        print(f"Source: {stats['source']} sha256={stats['source_sha256'][:12]}…")
+        for feat, s in stats['features'].items():
+            q = s['quantiles']
+            print(f"  {feat:<14} n={s['count']:<6} min={s['min']:<10.4g} p50={q[len(q) // 2]:<10.4g} "
+                  f"max={s['max']:<10.4g} mean={s['mean']:<10.4g} std={s['std']:.4g}")
+
+
+if __name__ == "__main__":
+    main()
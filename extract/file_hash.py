@@ -0,0 +1,18 @@
+"""
+Content hashing shared by the extract, training and model-loading scripts
+
+Standard library only, so anything (the backend included) can import it
+without pulling in camelot, sklearn or pandas.
+"""
+
+import hashlib
+from pathlib import Path
+
+
+def file_sha256(path: Path) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
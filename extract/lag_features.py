@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Vectorized lagged-dataset builder for the forecast model
+
+The forecast model predicts a station's Risk H readings ahead from its last L
+readings. Each training row holds '{feat}_lag{k}' (the feature k readings
+back, k = 0..L-1), the station id, and the target Risk at t+H. The notebook
+used to build these rows with one .loc lookup per value, which takes minutes
+on multi-year data. build_lagged_dataset() builds the same frame with a few
+NumPy gathers.
+
+Row order, column order, names and dtypes match the notebook loop, which is
+kept here as build_lagged_dataset_loop() for the parity check:
+  - stations in order of first appearance; rows with no station are dropped
+  - rows in file order within each station
+  - a row exists for every t with L-1 <= t < len(station) - H whose Risk at
+    t+H is present
+
+Usage:
+    python lag_features.py check water_dataX.csv         # parity with the notebook loop for several L/H
+    python lag_features.py bench --rows 1000000          # speed vs the notebook loop
+"""
+
+import argparse
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from wq_dataset import FEATURES
+
+
+def lag_feature_names(features: Sequence[str], L: int) -> List[str]:
+    """Model column names in the order the notebook creates them (feature-major, then lag)"""
+    return [f'{feat}_lag{lag}' for feat in features for lag in range(L)]
+
+
+def build_lagged_dataset(df: pd.DataFrame, features: Sequence[str], L: int = 3, H: int = 1,
+                         station_col: Optional[str] = None, target_col: str = 'Risk') -> pd.DataFrame:
+    """
+    Lagged training rows: '{feat}_lag{k}' for every feature and k < L, then 'station_id'
+    (if station_col) and 'target' (target_col at t+H).
+    """
+    if L < 1 or H < 0:
+        raise ValueError("L must be >= 1 and H >= 0")
+    features = list(features)
+
+    if station_col:
+        # Codes follow first appearance, like unique(); rows without a station get -1
+        codes, _ = pd.factorize(df[station_col], sort=False)
+        rows = np.flatnonzero(codes >= 0)
+        rows = rows[np.argsort(codes[rows], kind='stable')]
+        group = codes[rows]
+    else:
+        rows = np.arange(len(df))
+        group = np.zeros(len(df), dtype=np.intp)
+
+    # Position of every row within its station, and that station's length
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]]) if len(rows) else np.empty(0, dtype=np.intp)
+    lengths = np.diff(np.r_[starts, len(rows)])
+    position = np.arange(len(rows)) - np.repeat(starts, lengths)
+    station_length = np.repeat(lengths, lengths)
+
+    target = df[target_col].to_numpy()[rows]
+    t = np.flatnonzero((position >= L - 1) & (position + H < station_length))
+    t = t[pd.notna(target[t + H])]
+
+    values = df[features].to_numpy(dtype=np.float64)[rows]
+    lagged = np.empty((len(t), len(features) * L))
+    for lag in range(L):
+        # Columns lag, lag+L, lag+2L, ... are this lag of each feature
+        lagged[:, lag::L] = values[t - lag]
+
+    out = pd.DataFrame(lagged, columns=lag_feature_names(features, L))
+    if station_col:
+        out['station_id'] = df[station_col].to_numpy()[rows[t]]
+    out['target'] = target[t + H]
+    return out
+
+
+def build_lagged_dataset_loop(df: pd.DataFrame, features: Sequence[str], L: int = 3, H: int = 1,
+                              station_col: Optional[str] = None, target_col: str = 'Risk') -> pd.DataFrame:
+    """The notebook's original row-by-row builder, kept as the reference for `check` and `bench`"""
+    rows = []
+    if station_col:
+        for station_id in df[station_col].dropna().unique():
+            station_df = df[df[station_col] == station_id].reset_index(drop=True)
+            for t in range(L-1, len(station_df) - H):
+                if pd.notna(station_df.loc[t+H, target_col]):
+                    lag_row = {}
+                    for feat in features:
+                        for lag in range(L):
+                            lag_row[f'{feat}_lag{lag}'] = station_df.loc[t-lag, feat] if pd.notna(station_df.loc[t-lag, feat]) else np.nan
+                    lag_row['station_id'] = station_id
+                    lag_row['target'] = station_df.loc[t+H, target_col]
+                    rows.append(lag_row)
+    else:
+        df = df.reset_index(drop=True)
+        for t in range(L-1, len(df) - H):
+            if pd.notna(df.loc[t+H, target_col]):
+                lag_row = {}
+                for feat in features:
+                    for lag in range(L):
+                        lag_row[f'{feat}_lag{lag}'] = df.loc[t-lag, feat] if pd.notna(df.loc[t-lag, feat]) else np.nan
+                lag_row['target'] = df.loc[t+H, target_col]
+                rows.append(lag_row)
+    return pd.DataFrame(rows)
+
+
+def synthetic_readings(n_rows: int, n_stations: int, seed: int = 0, missing: float = 0.05) -> pd.DataFrame:
+    """Interleaved readings from n_stations with missing values, Risk gaps and some rows without a station"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(n_rows, len(FEATURES))) * 10 + 50, columns=FEATURES)
+    df = df.mask(rng.random(df.shape) < missing)
+    station = rng.integers(0, n_stations, n_rows).astype(float) + 1000
+    station[rng.random(n_rows) < missing / 5] = np.nan
+    df['StationCode'] = station
+    risk = rng.choice(np.array(['Low', 'Medium', 'High'], dtype=object), n_rows)
+    risk[rng.random(n_rows) < missing] = np.nan
+    df['Risk'] = pd.Categorical(risk)
+    return df
+
+
+def load_training_frame(path: Path) -> pd.DataFrame:
+    """water_dataX / WQ_combined_clean with canonical names and the forecast notebook's Risk labels"""
+    from risk_rules import RiskRules
+    from wq_dataset import load_dataset
+    df = load_dataset(path)
+    if 'Risk' not in df.columns:
+        df['Risk'] = RiskRules(min_non_missing=1).label(df)
+    return df
+
+
+def check_parity(df: pd.DataFrame, station_col: Optional[str], settings=((3, 1), (1, 1), (4, 2), (2, 0))) -> bool:
+    features = [f for f in FEATURES if f in df.columns]
+    ok = True
+    for L, H in settings:
+        expected = build_lagged_dataset_loop(df, features, L, H, station_col)
+        actual = build_lagged_dataset(df, features, L, H, station_col)
+        try:
+            if len(expected) == 0:
+                assert len(actual) == 0, f"expected no rows, got {len(actual)}"
+            else:
+                pd.testing.assert_frame_equal(actual, expected, check_dtype=True)
+            print(f"  ✅ L={L} H={H} station={station_col}: {len(actual)} rows match")
+        except AssertionError as e:
+            ok = False
+            print(f"  ❌ L={L} H={H} station={station_col}: {e}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vectorized lagged-dataset builder for the forecast model')
+    sub = parser.add_subparsers(dest='command', required=True)
+    check = sub.add_parser('check', help='Compare with the notebook loop on a dataset and on synthetic data')
+    check.add_argument('data', type=Path, nargs='?', default=Path(__file__).parent / 'water_dataX.csv')
+    bench = sub.add_parser('bench', help='Time both builders on synthetic data')
+    bench.add_argument('--rows', type=int, default=1_000_000)
+    bench.add_argument('--stations', type=int, default=1000)
+    bench.add_argument('--reference-rows', type=int, default=50_000,
+                       help='Rows the loop is timed on (it is extrapolated to --rows); use --rows to time it fully')
+    bench.add_argument('-L', type=int, default=3)
+    bench.add_argument('-H', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.command == 'check':
+        ok = True
+        if args.data.exists():
+            df = load_training_frame(args.data)
+            station_col = next((c for c in ('StationCode', 'MonitoringLocation') if c in df.columns), None)
+            print(f"{args.data.name}: {len(df)} rows")
+            ok &= check_parity(df, station_col)
+            ok &= check_parity(df, None, settings=((3, 1),))
+        print("Synthetic data:")
+        synthetic = synthetic_readings(3000, 40, seed=1)
+        ok &= check_parity(synthetic, 'StationCode')
+        ok &= check_parity(synthetic, None)
+        raise SystemExit(0 if ok else 1)
+
+    df = synthetic_readings(args.rows, args.stations)
+    start = time.perf_counter()
+    fast = build_lagged_dataset(df, FEATURES, args.L, args.H, 'StationCode')
+    fast_seconds = time.perf_counter() - start
+    print(f"Vectorized: {args.rows:,} rows -> {len(fast):,} lagged rows in {fast_seconds:.2f} s")
+
+    ref_rows = min(args.reference_rows, args.rows)
+    subset = df.iloc[:ref_rows]
+    start = time.perf_counter()
+    slow = build_lagged_dataset_loop(subset, FEATURES, args.L, args.H, 'StationCode')
+    loop_seconds = time.perf_counter() - start
+    pd.testing.assert_frame_equal(build_lagged_dataset(subset, FEATURES, args.L, args.H, 'StationCode'), slow)
+    loop_estimate = loop_seconds * args.rows / ref_rows
+    note = "" if ref_rows == args.rows else f" (timed on {ref_rows:,} rows, extrapolated linearly: a lower bound)"
+    print(f"Loop:       {args.rows:,} rows in ~{loop_estimate:.1f} s{note}")
+    print(f"Speedup:    {loop_estimate / fast_seconds:,.0f}x  (outputs identical on the timed rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,41 @@
 # merge_clean.py
+"""
+Merge the table_*.csv files produced by extract.py into one cleaned dataset.
+
+Two streaming passes keep memory bounded by a single table:
+  1. read only the first rows of every table to resolve its header and build
+     the unified column schema (columns in order of first appearance);
+  2. clean each table and append its rows to a temporary file in that schema,
+     tracking per column whether any non-blank value was seen.
+A final sequential copy drops the columns that stayed blank everywhere.
+
+Tables are independent, so reading and cleaning them can run in a process
+pool (--workers N). Results are consumed in file order, so the output is the
+same for any number of workers.
+
+The merged CSV is also written as a typed columnar copy (WQ_combined_clean.parquet
+by default, see wq_dataset.py) with canonical column names and numeric columns
+coerced; load it with wq_dataset.load_dataset().
+
+Usage:
+    python merge_clean.py                 # serial
+    python merge_clean.py --workers 8     # clean tables in 8 processes
+    python merge_clean.py --workers 8 --timings   # print every table's clean time
+    python merge_clean.py --columnar feather      # or "none" for CSV only
+"""
 import pandas as pd
+import argparse
+import csv
 import glob
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from wq_dataset import FORMATS, columnar_engine_available, convert_csv
+
+# clean_table looks at most at an optional numeric row plus 6 header candidates
+HEADER_SCAN_ROWS = 8
 
 def make_unique(cols):
     """Return list of unique column names by appending suffixes to duplicates."""
@@ -80,43 +114,171 @@ def clean_table(df):
 
     return df
 
+def read_table(file, nrows=None):
+    return pd.read_csv(file, header=None, dtype=str, keep_default_na=False, nrows=nrows)
+
+def scan_columns(file):
+    """Pass one: cleaned column names of a table, from its first rows only"""
+    try:
+        head = read_table(file, nrows=HEADER_SCAN_ROWS)
+    except Exception:
+        return None  # reported in pass two
+    cleaned = clean_table(head)
+    return None if cleaned is None else list(cleaned.columns)
+
+def build_schema(csv_files, pool=None, chunksize=1):
+    """Union of all table columns in order of first appearance (what pd.concat(sort=False) would produce)"""
+    schema = ["_source_file"]
+    seen = set(schema)
+    for columns in ordered_map(scan_columns, csv_files, pool, chunksize):
+        for col in columns or []:
+            if col not in seen:
+                seen.add(col)
+                schema.append(col)
+    return schema
+
+def load_and_clean(file):
+    """Read and clean one table. Returns (cleaned DataFrame or None, message for skipped tables)"""
+    df = read_table(file)
+    cleaned = clean_table(df)
+    if cleaned is None or cleaned.shape[0] == 0:
+        return None, f"Skipping empty/invalid table: {file}"
+
+    # add source table name so we can trace rows later
+    cleaned.insert(0, "_source_file", os.path.basename(file))
+    return cleaned, None
+
+def clean_file(file):
+    """
+    Worker: load and clean one table and time it. Never raises, so one bad table cannot stop the merge.
+    Returns (timing record, cleaned DataFrame or None).
+    """
+    start = time.perf_counter()
+    try:
+        cleaned, message = load_and_clean(file)
+        status = "ok" if cleaned is not None else "skipped"
+    except Exception as e:
+        cleaned, status = None, "failed"
+        message = f"Skipping {file} — {type(e).__name__}: {e}"
+    record = {
+        "file": file,
+        "status": status,
+        "message": message,
+        "rows": 0 if cleaned is None else len(cleaned),
+        "seconds": time.perf_counter() - start,
+    }
+    return record, cleaned
+
+def ordered_map(fn, items, pool=None, chunksize=1):
+    """map() over items, in a process pool if given; results always come back in input order"""
+    if pool is None:
+        return map(fn, items)
+    return pool.map(fn, items, chunksize=chunksize)
+
+def merge_tables(csv_files, out_name, workers=1):
+    """
+    Stream cleaned tables into `out_name` using a unified schema, cleaning them in `workers` processes.
+    Returns (output shape or None if no table survived cleaning, per-table timing records).
+    """
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    # a few chunks per worker: amortizes IPC without leaving workers idle behind one slow chunk
+    chunksize = max(1, len(csv_files) // (workers * 4))
+    try:
+        schema = build_schema(csv_files, pool, chunksize)
+        nonblank = {}
+        rows = 0
+        timings = []
+        tmp_name = out_name + ".tmp"
+
+        # Pass two: append every cleaned table in the unified schema
+        with open(tmp_name, "w", newline="", encoding="utf-8") as out:
+            writer = csv.writer(out, lineterminator=os.linesep)
+            for record, cleaned in ordered_map(clean_file, csv_files, pool, chunksize):
+                timings.append(record)
+                if cleaned is None:
+                    print(record["message"])
+                    continue
+                for col in cleaned.columns:
+                    if col not in nonblank:
+                        nonblank[col] = False
+                        if col not in schema:
+                            # header scan missed it (e.g. columns blank in the first rows); add at the end
+                            schema.append(col)
+                    if not nonblank[col]:
+                        values = cleaned[col]
+                        nonblank[col] = bool((values.notna() & (values != '')).any())
+                writer.writerows(cleaned.reindex(columns=schema).fillna('').values.tolist())
+                rows += len(cleaned)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if rows == 0:
+        os.remove(tmp_name)
+        return None, timings
+
+    # drop columns that are entirely blanks, copying the rows through one at a time
+    keep = [i for i, col in enumerate(schema) if nonblank.get(col)]
+    width = len(schema)
+    with open(tmp_name, newline="", encoding="utf-8") as src, \
+            open(out_name, "w", newline="", encoding="utf-8") as dst:
+        writer = csv.writer(dst, lineterminator=os.linesep)
+        writer.writerow([schema[i] for i in keep])
+        for row in csv.reader(src):
+            if len(row) < width:
+                row += [''] * (width - len(row))
+            writer.writerow([row[i] for i in keep])
+    os.remove(tmp_name)
+    return (rows, len(keep)), timings
+
+def print_timings(timings, wall_seconds, workers, show_all=False, slowest=5):
+    clean_seconds = sum(t["seconds"] for t in timings)
+    counts = {status: sum(t["status"] == status for t in timings) for status in ("ok", "skipped", "failed")}
+    print(f"Cleaned {counts['ok']} tables ({counts['skipped']} skipped, {counts['failed']} failed) "
+          f"with {workers} worker(s) in {wall_seconds:.2f}s "
+          f"(clean time {clean_seconds:.2f}s, {clean_seconds / max(wall_seconds, 1e-9):.1f}x)")
+
+    listed = timings if show_all else sorted(timings, key=lambda t: t["seconds"], reverse=True)[:slowest]
+    if listed:
+        print("Per-table timing:" if show_all else f"Slowest {len(listed)} tables:")
+        for t in listed:
+            print(f"  {os.path.basename(t['file']):<16} {t['seconds'] * 1000:8.1f} ms  {t['rows']:>6} rows  {t['status']}")
+
+    failed = [os.path.basename(t["file"]) for t in timings if t["status"] == "failed"]
+    if failed:
+        print(f"⚠️  {len(failed)} tables failed to load/clean: {', '.join(failed)}")
+
 def main():
+    parser = argparse.ArgumentParser(description="Merge and clean table_*.csv files into WQ_combined_clean.csv")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to clean tables (default: 1, serial)")
+    parser.add_argument("--timings", action="store_true", help="Print the clean time of every table, not just the slowest")
+    parser.add_argument("--out", default="WQ_combined_clean.csv", help="Output CSV")
+    parser.add_argument("--columnar", choices=sorted(FORMATS) + ["none"], default="parquet",
+                        help="Also write a typed columnar copy of the output (default: parquet)")
+    args = parser.parse_args()
+
     csv_files = sorted(glob.glob("table_*.csv"))
     if not csv_files:
         print("No table_*.csv files found in cwd:", os.getcwd())
         return
 
-    cleaned_tables = []
-    for file in csv_files:
-        try:
-            df = pd.read_csv(file, header=None, dtype=str, keep_default_na=False)
-        except Exception as e:
-            print("Skipping", file, "— read error:", e)
-            continue
-
-        cleaned = clean_table(df)
-        if cleaned is None or cleaned.shape[0] == 0:
-            print("Skipping empty/invalid table:", file)
-            continue
-
-        # add source table name so we can trace rows later
-        cleaned.insert(0, "_source_file", os.path.basename(file))
-        cleaned_tables.append(cleaned)
-
-    if not cleaned_tables:
+    # Save cleaned dataset
+    out_name = args.out
+    workers = max(1, args.workers)
+    start = time.perf_counter()
+    shape, timings = merge_tables(csv_files, out_name, workers=workers)
+    print_timings(timings, time.perf_counter() - start, workers, show_all=args.timings)
+    if shape is None:
         print("No valid tables after cleaning.")
         return
+    print("Saved cleaned file", out_name, "shape:", shape)
 
-    # concat with ignore_index=True and sort=False (columns will be unioned automatically)
-    merged = pd.concat(cleaned_tables, ignore_index=True, sort=False)
-
-    # drop columns that are entirely blanks
-    merged = merged.loc[:, merged.columns.to_series().apply(lambda c: merged[c].replace('', pd.NA).notna().any())]
-
-    # Save cleaned dataset
-    out_name = "WQ_combined_clean.csv"
-    merged.to_csv(out_name, index=False)
-    print("Saved cleaned file", out_name, "shape:", merged.shape)
+    if args.columnar != "none":
+        if not columnar_engine_available():
+            print(f"pyarrow not installed; skipping the {args.columnar} copy (CSV only)")
+            return
+        path = convert_csv(Path(out_name), fmt=args.columnar)
+        print("Saved typed copy", path)
 
 if __name__ == "__main__":
     main()
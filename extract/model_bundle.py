@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Compact on-disk format for AWARE RandomForest artifacts
+
+A model bundle is a directory next to the joblib artifact (rf_water_model.model/,
+rf_forecast_model.model/) holding the compiled forest (compiled_forest.py) as raw
+.npy arrays plus manifest.json. The manifest holds everything else the backend
+and the sensor read from the pickle: feature / lag-feature lists, class labels,
+L / H, the station encoder's categories.
+
+Loading opens every array with np.load(mmap_mode='r'). No sklearn import and no
+unpickling is needed, and worker processes share the mapped pages. The arrays
+use the narrowest dtype that gives identical predictions:
+  - children (interleaved left/right) and roots: int32
+  - feature: uint8 (up to 256 features)
+  - threshold: float32, rounded down. Inputs reach the trees as float32, so
+    x <= t and x <= float32_round_down(t) always agree.
+  - proba: one row per leaf only (leaves are numbered first), float32 when
+    every value survives the round trip, float64 otherwise
+  - missing_left: only stored when NaNs can reach the trees (no imputer)
+    and some split routes them to the left
+
+The converter checks the loaded bundle against sklearn before it replaces a
+bundle, so a bundle always predicts exactly what its source artifact predicts.
+
+Array files are named <array>.<version>.npy, where the version is a hash of
+their contents, and manifest.json names the files of the current version. A
+new version is written next to the old one, and then manifest.json is
+replaced in one rename. A reader therefore sees either the old bundle or the
+new one. The previous version's files are kept until the next write, for
+readers that opened the old manifest just before the swap.
+
+Usage:
+    python model_bundle.py convert rf_water_model.joblib rf_forecast_model.joblib
+    python model_bundle.py bench rf_water_model.joblib rf_forecast_model.joblib   # load time and RSS
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from compiled_forest import CompiledForest
+from file_hash import file_sha256
+
+BUNDLE_SUFFIX = ".model"
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+
+
+def bundle_path_for(artifact_path: Path) -> Path:
+    """Default bundle directory for a joblib artifact, e.g. rf_water_model.model/"""
+    artifact_path = Path(artifact_path)
+    return artifact_path.with_name(artifact_path.stem + BUNDLE_SUFFIX)
+
+
+class LabelDecoder:
+    """What the backend and the sensor use of a fitted LabelEncoder"""
+
+    def __init__(self, classes: Sequence):
+        self.classes_ = np.asarray(classes)
+
+    def inverse_transform(self, codes) -> np.ndarray:
+        return self.classes_.take(np.asarray(codes, dtype=np.intp))
+
+    def transform(self, labels) -> np.ndarray:
+        index = {label: i for i, label in enumerate(self.classes_.tolist())}
+        try:
+            return np.array([index[label] for label in labels], dtype=np.int64)
+        except KeyError as e:
+            raise ValueError(f"y contains previously unseen labels: {e}")
+
+
+class StationEncoder:
+    """A fitted single-column OrdinalEncoder as the sensor uses it: transform([[station_id]])"""
+
+    def __init__(self, categories: Sequence, handle_unknown: str = 'error', unknown_value=None):
+        self.categories = list(categories)
+        self.handle_unknown = handle_unknown
+        self.unknown_value = unknown_value
+        self.index = {category: float(i) for i, category in enumerate(self.categories)}
+        self.string_categories = all(isinstance(c, str) for c in self.categories)
+
+    def transform(self, X) -> np.ndarray:
+        out = np.empty((len(X), 1))
+        for i, (value,) in enumerate(X):
+            if self.string_categories != isinstance(value, str):
+                # OrdinalEncoder cannot compare strings with numbers either
+                raise TypeError(f"Cannot encode {value!r} against {'string' if self.string_categories else 'numeric'} categories")
+            code = self.index.get(value)
+            if code is None:
+                if self.handle_unknown != 'use_encoded_value':
+                    raise ValueError(f"Found unknown categories [{value!r}] during transform")
+                code = float(self.unknown_value)
+            out[i, 0] = code
+        return out
+
+
+def narrow(compiled: CompiledForest) -> Dict[str, np.ndarray]:
+    """The compiled forest's arrays renumbered leaves-first, in the smallest lossless dtypes"""
+    n_nodes = len(compiled.left)
+    nodes = np.arange(n_nodes)
+    is_leaf = compiled.left == nodes  # leaves are self-loops
+    # Leaves take ids 0..n_leaves-1 so proba needs no rows for internal nodes
+    order = np.concatenate([np.flatnonzero(is_leaf), np.flatnonzero(~is_leaf)])
+    new_id = np.empty(n_nodes, dtype=np.int64)
+    new_id[order] = nodes
+
+    index_dtype = np.int32 if 2 * n_nodes < np.iinfo(np.int32).max else np.int64
+    children = np.stack([new_id[compiled.left[order]], new_id[compiled.right[order]]], axis=1).ravel()
+    n_features = len(compiled.features)
+    feature_dtype = np.uint8 if n_features <= 256 else np.uint16 if n_features <= 65536 else np.int64
+
+    threshold64 = compiled.threshold[order]
+    threshold = threshold64.astype(np.float32)
+    # Round down: for float32 x, x <= t exactly when x <= the largest float32 not above t
+    above = threshold.astype(np.float64) > threshold64
+    threshold[above] = np.nextafter(threshold[above], np.float32(-np.inf))
+
+    proba = compiled.proba[order[:int(is_leaf.sum())]]
+    proba32 = proba.astype(np.float32)
+    if np.array_equal(proba32.astype(np.float64), proba):
+        proba = proba32
+
+    arrays = {
+        'children': children.astype(index_dtype),
+        'feature': compiled.feature[order].astype(feature_dtype),
+        'threshold': threshold,
+        'proba': np.ascontiguousarray(proba),
+        'roots': new_id[compiled.roots].astype(index_dtype),
+    }
+    if compiled.has_missing_routing and compiled.impute is None:
+        # With an imputer no NaN ever reaches a split
+        arrays['missing_left'] = compiled.missing_left[order]
+    for key in ('impute', 'mean', 'scale'):
+        if getattr(compiled, key) is not None:
+            arrays[key] = np.asarray(getattr(compiled, key), dtype=np.float64)
+    return arrays
+
+
+def to_json_value(value):
+    """NumPy scalars and arrays as plain JSON types"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def build_manifest(artifact: Dict, compiled: CompiledForest, arrays: Dict[str, np.ndarray],
+                   source: Optional[Path]) -> Dict:
+    label_encoder = artifact.get('label_encoder')
+    manifest = {
+        'format': 'aware-forest-bundle',
+        'version': FORMAT_VERSION,
+        'kind': 'forecast' if 'lag_features' in artifact else 'water',
+        'features': list(compiled.features),
+        'classes': compiled.classes_.tolist(),
+        'max_depth': compiled.max_depth,
+        'n_estimators': compiled.n_estimators,
+        'n_nodes': int(len(compiled.left)),
+        'arrays': {name: {'dtype': array.dtype.str, 'shape': list(array.shape)} for name, array in arrays.items()},
+    }
+    if label_encoder is not None:
+        manifest['label_classes'] = [to_json_value(c) for c in label_encoder.classes_]
+    if 'lag_features' in artifact:
+        manifest['lag_features'] = list(artifact['lag_features'])
+        manifest['L'] = int(artifact.get('L', 3))
+        manifest['H'] = int(artifact.get('H', 1))
+        manifest['station_col'] = artifact.get('station_col')
+        encoder = artifact.get('station_encoder')
+        if encoder is not None:
+            manifest['station_encoder'] = {
+                'categories': [to_json_value(c) for c in encoder.categories_[0]],
+                'handle_unknown': encoder.handle_unknown,
+                'unknown_value': to_json_value(encoder.unknown_value),
+            }
+    for key in ('best_params', 'compression'):
+        if key in artifact:
+            manifest[key] = {k: to_json_value(v) for k, v in artifact[key].items()}
+    if source is not None:
+        manifest['source'] = Path(source).name
+        manifest['source_sha256'] = file_sha256(source)
+    return manifest
+
+
+def bundle_files(path: Path) -> List[str]:
+    """manifest.json and the array files it names; empty if `path` holds no readable bundle"""
+    try:
+        with open(Path(path) / MANIFEST) as f:
+            arrays = json.load(f)['arrays']
+        return [MANIFEST] + [spec['file'] for spec in arrays.values()]
+    except (OSError, ValueError, KeyError, TypeError):
+        return []
+
+
+def write_bundle(path: Path, arrays: Dict[str, np.ndarray], manifest: Dict) -> Dict:
+    """
+    Write a new version's arrays next to the current ones, then swap manifest.json in with one rename,
+    so a reader never sees a partial bundle. Returns the manifest as written.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    for name in sorted(arrays):
+        array = np.ascontiguousarray(arrays[name])
+        digest.update(f'{name}:{array.dtype.str}:{array.shape}'.encode())
+        digest.update(array.tobytes())
+    version = digest.hexdigest()[:12]
+
+    manifest = dict(manifest, arrays={name: dict(spec, file=f'{name}.{version}.npy')
+                                      for name, spec in manifest['arrays'].items()})
+    for name, array in arrays.items():
+        target = path / manifest['arrays'][name]['file']
+        if target.exists():
+            continue  # same contents already written (and possibly mapped by a reader)
+        tmp = target.with_name(target.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            np.save(f, array, allow_pickle=False)
+        os.replace(tmp, target)
+
+    keep = set(bundle_files(path))
+    tmp = path / (MANIFEST + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1, default=to_json_value)
+    os.replace(tmp, path / MANIFEST)
+    keep.update(bundle_files(path))
+
+    # Older versions: nothing that read the current or the previous manifest needs them
+    for stale in path.glob('*.npy'):
+        if stale.name not in keep:
+            try:
+                stale.unlink()
+            except OSError:
+                pass  # still mapped on Windows; removed by a later write
+    return manifest
+
+
+def bundle_size(path: Path) -> int:
+    """Bytes of the current version (older array files may still sit next to it)"""
+    return sum((Path(path) / name).stat().st_size for name in bundle_files(path))
+
+
+def load_bundle(path: Path, mmap_mode: Optional[str] = 'r') -> Dict:
+    """
+    Load a bundle as an artifact dict in the joblib layout: 'model' is a CompiledForest,
+    'label_encoder' / 'station_encoder' are LabelDecoder / StationEncoder, and water
+    bundles carry 'features', forecast bundles 'lag_features', 'L', 'H', 'station_col'.
+    `path` is the bundle directory or its manifest.json.
+    """
+    path = Path(path)
+    if path.name == MANIFEST:
+        path = path.parent
+    with open(path / MANIFEST) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != 'aware-forest-bundle' or manifest.get('version') != FORMAT_VERSION:
+        raise ValueError(f"{path} is not a version {FORMAT_VERSION} model bundle")
+
+    arrays = {}
+    for name in manifest['arrays']:
+        # view(np.ndarray): plain arrays over the mapped pages, without np.memmap's per-call overhead
+        arrays[name] = np.load(path / manifest['arrays'][name]['file'], mmap_mode=mmap_mode,
+                               allow_pickle=False).view(np.ndarray)
+    arrays.setdefault('missing_left', np.zeros(0, dtype=bool))
+    arrays['max_depth'] = np.asarray(manifest['max_depth'])
+    arrays['classes'] = np.asarray(manifest['classes'])
+    meta = {key: manifest[key] for key in ('features', 'source', 'source_sha256') if key in manifest}
+    compiled = CompiledForest(arrays, manifest['features'], meta)
+
+    label_classes = manifest.get('label_classes', [str(c) for c in manifest['classes']])
+    artifact = {'model': compiled, 'label_encoder': LabelDecoder(label_classes), 'manifest': manifest}
+    if manifest['kind'] == 'forecast':
+        artifact.update(lag_features=manifest['lag_features'], L=manifest['L'], H=manifest['H'],
+                        station_col=manifest.get('station_col'), station_encoder=None)
+        if manifest.get('station_encoder'):
+            artifact['station_encoder'] = StationEncoder(**manifest['station_encoder'])
+    else:
+        artifact['features'] = manifest['features']
+    return artifact
+
+
+def is_stale(bundle_path: Path, artifact_path: Optional[Path] = None) -> bool:
+    """True if the joblib artifact the bundle was converted from has changed since"""
+    bundle_path = Path(bundle_path)
+    if bundle_path.name == MANIFEST:
+        bundle_path = bundle_path.parent
+    with open(bundle_path / MANIFEST) as f:
+        manifest = json.load(f)
+    artifact_path = Path(artifact_path) if artifact_path else bundle_path.with_name(manifest.get('source', ''))
+    if not manifest.get('source') or not artifact_path.is_file():
+        return False
+    return file_sha256(artifact_path) != manifest.get('source_sha256')
+
+
+def convert(artifact_path: Path, out_path: Optional[Path] = None, verify: bool = True) -> Path:
+    """Convert a joblib artifact into a bundle, checked against sklearn before it is swapped in"""
+    import warnings
+
+    import joblib
+
+    from compiled_forest import parity_sample, verify_parity
+
+    artifact_path = Path(artifact_path)
+    out_path = Path(out_path) if out_path else bundle_path_for(artifact_path)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        artifact = joblib.load(artifact_path)
+        compiled = CompiledForest.from_artifact(artifact)
+        arrays = narrow(compiled)
+        manifest = build_manifest(artifact, compiled, arrays, artifact_path)
+
+        check_dir = out_path.with_name(out_path.name + '.check')
+        if check_dir.exists():
+            shutil.rmtree(check_dir)
+        write_bundle(check_dir, arrays, manifest)
+        try:
+            loaded = load_bundle(check_dir)
+            if verify:
+                report = verify_parity(artifact, loaded['model'], parity_sample(compiled))
+                print(f"✅ Parity check passed on {report['rows']} rows (max |diff| = {report['max_abs_diff']:.2e})")
+            del loaded
+        finally:
+            shutil.rmtree(check_dir)
+    write_bundle(out_path, arrays, manifest)
+    size = bundle_size(out_path)
+    print(f"✅ {artifact_path.name} ({artifact_path.stat().st_size / 1e6:.2f} MB) -> {out_path.name}/ "
+          f"({size / 1e6:.2f} MB, {compiled.n_estimators} trees, {len(compiled.left)} nodes)")
+    return out_path
+
+
+# ---------------------------------------------------------------------------
+# Load-time / RSS benchmark (each measurement in a fresh interpreter)
+# ---------------------------------------------------------------------------
+
+def memory_status() -> Dict[str, float]:
+    """RSS split into anonymous (private) and file-backed (shareable) MB, from /proc on Linux"""
+    status = {}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('VmRSS', 'RssAnon', 'RssFile'):
+                    status[key] = int(value.split()[0]) / 1024
+    except OSError:
+        import resource
+        status['VmRSS'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return status
+
+
+def measure_load(kind: str, path: Path) -> Dict:
+    """Import + load + first single-row prediction for one format, in this (fresh) process"""
+    import warnings
+
+    before = memory_status()
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        if kind == 'joblib':
+            import joblib
+            artifact = joblib.load(path)
+            model = artifact.get('pipeline') or artifact['model']
+            features = artifact.get('features') or artifact['lag_features']
+            loaded = time.perf_counter()
+            import pandas as pd
+            row = pd.DataFrame(np.zeros((1, len(features))), columns=features)
+        elif kind == 'npz':
+            model = CompiledForest.load(path)
+            loaded = time.perf_counter()
+            row = np.zeros((1, len(model.features)))
+        else:
+            artifact = load_bundle(path, mmap_mode='r' if kind == 'bundle-mmap' else None)
+            model = artifact['model']
+            loaded = time.perf_counter()
+            row = np.zeros((1, len(model.features)))
+        model.predict_proba(row)
+    predicted = time.perf_counter()
+    after = memory_status()
+    return {
+        'load_ms': round((loaded - start) * 1000, 2),
+        'first_predict_ms': round((predicted - loaded) * 1000, 2),
+        'rss_mb': round(after.get('VmRSS', 0) - before.get('VmRSS', 0), 2),
+        'anon_mb': round(after.get('RssAnon', 0) - before.get('RssAnon', 0), 2),
+        'file_mb': round(after.get('RssFile', 0) - before.get('RssFile', 0), 2),
+    }
+
+
+def benchmark(artifact_path: Path, repeat: int = 3) -> Dict:
+    """Best-of-`repeat` load measurements per format, each run in a new Python process"""
+    from compiled_forest import compiled_path_for
+
+    artifact_path = Path(artifact_path)
+    candidates = {
+        'joblib': artifact_path,
+        'npz': compiled_path_for(artifact_path),
+        'bundle': bundle_path_for(artifact_path),
+        'bundle-mmap': bundle_path_for(artifact_path),
+    }
+    results = {}
+    for kind, path in candidates.items():
+        if not path.exists():
+            continue
+        runs = []
+        for _ in range(repeat):
+            out = subprocess.run([sys.executable, __file__, '_measure', kind, str(path)],
+                                 capture_output=True, text=True, check=True, cwd=Path(__file__).parent)
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        best = min(runs, key=lambda r: r['load_ms'])
+        size = path.stat().st_size if path.is_file() else bundle_size(path)
+        results[kind] = dict(best, disk_mb=round(size / 1e6, 2))
+    return results
+
+
+def print_benchmark(name: str, results: Dict):
+    print(f"{name}")
+    print(f"  {'format':<12} {'disk MB':>8} {'load ms':>9} {'1st pred ms':>12} {'RSS MB':>8} {'anon MB':>8} {'file MB':>8}")
+    for kind, r in results.items():
+        print(f"  {kind:<12} {r['disk_mb']:>8.2f} {r['load_ms']:>9.1f} {r['first_predict_ms']:>12.2f} "
+              f"{r['rss_mb']:>8.1f} {r['anon_mb']:>8.1f} {r['file_mb']:>8.1f}")
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert joblib forests to memory-mapped model bundles')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_convert = sub.add_parser('convert', help='Write <artifact>.model/ next to each joblib artifact')
+    p_convert.add_argument('artifacts', type=Path, nargs='+')
+    p_convert.add_argument('--out', type=Path, default=None, help='Bundle directory (one artifact only)')
+    p_convert.add_argument('--no-verify', action='store_true', help='Skip the sklearn parity check')
+    p_bench = sub.add_parser('bench', help='Load time and RSS of joblib vs npz sidecar vs bundle, in fresh processes')
+    p_bench.add_argument('artifacts', type=Path, nargs='+')
+    p_bench.add_argument('--repeat', type=int, default=3)
+    p_bench.add_argument('--json', action='store_true')
+    p_measure = sub.add_parser('_measure')  # internal: one measurement in this process
+    p_measure.add_argument('kind')
+    p_measure.add_argument('path', type=Path)
+    args = parser.parse_args(argv)
+
+    if args.command == '_measure':
+        print(json.dumps(measure_load(args.kind, args.path)))
+        return 0
+    if args.command == 'convert':
+        if args.out is not None and len(args.artifacts) > 1:
+            parser.error('--out needs a single artifact')
+        for artifact in args.artifacts:
+            convert(artifact, args.out, verify=not args.no_verify)
+        return 0
+
+    report = {str(artifact): benchmark(artifact, args.repeat) for artifact in args.artifacts}
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for name, results in report.items():
+            print_benchmark(Path(name).name, results)
+        print("(load = import + deserialize; RSS deltas over the load and first prediction; "
+              "file-backed pages are shared between processes mapping the same bundle)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
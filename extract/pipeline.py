@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Incremental runner for the extract → merge → train pipeline
+
+Runs the existing steps in order and re-executes a stage only when one of its
+inputs changed:
+
+  extract  extract.py:        PDF page hashes, camelot flavor, extract.py
+           -> table_*.csv, tables_manifest.json
+  merge    merge_clean.py:    every table_*.csv, merge_clean.py, wq_dataset.py
+           -> WQ_combined_clean.csv (+ .parquet)
+  stats    feature_stats.py:  training dataset, feature_stats.py
+           -> water_dataX.stats.json (what the synthetic sensors sample from)
+  train    train_risk_model.py: training dataset, hyperparameters (--params JSON),
+                              --search, the training code
+           -> rf_water_model.joblib, rf_water_model.forest.npz
+  forecast forecast notebook: training dataset, the notebook's code cells
+           -> rf_forecast_model.joblib
+
+Each stage's inputs are reduced to one SHA-256 fingerprint. Outputs are copied
+into a content-addressed store (.pipeline_cache/) together with the fingerprint
+that produced them. For each stage:
+  - fingerprint unchanged and outputs on disk match: skipped
+  - fingerprint seen before (e.g. after reverting a PDF): outputs restored from the store
+  - otherwise the stage runs and its outputs are stored
+Skipped and restored stages report the time their last real run took (time saved).
+
+A stage whose input is missing (no PDF, jupyter not installed for the
+forecast notebook) is skipped and later stages use the files already on disk.
+
+Usage:
+    python pipeline.py                                   # WQuality_River-Data-2023.pdf, everything
+    python pipeline.py --pdf report-2024.pdf --workers 8
+    python pipeline.py --stages extract,merge            # stop before training
+    python pipeline.py --force merge                     # re-run merge (and whatever changes because of it)
+    python pipeline.py --params rf_params.json --train-data WQ_combined_clean.csv
+    python pipeline.py --search halving --workers 4      # successive-halving search on 4 workers
+    python pipeline.py --dry-run                         # show what would run
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from extract import DEFAULT_PDF, MANIFEST_NAME
+from file_hash import file_sha256
+
+BASE_DIR = Path(__file__).parent
+STORE_DIR_NAME = '.pipeline_cache'
+STATE_VERSION = 1
+MAX_RUNS_PER_STAGE = 5  # fingerprints remembered (and outputs kept) per stage
+STAGE_NAMES = ['extract', 'merge', 'stats', 'train', 'forecast']
+
+MERGED_CSV = 'WQ_combined_clean.csv'
+DEFAULT_NOTEBOOK = 'AWARE_Random_forest.ipynb'
+DEFAULT_TRAIN_DATA = 'water_dataX.csv'  # what the notebooks load first
+MODEL_FILES = ['rf_water_model.joblib', 'rf_water_model.forest.npz']
+FORECAST_MODEL_FILES = ['rf_forecast_model.joblib']
+
+
+def fingerprint(parts: Dict[str, str]) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def notebook_code_sha256(path: Path) -> str:
+    """Hash of the code cells only: outputs and execution counts change on every run"""
+    with open(path, encoding='utf-8') as f:
+        cells = json.load(f)['cells']
+    code = [''.join(cell['source']) for cell in cells if cell['cell_type'] == 'code']
+    return hashlib.sha256(json.dumps(code).encode()).hexdigest()
+
+
+def pdf_fingerprint(pdf_path: Path) -> str:
+    """Per-page hashes (same as extract.py's manifest) when pypdf is available, else the file hash"""
+    try:
+        from extract import page_hashes
+        return hashlib.sha256('\n'.join(page_hashes(pdf_path)).encode()).hexdigest()
+    except ImportError:
+        return file_sha256(pdf_path)
+
+
+class ArtifactStore:
+    """Content-addressed copies of stage outputs plus, per stage, which outputs each input fingerprint produced"""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.objects = root / 'objects'
+        self.state_path = root / 'state.json'
+        self.state = self._load()
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            if state.get('version') == STATE_VERSION:
+                return state
+        except (OSError, ValueError):
+            pass
+        return {'version': STATE_VERSION, 'stages': {}}
+
+    def save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_name(self.state_path.name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def object_path(self, sha: str) -> Path:
+        return self.objects / sha[:2] / sha
+
+    def has(self, sha: str) -> bool:
+        return self.object_path(sha).exists()
+
+    def put(self, path: Path) -> str:
+        sha = file_sha256(path)
+        dest = self.object_path(sha)
+        if not dest.exists():
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = dest.with_name(dest.name + '.tmp')
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, dest)
+        return sha
+
+    def restore(self, sha: str, dest: Path):
+        tmp_path = dest.with_name(dest.name + '.tmp')
+        shutil.copyfile(self.object_path(sha), tmp_path)
+        os.replace(tmp_path, dest)
+
+    def lookup(self, stage: str, fp: str) -> Optional[Dict]:
+        return self.state['stages'].get(stage, {}).get('runs', {}).get(fp)
+
+    def record(self, stage: str, fp: str, outputs: Dict[str, str], seconds: float):
+        entry = self.state['stages'].setdefault(stage, {'runs': {}})
+        runs = entry['runs']
+        runs.pop(fp, None)
+        runs[fp] = {'outputs': outputs, 'seconds': round(seconds, 3), 'finished': time.time()}
+        # keep the most recent fingerprints only (dicts preserve insertion order)
+        for old in list(runs)[:-MAX_RUNS_PER_STAGE]:
+            del runs[old]
+
+    def prune(self) -> int:
+        """Delete stored objects no remembered run refers to. Returns the number removed"""
+        referenced = {sha for entry in self.state['stages'].values()
+                      for run in entry['runs'].values() for sha in run['outputs'].values()}
+        removed = 0
+        for path in self.objects.glob('*/*'):
+            if path.name not in referenced:
+                path.unlink()
+                removed += 1
+        return removed
+
+
+class Stage:
+    def __init__(self, name: str, inputs: Callable[[], Dict[str, str]], run: Callable[[], None],
+                 output_patterns: List[str], unavailable: Callable[[], Optional[str]] = lambda: None):
+        """
+        inputs() maps input names to content hashes; output_patterns are globs relative to BASE_DIR;
+        unavailable() returns why the stage cannot run right now, or None.
+        """
+        self.name = name
+        self.inputs = inputs
+        self.run = run
+        self.output_patterns = output_patterns
+        self.unavailable = unavailable
+
+    def output_files(self) -> List[str]:
+        names = set()
+        for pattern in self.output_patterns:
+            names.update(Path(p).name for p in glob.glob(str(BASE_DIR / pattern)))
+        return sorted(names)
+
+    def current_outputs(self) -> Dict[str, str]:
+        return {name: file_sha256(BASE_DIR / name) for name in self.output_files()}
+
+
+def build_stages(args) -> List[Stage]:
+    pdf_path = BASE_DIR / args.pdf
+    notebook = BASE_DIR / args.notebook
+    train_data = BASE_DIR / args.train_data
+    params_path = Path(args.params).resolve() if args.params else None
+
+    def table_files() -> List[str]:
+        # same order as merge_clean.py's sorted(glob("table_*.csv"))
+        return sorted(glob.glob(str(BASE_DIR / 'table_*.csv')))
+
+    def extract_inputs():
+        return {
+            'pdf': pdf_path.name,
+            'pages': pdf_fingerprint(pdf_path),
+            'flavor': args.flavor,
+            'code': file_sha256(BASE_DIR / 'extract.py'),
+        }
+
+    def extract_run():
+        from extract import extract_tables
+        extract_tables(pdf_path, out_dir=BASE_DIR, workers=args.workers, flavor=args.flavor)
+
+    def merge_inputs():
+        parts = {Path(f).name: file_sha256(Path(f)) for f in table_files()}
+        parts['code'] = file_sha256(BASE_DIR / 'merge_clean.py') + file_sha256(BASE_DIR / 'wq_dataset.py')
+        return parts
+
+    def merge_run():
+        from merge_clean import merge_tables
+        from wq_dataset import convert_csv
+        out_path = BASE_DIR / MERGED_CSV
+        shape, _ = merge_tables(table_files(), str(out_path), workers=args.workers or 1)
+        if shape is None:
+            raise RuntimeError("no valid tables after cleaning")
+        print(f"   Saved {MERGED_CSV} shape: {shape}")
+        if convert_csv(out_path) is not None:
+            print(f"   Saved {out_path.with_suffix('.parquet').name}")
+
+    def stats_inputs():
+        return {'data': file_sha256(train_data), 'code': file_sha256(BASE_DIR / 'feature_stats.py')}
+
+    def stats_run():
+        from feature_stats import compute_feature_stats, stats_path, write_stats
+        stats = compute_feature_stats(train_data)
+        write_stats(stats, stats_path(train_data))
+        print(f"   Saved {stats_path(train_data).name} ({len(stats['features'])} features)")
+
+    def train_inputs():
+        params = {}
+        if params_path is not None:
+            with open(params_path) as f:
+                params = json.load(f)
+        return {
+            'data': file_sha256(train_data),
+            'params': json.dumps(params, sort_keys=True),
+            'search': args.search,
+            'code': ''.join(file_sha256(BASE_DIR / name) for name in
+                            ('train_risk_model.py', 'risk_rules.py', 'wq_dataset.py', 'compiled_forest.py')),
+        }
+
+    def train_run():
+        from train_risk_model import print_report, train
+        print_report(train(train_data, BASE_DIR / MODEL_FILES[0], search=args.search, jobs=args.workers,
+                           params=params_path))
+
+    def forecast_inputs():
+        return {
+            'data': file_sha256(train_data),
+            'notebook': notebook_code_sha256(notebook),
+            # imported by the notebook cells
+            'code': file_sha256(BASE_DIR / 'lag_features.py') + file_sha256(BASE_DIR / 'risk_rules.py'),
+        }
+
+    def forecast_unavailable():
+        if not notebook.exists():
+            return f"{notebook.name} not found"
+        if not train_data.exists():
+            return f"{train_data.name} not found"
+        try:
+            import nbconvert  # noqa: F401
+        except ImportError:
+            return "jupyter nbconvert not installed"
+        return None
+
+    def forecast_run():
+        # The notebook trains on AWARE_DATA_PATH and writes the forecast model to AWARE_MODEL_OUTPUT
+        env = dict(os.environ, AWARE_DATA_PATH=str(train_data),
+                   AWARE_MODEL_OUTPUT=str(BASE_DIR / FORECAST_MODEL_FILES[0]))
+        store_dir = BASE_DIR / STORE_DIR_NAME
+        store_dir.mkdir(exist_ok=True)
+        subprocess.run([sys.executable, '-m', 'nbconvert', '--to', 'notebook', '--execute',
+                        '--ExecutePreprocessor.timeout=-1', '--output-dir', str(store_dir),
+                        '--output', 'forecast_executed', str(notebook)],
+                       cwd=BASE_DIR, env=env, check=True)
+
+    return [
+        Stage('extract', extract_inputs, extract_run, ['table_*.csv', MANIFEST_NAME],
+              unavailable=lambda: None if pdf_path.exists() else f"{pdf_path.name} not found, using existing tables"),
+        Stage('merge', merge_inputs, merge_run, [MERGED_CSV, Path(MERGED_CSV).with_suffix('.parquet').name],
+              unavailable=lambda: None if table_files() else "no table_*.csv files"),
+        Stage('stats', stats_inputs, stats_run, [train_data.stem + '.stats.json'],
+              unavailable=lambda: None if train_data.exists() else f"{train_data.name} not found"),
+        Stage('train', train_inputs, train_run, MODEL_FILES,
+              unavailable=lambda: None if train_data.exists() else f"{train_data.name} not found"),
+        Stage('forecast', forecast_inputs, forecast_run, FORECAST_MODEL_FILES, unavailable=forecast_unavailable),
+    ]
+
+
+def run_pipeline(stages: List[Stage], store: ArtifactStore, force: List[str], dry_run: bool = False) -> List[Dict]:
+    report = []
+    for stage in stages:
+        row = {'stage': stage.name, 'seconds': 0.0, 'saved': 0.0}
+        report.append(row)
+        reason = stage.unavailable()
+        if reason:
+            row['status'] = f"skipped ({reason})"
+            continue
+
+        fp = fingerprint(stage.inputs())
+        entry = None if stage.name in force else store.lookup(stage.name, fp)
+        if entry is not None:
+            if stage.current_outputs() == entry['outputs']:
+                row['status'] = 'up to date'
+                row['saved'] = entry['seconds']
+                continue
+            if all(store.has(sha) for sha in entry['outputs'].values()):
+                if dry_run:
+                    row['status'] = 'would restore from cache'
+                    continue
+                start = time.perf_counter()
+                for name in stage.output_files():
+                    if name not in entry['outputs']:
+                        (BASE_DIR / name).unlink()
+                for name, sha in entry['outputs'].items():
+                    store.restore(sha, BASE_DIR / name)
+                row['seconds'] = time.perf_counter() - start
+                row['status'] = 'restored from cache'
+                row['saved'] = max(0.0, entry['seconds'] - row['seconds'])
+                continue
+
+        if dry_run:
+            row['status'] = 'would run'
+            continue
+        print(f"▶ {stage.name}")
+        start = time.perf_counter()
+        try:
+            stage.run()
+        except Exception as e:
+            row['seconds'] = time.perf_counter() - start
+            row['status'] = f"failed ({type(e).__name__}: {e})"
+            break
+        row['seconds'] = time.perf_counter() - start
+        row['status'] = 'ran'
+        outputs = {name: store.put(BASE_DIR / name) for name in stage.output_files()}
+        # fingerprint again: a stage may legitimately rewrite its own inputs (none do today)
+        store.record(stage.name, fingerprint(stage.inputs()), outputs, row['seconds'])
+        store.save()
+    return report
+
+
+def print_report(report: List[Dict]):
+    width = max([len('Status')] + [len(row.get('status', 'not reached')) for row in report])
+    print(f"\n{'Stage':<9} {'Status':<{width}}    Time   Saved")
+    for row in report:
+        status = row.get('status', 'not reached')
+        time_str = f"{row['seconds']:6.1f}s" if row['seconds'] else '      -'
+        saved_str = f"~{row['saved']:.1f}s" if row['saved'] else '-'
+        print(f"{row['stage']:<9} {status:<{width}} {time_str}   {saved_str}")
+    ran = sum(row.get('status') == 'ran' for row in report)
+    reused = sum(row.get('status') in ('up to date', 'restored from cache') for row in report)
+    total = sum(row['seconds'] for row in report)
+    saved = sum(row['saved'] for row in report)
+    print(f"Ran {ran} stage(s) in {total:.1f}s; {reused} reused; time saved ~{saved:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental extract → merge → train pipeline')
+    parser.add_argument('--pdf', default=DEFAULT_PDF, help='Source PDF (relative to extract/)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for extract, merge and training')
+    parser.add_argument('--flavor', default='lattice', choices=['lattice', 'stream'], help='camelot parsing flavor')
+    parser.add_argument('--train-data', default=DEFAULT_TRAIN_DATA, help='Dataset the training notebook reads')
+    parser.add_argument('--notebook', default=DEFAULT_NOTEBOOK, help='Forecast training notebook to execute')
+    parser.add_argument('--params', help='Hyperparameters JSON for train_risk_model.py (fingerprinted)')
+    parser.add_argument('--search', default='random', choices=['random', 'halving'],
+                        help='Hyperparameter search of the train stage')
+    parser.add_argument('--stages', default=','.join(STAGE_NAMES), help='Comma-separated stages to consider')
+    parser.add_argument('--force', default='', help='Comma-separated stages to re-run regardless of fingerprints')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would run')
+    args = parser.parse_args()
+
+    selected = [s.strip() for s in args.stages.split(',') if s.strip()]
+    force = [s.strip() for s in args.force.split(',') if s.strip()]
+    unknown = sorted(set(selected + force) - set(STAGE_NAMES))
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    store = ArtifactStore(BASE_DIR / STORE_DIR_NAME)
+    stages = [stage for stage in build_stages(args) if stage.name in selected]
+    report = run_pipeline(stages, store, force, dry_run=args.dry_run)
+    if not args.dry_run:
+        store.prune()
+    print_report(report)
+    if any(row.get('status', '').startswith('failed') for row in report):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
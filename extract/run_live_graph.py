@@ -3,222 +3,272 @@
 Standalone script to run the live graph visualization.
 This can be run independently while synthetic_sensors.py is running.
 Saves the graph as a PNG image for web display.
+
+The renderer tails the sensor store incrementally (only records newer than
+the last one seen) and keeps the plotted series in fixed-size deques. The
+static parts of the figure (titles, grids, risk bands) are drawn once and
+cached. Each frame restores that background and blits only the data lines.
+Frames are rendered only when new readings arrived.
 """
 
+import io
+import os
 import sys
+import time
+from collections import deque
+from datetime import datetime
 from pathlib import Path
+from typing import Dict, Optional
 
 # Add current directory to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-# Import the live graph function from the notebook
-# Since we can't directly import from notebook, we'll define it here
-import pandas as pd
 import numpy as np
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
 import matplotlib.pyplot as plt
-from datetime import datetime
-import time
+from PIL import Image
+
+from sensor_store import RISK_NAMES, SensorStore
 
-# Path to sensor data file (created by synthetic_sensors.py)
-SENSOR_DATA_FILE = Path(__file__).parent / "sensor_live_data.csv"
+# Path to sensor data store (created by synthetic_sensors.py)
+SENSOR_DATA_FILE = Path(__file__).parent / "sensor_live_data.ring"
 GRAPH_IMAGE_FILE = Path(__file__).parent / "live_graph.png"
 
-def create_live_graph(max_points=50, update_interval=1000):
+# Seconds between sensor readings (synthetic_sensors.UPDATE_INTERVAL); sizes the fixed time axis
+SAMPLE_INTERVAL = 5
+UNKNOWN_RISK = 1  # Plot unknown risk levels as Medium
+
+
+class LiveGraphRenderer:
+    def __init__(self, store_path: Path = SENSOR_DATA_FILE, max_points: int = 50,
+                 window_seconds: Optional[float] = None):
+        """
+        max_points bounds the plotted history. window_seconds is the fixed span of the
+        x axis (seconds before the newest reading), default max_points * SAMPLE_INTERVAL.
+        """
+        self.store = SensorStore.open_reader(store_path)
+        self.max_points = max_points
+        self.window_seconds = window_seconds or max_points * SAMPLE_INTERVAL
+        self.last_seq = 0
+        self.timestamps = deque(maxlen=max_points)
+        self.series = {name: deque(maxlen=max_points) for name in ('Temp', 'DO', 'pH', 'Risk')}
+        self.latest_risk = None
+        self.png = None
+        self.png_time = None
+
+        # Per-frame timing
+        self.frames = 0
+        self.last_frame_ms = {'draw': 0.0, 'encode': 0.0}
+        self.total_frame_ms = {'draw': 0.0, 'encode': 0.0}
+
+        self._build_figure()
+
+    def _build_figure(self):
+        """Draw the static figure once and cache it as the blitting background"""
+        fig, axes = plt.subplots(2, 2, figsize=(14, 10))
+        fig.suptitle('Live Water Quality Monitoring - Synthetic Sensor Data', fontsize=16, fontweight='bold')
+        self.fig = fig
+        self.lines = {}
+
+        # Subplot 1: Temperature
+        ax1 = axes[0, 0]
+        self.lines['Temp'] = (ax1, ax1.plot([], [], 'b-', linewidth=2, marker='o', markersize=4, animated=True)[0])
+        ax1.set_title('Temperature (°C)', fontweight='bold')
+        ax1.set_ylabel('Temperature (°C)')
+        ax1.set_ylim(15, 40)
+
+        # Subplot 2: Dissolved Oxygen
+        ax2 = axes[0, 1]
+        self.lines['DO'] = (ax2, ax2.plot([], [], 'g-', linewidth=2, marker='s', markersize=4, animated=True)[0])
+        ax2.set_title('Dissolved Oxygen (mg/L)', fontweight='bold')
+        ax2.set_ylabel('DO (mg/L)')
+        ax2.set_ylim(0, 12)
+
+        # Subplot 3: pH Level
+        ax3 = axes[1, 0]
+        self.lines['pH'] = (ax3, ax3.plot([], [], 'r-', linewidth=2, marker='^', markersize=4, animated=True)[0])
+        ax3.set_title('pH Level', fontweight='bold')
+        ax3.set_ylabel('pH')
+        ax3.set_ylim(5, 10)
+        ax3.axhspan(6.5, 8.5, alpha=0.2, color='green', label='Safe Range')
+
+        # Subplot 4: Risk Level
+        ax4 = axes[1, 1]
+        self.lines['Risk'] = (ax4, ax4.plot([], [], 'purple', linewidth=2, marker='D', markersize=4, animated=True)[0])
+        ax4.set_title('Predicted Risk Level', fontweight='bold')
+        ax4.set_ylabel('Risk (0=Low, 1=Medium, 2=High)')
+        ax4.set_ylim(-0.5, 2.5)
+        ax4.set_yticks([0, 1, 2])
+        ax4.set_yticklabels(['Low', 'Medium', 'High'])
+        ax4.axhspan(0, 0.5, alpha=0.2, color='green', label='Low Risk')
+        ax4.axhspan(0.5, 1.5, alpha=0.2, color='yellow', label='Medium Risk')
+        ax4.axhspan(1.5, 2.5, alpha=0.2, color='red', label='High Risk')
+
+        # Fixed x axis so the cached background stays valid: seconds before the newest reading
+        for ax in (ax1, ax2, ax3, ax4):
+            ax.grid(True, alpha=0.3)
+            ax.set_xlim(-self.window_seconds, 0.02 * self.window_seconds)
+        ax3.set_xlabel('Seconds before latest reading')
+        ax4.set_xlabel('Seconds before latest reading')
+
+        self.status_text = fig.text(0.99, 0.005, '', ha='right', va='bottom', fontsize=10, color='dimgray',
+                                    animated=True)
+
+        fig.tight_layout(rect=(0, 0.02, 1, 1))
+        fig.canvas.draw()
+        self.background = fig.canvas.copy_from_bbox(fig.bbox)
+
+    def poll(self) -> int:
+        """Read readings newer than the last one seen. Returns how many were added"""
+        newest = self.store.last_seq
+        if newest < self.last_seq:
+            # Store was recreated: start over
+            self.reset()
+        if newest == self.last_seq:
+            return 0
+        since = max(self.last_seq, newest - self.max_points)
+        records = self.store.records_since(since)
+        if len(records) == 0:
+            return 0
+
+        self.timestamps.extend(records['timestamp'].tolist())
+        for name in ('Temp', 'DO', 'pH'):
+            self.series[name].extend(records[name].tolist())
+        risk = records['risk'].astype(float)
+        risk[risk < 0] = UNKNOWN_RISK
+        self.series['Risk'].extend(risk.tolist())
+        self.latest_risk = RISK_NAMES.get(int(records['risk'][-1]), 'Unknown')
+        self.last_seq = int(records['seq'][-1])
+        return len(records)
+
+    def reset(self):
+        self.last_seq = 0
+        self.timestamps.clear()
+        for values in self.series.values():
+            values.clear()
+        self.latest_risk = None
+
+    def render(self) -> bytes:
+        """Blit the current series over the cached background and encode the frame as PNG"""
+        t0 = time.perf_counter()
+        canvas = self.fig.canvas
+        canvas.restore_region(self.background)
+
+        count = len(self.timestamps)
+        times = np.fromiter(self.timestamps, dtype=float, count=count)
+        x = times - times[-1] if count else times
+        for name, (ax, line) in self.lines.items():
+            line.set_data(x, np.fromiter(self.series[name], dtype=float, count=count))
+            ax.draw_artist(line)
+        if count:
+            latest = datetime.fromtimestamp(times[-1]).strftime('%H:%M:%S')
+            self.status_text.set_text(f"Latest reading {latest}  |  Risk: {self.latest_risk}  |  {count} points")
+        else:
+            self.status_text.set_text('Waiting for sensor data...')
+        self.fig.draw_artist(self.status_text)
+        t1 = time.perf_counter()
+
+        self.png = self.encode_png()
+        self.png_time = time.time()
+        t2 = time.perf_counter()
+
+        self.frames += 1
+        self.last_frame_ms = {'draw': 1000 * (t1 - t0), 'encode': 1000 * (t2 - t1)}
+        for stage, ms in self.last_frame_ms.items():
+            self.total_frame_ms[stage] += ms
+        return self.png
+
+    def encode_png(self) -> bytes:
+        """PNG bytes of the canvas (fast zlib level; the figure has a white background, so no alpha)"""
+        canvas = self.fig.canvas
+        width, height = canvas.get_width_height(physical=True)
+        image = Image.frombuffer('RGBA', (width, height), canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1)
+        out = io.BytesIO()
+        image.convert('RGB').save(out, format='PNG', compress_level=1)
+        return out.getvalue()
+
+    def update(self) -> bool:
+        """Poll for new readings and render a frame only if any arrived"""
+        if self.poll() == 0 and self.png is not None:
+            return False
+        self.render()
+        return True
+
+    def save(self, path: Path = GRAPH_IMAGE_FILE):
+        """Write the latest frame atomically so readers never see a half-written PNG"""
+        if self.png is None:
+            self.render()
+        tmp_path = Path(path).with_name(Path(path).name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(self.png)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> Dict:
+        frames = max(self.frames, 1)
+        return {
+            'frames': self.frames,
+            'points': len(self.timestamps),
+            'last_seq': self.last_seq,
+            'last_draw_ms': round(self.last_frame_ms['draw'], 3),
+            'last_encode_ms': round(self.last_frame_ms['encode'], 3),
+            'avg_draw_ms': round(self.total_frame_ms['draw'] / frames, 3),
+            'avg_encode_ms': round(self.total_frame_ms['encode'] / frames, 3),
+        }
+
+    def close(self):
+        plt.close(self.fig)
+
+
+def create_live_graph(max_points=50, update_interval=1000, quiet=False):
     """
     Create a live updating graph from synthetic sensor data.
-    
+
     Parameters:
     - max_points: Maximum number of data points to display (default: 50)
-    - update_interval: Animation update interval in milliseconds (default: 1000ms)
+    - update_interval: Polling interval in milliseconds (default: 1000ms)
+    - quiet: Don't print per-frame render times
     """
-    # Initialize data storage
-    timestamps = []
-    readings_data = {
-        'Temp': [],
-        'DO': [],
-        'pH': [],
-        'Risk_Score': []  # Numeric risk: 0=Low, 1=Medium, 2=High
-    }
-    risk_labels = []
-    
-    # Risk to numeric mapping
-    risk_to_num = {'Low': 0, 'Medium': 1, 'High': 2}
-    
-    # Create figure with subplots
-    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-    fig.suptitle('Live Water Quality Monitoring - Synthetic Sensor Data', fontsize=16, fontweight='bold')
-    
-    # Subplot 1: Temperature
-    ax1 = axes[0, 0]
-    line1, = ax1.plot([], [], 'b-', linewidth=2, marker='o', markersize=4)
-    ax1.set_title('Temperature (°C)', fontweight='bold')
-    ax1.set_ylabel('Temperature (°C)')
-    ax1.grid(True, alpha=0.3)
-    ax1.set_ylim(15, 40)
-    
-    # Subplot 2: Dissolved Oxygen
-    ax2 = axes[0, 1]
-    line2, = ax2.plot([], [], 'g-', linewidth=2, marker='s', markersize=4)
-    ax2.set_title('Dissolved Oxygen (mg/L)', fontweight='bold')
-    ax2.set_ylabel('DO (mg/L)')
-    ax2.grid(True, alpha=0.3)
-    ax2.set_ylim(0, 12)
-    
-    # Subplot 3: pH Level
-    ax3 = axes[1, 0]
-    line3, = ax3.plot([], [], 'r-', linewidth=2, marker='^', markersize=4)
-    ax3.set_title('pH Level', fontweight='bold')
-    ax3.set_ylabel('pH')
-    ax3.set_xlabel('Time')
-    ax3.grid(True, alpha=0.3)
-    ax3.set_ylim(5, 10)
-    ax3.axhspan(6.5, 8.5, alpha=0.2, color='green', label='Safe Range')
-    
-    # Subplot 4: Risk Level
-    ax4 = axes[1, 1]
-    line4, = ax4.plot([], [], 'purple', linewidth=2, marker='D', markersize=4)
-    ax4.set_title('Predicted Risk Level', fontweight='bold')
-    ax4.set_ylabel('Risk (0=Low, 1=Medium, 2=High)')
-    ax4.set_xlabel('Time')
-    ax4.grid(True, alpha=0.3)
-    ax4.set_ylim(-0.5, 2.5)
-    ax4.set_yticks([0, 1, 2])
-    ax4.set_yticklabels(['Low', 'Medium', 'High'])
-    ax4.axhspan(0, 0.5, alpha=0.2, color='green', label='Low Risk')
-    ax4.axhspan(0.5, 1.5, alpha=0.2, color='yellow', label='Medium Risk')
-    ax4.axhspan(1.5, 2.5, alpha=0.2, color='red', label='High Risk')
-    
-    plt.tight_layout()
-    
-    def read_sensor_data():
-        """Read latest data from sensor CSV file"""
-        if not SENSOR_DATA_FILE.exists():
-            return None
-        
-        try:
-            # Read the CSV file
-            df = pd.read_csv(SENSOR_DATA_FILE)
-            if len(df) == 0:
-                return None
-            
-            # Get the latest row
-            latest = df.iloc[-1]
-            
-            # Parse timestamp
-            try:
-                ts = pd.to_datetime(latest['timestamp'])
-            except:
-                ts = datetime.now()
-            
-            return {
-                'timestamp': ts,
-                'Temp': latest.get('Temp', np.nan),
-                'DO': latest.get('DO', np.nan),
-                'pH': latest.get('pH', np.nan),
-                'Risk': latest.get('Risk', 'Unknown')
-            }
-        except Exception as e:
-            print(f"Error reading sensor data: {e}")
-            return None
-    
-    def update_graph():
-        """Update graph with latest data"""
-        # Read latest sensor data
-        data = read_sensor_data()
-        
-        if data is None:
-            # Still save the current state even if no new data
-            try:
-                fig.savefig(GRAPH_IMAGE_FILE, dpi=100, bbox_inches='tight', facecolor='white')
-            except:
-                pass
-            return
-        
-        # Check if this is a new data point (avoid duplicates)
-        if len(timestamps) > 0 and timestamps[-1] == data['timestamp']:
-            # Same timestamp, just update the existing graph
-            pass
-        else:
-            # Add new data point
-            timestamps.append(data['timestamp'])
-            readings_data['Temp'].append(data['Temp'])
-            readings_data['DO'].append(data['DO'])
-            readings_data['pH'].append(data['pH'])
-            
-            # Convert risk to numeric
-            risk_num = risk_to_num.get(data['Risk'], 1)
-            readings_data['Risk_Score'].append(risk_num)
-            risk_labels.append(data['Risk'])
-        
-        # Keep only last max_points
-        if len(timestamps) > max_points:
-            timestamps.pop(0)
-            readings_data['Temp'].pop(0)
-            readings_data['DO'].pop(0)
-            readings_data['pH'].pop(0)
-            readings_data['Risk_Score'].pop(0)
-            risk_labels.pop(0)
-        
-        # Update plots
-        if len(timestamps) > 0:
-            # Convert timestamps to relative time (seconds from start)
-            if len(timestamps) == 1:
-                time_axis = [0]
-            else:
-                start_time = timestamps[0]
-                time_axis = [(t - start_time).total_seconds() for t in timestamps]
-            
-            line1.set_data(time_axis, readings_data['Temp'])
-            line2.set_data(time_axis, readings_data['DO'])
-            line3.set_data(time_axis, readings_data['pH'])
-            line4.set_data(time_axis, readings_data['Risk_Score'])
-            
-            # Update axis limits
-            if len(time_axis) > 1:
-                ax1.set_xlim(min(time_axis), max(time_axis))
-                ax2.set_xlim(min(time_axis), max(time_axis))
-                ax3.set_xlim(min(time_axis), max(time_axis))
-                ax4.set_xlim(min(time_axis), max(time_axis))
-            else:
-                ax1.set_xlim(0, 10)
-                ax2.set_xlim(0, 10)
-                ax3.set_xlim(0, 10)
-                ax4.set_xlim(0, 10)
-        
-        # Save the graph as PNG image
-        try:
-            fig.savefig(GRAPH_IMAGE_FILE, dpi=100, bbox_inches='tight', facecolor='white')
-        except Exception as e:
-            print(f"Error saving graph image: {e}")
-    
+    renderer = LiveGraphRenderer(SENSOR_DATA_FILE, max_points=max_points)
+
     print("📊 Live graph started. Make sure synthetic_sensors.py is running.")
     print(f"   Reading from: {SENSOR_DATA_FILE.absolute()}")
     print(f"   Saving graph to: {GRAPH_IMAGE_FILE.absolute()}")
-    print("   Graph will update every", update_interval, "ms")
+    print("   Checking for new readings every", update_interval, "ms")
     print("   Press Ctrl+C to stop.")
-    
-    # Save initial empty graph
+
+    # Save initial graph (empty, or the latest readings if the sensor is already running)
     try:
-        fig.savefig(GRAPH_IMAGE_FILE, dpi=100, bbox_inches='tight', facecolor='white')
+        renderer.update()
+        renderer.save(GRAPH_IMAGE_FILE)
     except Exception as e:
         print(f"Error saving initial graph: {e}")
-    
+
     # Run the update loop manually (no animation framework needed)
     try:
         while True:
-            update_graph()
+            try:
+                if renderer.update():
+                    renderer.save(GRAPH_IMAGE_FILE)
+                    if not quiet:
+                        frame = renderer.last_frame_ms
+                        print(f"   frame {renderer.frames}: {len(renderer.timestamps)} points, "
+                              f"draw {frame['draw']:.1f} ms, encode {frame['encode']:.1f} ms")
+            except Exception as e:
+                print(f"Error updating graph: {e}")
             time.sleep(update_interval / 1000.0)
     except KeyboardInterrupt:
         print("\n🛑 Stopping live graph...")
-        plt.close(fig)
+        stats = renderer.stats()
+        print(f"   {stats['frames']} frames, avg draw {stats['avg_draw_ms']:.1f} ms, "
+              f"avg encode {stats['avg_encode_ms']:.1f} ms")
     except Exception as e:
         print(f"Error in graph loop: {e}")
         import traceback
         traceback.print_exc()
-        plt.close(fig)
-    
+    finally:
+        renderer.close()
+
     return None
 
 if __name__ == "__main__":
@@ -226,7 +276,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Live graph visualization for synthetic sensor data')
     parser.add_argument('--max-points', type=int, default=50, help='Maximum data points to display')
     parser.add_argument('--update-interval', type=int, default=1000, help='Update interval in milliseconds')
+    parser.add_argument('--quiet', action='store_true', help="Don't print per-frame render times")
     args = parser.parse_args()
-    
-    create_live_graph(max_points=args.max_points, update_interval=args.update_interval)
 
+    create_live_graph(max_points=args.max_points, update_interval=args.update_interval, quiet=args.quiet)
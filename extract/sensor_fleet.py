@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Multi-station sensor fleet simulator for load-testing the forecast model
+
+Where SyntheticSensor simulates one station with a Python loop per feature,
+the fleet generates readings for every station as one NumPy array per tick.
+Per-station lag windows live in a preallocated (stations, L, features) array
+and the feature matrix is assembled in place. The whole fleet is scored with
+one predict_proba call per tick.
+
+Usage:
+    python sensor_fleet.py --stations 5000 --ticks 30 --tick-rate 1
+    python sensor_fleet.py --stations 20000 --ticks 10 --tick-rate 0   # unthrottled, max throughput
+    python sensor_fleet.py --stations 5000 --compiled                  # score with compiled_forest
+"""
+
+import argparse
+import time
+import warnings
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+
+from synthetic_sensors import DATA_PATH, FEATURES, MODEL_PATH, lag_column_layout, load_value_ranges
+
+
+class SensorFleet:
+    def __init__(self, model_path: Path, data_path: Path, n_stations: int, seed: Optional[int] = None,
+                 use_compiled: bool = False):
+        """Load the forecast model and preallocate lag windows for `n_stations` stations"""
+        if n_stations < 1:
+            raise ValueError("n_stations must be >= 1")
+        self.n_stations = n_stations
+        self.rng = np.random.default_rng(seed)
+
+        model_data = joblib.load(model_path)
+        missing_keys = [key for key in ['model', 'label_encoder', 'lag_features'] if key not in model_data]
+        if missing_keys:
+            raise KeyError(f"Model file missing required keys: {missing_keys}")
+        self.model = model_data['model']
+        self.lag_features = list(model_data['lag_features'])
+        self.L = model_data.get('L', 3)
+        self.H = model_data.get('H', 1)
+        label_encoder = model_data['label_encoder']
+        self.risk_levels = np.asarray(label_encoder.inverse_transform(self.model.classes_))
+
+        self.compiled = None
+        if use_compiled:
+            from compiled_forest import CompiledForest, load_if_fresh
+            self.compiled = load_if_fresh(model_path) or CompiledForest.from_artifact(model_data, source=model_path)
+
+        # Sampling parameters for the features present in the historical data
+        value_ranges = load_value_ranges(data_path)
+        self.active = np.array([i for i, feat in enumerate(FEATURES) if feat in value_ranges], dtype=np.intp)
+        active_ranges = [value_ranges[FEATURES[i]] for i in self.active]
+        self.mins = np.array([r['min'] for r in active_ranges], dtype=float)
+        self.maxs = np.array([r['max'] for r in active_ranges], dtype=float)
+        self.means = np.array([r['mean'] for r in active_ranges], dtype=float)
+        self.stds = np.array([r['std'] for r in active_ranges], dtype=float)
+        # Historical quantiles (from the statistics sidecar) for baseline sampling, if every feature has them
+        quantiles = [r.get('quantiles') for r in active_ranges]
+        self.quantiles = np.array(quantiles, dtype=float) if quantiles and all(quantiles) else None
+
+        # Lag windows: slot `pos` holds the newest reading; features missing from the data stay 0
+        # (SyntheticSensor fills missing lag columns with 0 as well)
+        self.window = np.zeros((n_stations, self.L, len(FEATURES)), dtype=float)
+        self.pos = -1
+        self.filled = 0
+
+        lags, feature_index, station_column = lag_column_layout(self.lag_features, FEATURES, self.L)
+        self.lag_columns = np.flatnonzero(lags >= 0)
+        self.column_lags = lags[self.lag_columns]
+        self.column_features = feature_index[self.lag_columns]
+        self.X = np.zeros((n_stations, len(self.lag_features)), dtype=float)
+        self.station_ids = self._assign_stations(model_data.get('station_encoder'), station_column)
+
+        # Metrics
+        self.ticks = 0
+        self.predicted_ticks = 0
+        self.stage_totals = {'generate': 0.0, 'assemble': 0.0, 'predict': 0.0}
+        self.risk_counts = {str(level): 0 for level in self.risk_levels}
+
+    def _assign_stations(self, station_encoder, station_column: Optional[int]) -> np.ndarray:
+        """Cycle the fleet through the stations the encoder knows and write their codes into X once"""
+        categories = None
+        if station_encoder is not None and hasattr(station_encoder, 'categories_'):
+            categories = np.asarray(station_encoder.categories_[0])
+        if categories is None or len(categories) == 0:
+            station_ids = np.array([f"FLEET_{i:05d}" for i in range(self.n_stations)])
+            if station_column is not None:
+                self.X[:, station_column] = 0
+            return station_ids
+
+        picks = np.arange(self.n_stations) % len(categories)
+        station_ids = categories[picks]
+        if station_column is not None:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)
+                codes = station_encoder.transform(categories.reshape(-1, 1))[:, 0]
+            self.X[:, station_column] = codes[picks]
+        return station_ids
+
+    def generate(self) -> np.ndarray:
+        """
+        One reading per station, shape (stations, active features).
+
+        Same mixture as SyntheticSensor.generate_sensor_reading: baseline (45%),
+        uniform sweep (35%), edge burst (20%), clipped and rounded to 2 dp. The
+        baseline follows the historical quantiles when the sidecar provides them,
+        else it is a widened gaussian.
+        Edge-burst overshoot is always clipped away, so bursts land on min or max.
+        """
+        shape = (self.n_stations, len(self.active))
+        mode = self.rng.random(shape)
+        if self.quantiles is not None:
+            u = self.rng.random(shape)
+            probs = np.linspace(0.0, 1.0, self.quantiles.shape[1])
+            baseline = np.empty(shape)
+            for j in range(shape[1]):
+                baseline[:, j] = np.interp(u[:, j], probs, self.quantiles[j])
+        else:
+            baseline = self.rng.normal(self.means, self.stds * self.rng.uniform(1.0, 2.5, shape))
+        sweep = self.rng.uniform(self.mins, self.maxs, shape)
+        edge = np.where(self.rng.random(shape) < 0.5, self.mins, self.maxs)
+        values = np.where(mode < 0.45, baseline, np.where(mode < 0.8, sweep, edge))
+        np.clip(values, self.mins, self.maxs, out=values)
+        return np.round(values, 2, out=values)
+
+    def assemble(self):
+        """Write every station's lag vector into the preallocated feature matrix"""
+        slots = (self.pos - self.column_lags) % self.L
+        self.X[:, self.lag_columns] = self.window[:, slots, self.column_features]
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        if self.compiled is not None:
+            return self.compiled.predict_proba(X)
+        # The model was fitted on a DataFrame; a bare array is equivalent here
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            return self.model.predict_proba(X)
+
+    def tick(self) -> Optional[np.ndarray]:
+        """Advance every station by one reading; returns class probabilities once L readings exist"""
+        t0 = time.perf_counter()
+        readings = self.generate()
+        self.pos = (self.pos + 1) % self.L
+        self.window[:, self.pos, self.active] = readings
+        self.filled = min(self.filled + 1, self.L)
+        self.ticks += 1
+        t1 = time.perf_counter()
+        self.stage_totals['generate'] += t1 - t0
+        if self.filled < self.L:
+            return None
+
+        self.assemble()
+        t2 = time.perf_counter()
+        probs = self.predict_proba(self.X)
+        t3 = time.perf_counter()
+        self.stage_totals['assemble'] += t2 - t1
+        self.stage_totals['predict'] += t3 - t2
+        self.predicted_ticks += 1
+
+        levels, counts = np.unique(self.risk_levels[probs.argmax(axis=1)], return_counts=True)
+        for level, count in zip(levels, counts):
+            self.risk_counts[str(level)] += int(count)
+        return probs
+
+    def run(self, ticks: int, tick_rate: float = 1.0, verbose: bool = True) -> Dict:
+        """
+        Run `ticks` ticks at `tick_rate` ticks per second (0 = as fast as possible).
+        Ticks whose work takes longer than the tick interval count as overruns.
+        """
+        interval = 1.0 / tick_rate if tick_rate > 0 else 0.0
+        overruns = 0
+        start = time.perf_counter()
+        deadline = start
+        for i in range(ticks):
+            tick_start = time.perf_counter()
+            probs = self.tick()
+            elapsed = time.perf_counter() - tick_start
+            if verbose:
+                state = f"{self.n_stations} forecasts" if probs is not None else f"warming up ({self.filled}/{self.L})"
+                print(f"  tick {i + 1:4d}: {1000 * elapsed:8.2f} ms  {state}")
+            if interval:
+                deadline += interval
+                remaining = deadline - time.perf_counter()
+                if remaining > 0:
+                    time.sleep(remaining)
+                else:
+                    overruns += 1
+                    deadline = time.perf_counter()
+        wall = time.perf_counter() - start
+        return self.report(wall, overruns, tick_rate)
+
+    def report(self, wall_seconds: float, overruns: int, tick_rate: float) -> Dict:
+        per_tick = {
+            'generate': 1000 * self.stage_totals['generate'] / max(self.ticks, 1),
+            'assemble': 1000 * self.stage_totals['assemble'] / max(self.predicted_ticks, 1),
+            'predict': 1000 * self.stage_totals['predict'] / max(self.predicted_ticks, 1),
+        }
+        busy_ms = sum(per_tick.values())
+        return {
+            'stations': self.n_stations,
+            'ticks': self.ticks,
+            'forecast_ticks': self.predicted_ticks,
+            'tick_rate': tick_rate,
+            'scorer': 'compiled' if self.compiled is not None else 'sklearn',
+            'ms_per_tick': {stage: round(ms, 3) for stage, ms in per_tick.items()},
+            'ms_per_tick_total': round(busy_ms, 3),
+            # Steady-state readings/s (ticks with forecasts) if ticks ran back to back with no sleeping
+            'achievable_readings_per_sec': round(1000 * self.n_stations / busy_ms, 1) if busy_ms else None,
+            'actual_readings_per_sec': round(self.n_stations * self.ticks / wall_seconds, 1) if wall_seconds else None,
+            'overruns': overruns,
+            'risk_counts': dict(self.risk_counts),
+        }
+
+
+def print_report(report: Dict):
+    print("\n" + "=" * 60)
+    print(f"Fleet: {report['stations']} stations, {report['ticks']} ticks "
+          f"({report['forecast_ticks']} with forecasts), scorer: {report['scorer']}")
+    stages = report['ms_per_tick']
+    print(f"  Per tick:  generate {stages['generate']:.2f} ms | assemble {stages['assemble']:.2f} ms | "
+          f"predict {stages['predict']:.2f} ms | total {report['ms_per_tick_total']:.2f} ms")
+    print(f"  Achievable throughput: {report['achievable_readings_per_sec']:,.0f} readings/s (steady state)")
+    print(f"  Actual throughput:     {report['actual_readings_per_sec']:,.0f} readings/s "
+          f"at {report['tick_rate'] or 'unthrottled'} ticks/s")
+    if report['overruns']:
+        print(f"  ⚠️  {report['overruns']} ticks overran the tick interval")
+    total = sum(report['risk_counts'].values())
+    if total:
+        mix = ", ".join(f"{level} {100 * count / total:.1f}%" for level, count in report['risk_counts'].items())
+        print(f"  Forecast mix: {mix}")
+    print("=" * 60)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Simulate a fleet of water quality sensors with batched forecasting')
+    parser.add_argument('--stations', type=int, default=1000, help='Number of simulated stations')
+    parser.add_argument('--ticks', type=int, default=20, help='Number of ticks to run')
+    parser.add_argument('--tick-rate', type=float, default=1.0, help='Ticks per second (0 = as fast as possible)')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed')
+    parser.add_argument('--compiled', action='store_true', help='Score with the compiled forest instead of sklearn')
+    parser.add_argument('--model', type=Path, default=MODEL_PATH, help='Forecast model artifact')
+    parser.add_argument('--data', type=Path, default=DATA_PATH, help='Historical data for value ranges')
+    parser.add_argument('--quiet', action='store_true', help='Only print the final report')
+    args = parser.parse_args(argv)
+
+    fleet = SensorFleet(args.model, args.data, args.stations, seed=args.seed, use_compiled=args.compiled)
+    print(f"🚰 Simulating {args.stations} stations (L={fleet.L}, H={fleet.H})")
+    report = fleet.run(args.ticks, tick_rate=args.tick_rate, verbose=not args.quiet)
+    print_report(report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
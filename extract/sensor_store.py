@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Append-only ring-buffer store for live sensor readings
+
+Replaces the ever-growing sensor_live_data.csv. Readings are fixed-size binary
+records in a memory-mapped file. The sensor appends, and the API and live graph
+read the last N records in O(N) however long the sensor has been running.
+
+Layout: a 64-byte header (magic, version, record size, capacity, committed
+record count) followed by `capacity` records. Record k (1-based sequence
+number) lives in slot (k - 1) % capacity.
+
+Concurrency: one writer and many readers, possibly in other processes. The
+writer zeroes a slot's sequence number, writes the payload, stores the
+sequence number, then bumps the header count. Readers copy the slots, re-read
+their sequence numbers and discard any record that was being rewritten
+underneath them. A second writer is refused through an exclusive file lock
+where the platform supports it.
+
+Usage:
+    python sensor_store.py tail sensor_live_data.ring -n 10
+    python sensor_store.py export sensor_live_data.ring sensor_live_data_export.csv
+    python sensor_store.py import sensor_live_data.csv sensor_live_data.ring
+"""
+
+import csv
+import math
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer is not enforced
+    fcntl = None
+
+FEATURES = ['Temp', 'DO', 'pH', 'Conductivity', 'BOD', 'Nitrate', 'FecalColiform', 'TotalColiform']
+CSV_HEADERS = ['timestamp'] + FEATURES + ['Risk', 'Confidence']
+RISK_CODES = {'Low': 0, 'Medium': 1, 'High': 2}
+RISK_NAMES = {code: name for name, code in RISK_CODES.items()}
+
+MAGIC = b'AWRSTORE'
+FORMAT_VERSION = 1
+HEADER_SIZE = 64
+DEFAULT_CAPACITY = 65536
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('record_size', '<u4'),
+    ('capacity', '<u8'),
+    ('write_seq', '<u8'),
+    ('created', '<f8'),
+])
+RECORD_DTYPE = np.dtype(
+    [('seq', '<u8'), ('timestamp', '<f8')]
+    + [(feat, '<f8') for feat in FEATURES]
+    + [('confidence', '<f8'), ('risk', 'i1'), ('_pad', 'V7')]
+)
+
+
+class StoreLockedError(RuntimeError):
+    """Raised when another process already holds the writer lock"""
+
+
+class SensorStore:
+    def __init__(self, path: Path, writable: bool = False):
+        """Use open_writer() / open_reader() rather than constructing directly"""
+        self.path = Path(path)
+        self.writable = writable
+        self.mm = None
+        self.header = None
+        self.records = None
+        self.capacity = 0
+        self.identity = None
+        self.lock_file = None
+
+    # ------------------------------------------------------------------ opening
+
+    @classmethod
+    def open_writer(cls, path: Path, capacity: int = DEFAULT_CAPACITY) -> 'SensorStore':
+        """
+        Open (or create) the store for appending.
+
+        An existing file with a compatible header is reused and appending continues
+        after its last record. Anything else is replaced with an empty store.
+        """
+        store = cls(path, writable=True)
+        store._acquire_lock()
+        try:
+            if not store._compatible_file():
+                store._create(capacity)
+            store._map()
+        except Exception:
+            store.close()
+            raise
+        return store
+
+    @classmethod
+    def open_reader(cls, path: Path) -> 'SensorStore':
+        """Open the store read-only. A missing file is fine and reads as empty until the writer creates it"""
+        store = cls(path, writable=False)
+        store._refresh()
+        return store
+
+    def _acquire_lock(self):
+        if fcntl is None:
+            return
+        lock_path = self.path.with_name(self.path.name + '.lock')
+        self.lock_file = open(lock_path, 'a+')
+        try:
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self.lock_file.close()
+            self.lock_file = None
+            raise StoreLockedError(f"Another process is already writing to {self.path}")
+
+    def _compatible_file(self) -> bool:
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read(HEADER_DTYPE.itemsize)
+            if len(raw) < HEADER_DTYPE.itemsize:
+                return False
+            header = np.frombuffer(raw, dtype=HEADER_DTYPE)[0]
+            expected_size = HEADER_SIZE + int(header['capacity']) * RECORD_DTYPE.itemsize
+            return (header['magic'] == MAGIC and int(header['version']) == FORMAT_VERSION
+                    and int(header['record_size']) == RECORD_DTYPE.itemsize
+                    and int(header['capacity']) > 0
+                    and os.path.getsize(self.path) == expected_size)
+        except (OSError, ValueError):
+            return False
+
+    def _create(self, capacity: int):
+        """Write an empty store to a temp file and atomically move it into place"""
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header['magic'] = MAGIC
+        header['version'] = FORMAT_VERSION
+        header['record_size'] = RECORD_DTYPE.itemsize
+        header['capacity'] = capacity
+        header['write_seq'] = 0
+        header['created'] = time.time()
+        with open(tmp_path, 'wb') as f:
+            f.write(header.tobytes().ljust(HEADER_SIZE, b'\0'))
+            f.truncate(HEADER_SIZE + capacity * RECORD_DTYPE.itemsize)
+        os.replace(tmp_path, self.path)
+
+    def _map(self):
+        st = os.stat(self.path)
+        mode = 'r+' if self.writable else 'r'
+        self.mm = np.memmap(self.path, dtype=np.uint8, mode=mode)
+        self.header = self.mm[:HEADER_DTYPE.itemsize].view(HEADER_DTYPE)
+        self.capacity = int(self.header['capacity'][0])
+        self.records = self.mm[HEADER_SIZE:HEADER_SIZE + self.capacity * RECORD_DTYPE.itemsize].view(RECORD_DTYPE)
+        self.identity = (st.st_ino, st.st_size)
+
+    def _refresh(self) -> bool:
+        """(Re)map the file for readers if it appeared or was replaced. Returns True if mapped"""
+        if self.writable:
+            return self.mm is not None
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            self._unmap()
+            return False
+        identity = (st.st_ino, st.st_size)
+        if self.mm is not None and identity == self.identity:
+            return True
+        self._unmap()
+        if not self._compatible_file():
+            return False
+        self._map()
+        return True
+
+    def _unmap(self):
+        self.mm = None
+        self.header = None
+        self.records = None
+        self.identity = None
+
+    def close(self):
+        if self.mm is not None and self.writable:
+            self.mm.flush()
+        self._unmap()
+        if self.lock_file is not None:
+            if fcntl is not None:
+                fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+            self.lock_file.close()
+            self.lock_file = None
+
+    @property
+    def closed(self) -> bool:
+        return self.mm is None
+
+    # ------------------------------------------------------------------ writing
+
+    @property
+    def created(self) -> float:
+        """Creation time of the current store file (0 when missing); changes if the file is recreated"""
+        if not self._refresh():
+            return 0.0
+        return float(self.header['created'][0])
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the newest committed record (0 when empty)"""
+        if not self._refresh():
+            return 0
+        return int(self.header['write_seq'][0])
+
+    def append(self, reading: Dict[str, float], risk: Optional[str], confidence: Optional[float],
+               timestamp: Optional[float] = None) -> int:
+        """Append one reading and return its sequence number"""
+        if not self.writable or self.mm is None:
+            raise RuntimeError("Store is not open for writing")
+        seq = int(self.header['write_seq'][0]) + 1
+        index = (seq - 1) % self.capacity
+        slot = self.records[index:index + 1]
+
+        slot['seq'] = 0  # mark in-progress for concurrent readers
+        slot['timestamp'] = time.time() if timestamp is None else timestamp
+        for feat in FEATURES:
+            value = reading.get(feat)
+            slot[feat] = np.nan if value is None else value
+        slot['confidence'] = np.nan if confidence is None else confidence
+        slot['risk'] = RISK_CODES.get(risk, -1)
+        slot['seq'] = seq
+        self.header['write_seq'] = seq
+        return seq
+
+    # ------------------------------------------------------------------ reading
+
+    def _read_range(self, first_seq: int, last_seq: int) -> np.ndarray:
+        """Copy records first_seq..last_seq (inclusive) that are still intact"""
+        if last_seq < first_seq:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        seqs = np.arange(first_seq, last_seq + 1, dtype=np.uint64)
+        slots = ((seqs - 1) % self.capacity).astype(np.int64)
+        copied = self.records[slots].copy()
+        # Seqlock check: a slot rewritten during the copy no longer carries its expected seq
+        after = self.records['seq'][slots]
+        intact = (copied['seq'] == seqs) & (after == seqs)
+        return copied[intact]
+
+    def latest_records(self, n: int) -> np.ndarray:
+        """Newest `n` records as a structured array, oldest first"""
+        if n <= 0 or not self._refresh():
+            return np.empty(0, dtype=RECORD_DTYPE)
+        last = int(self.header['write_seq'][0])
+        first = max(1, last - n + 1, last - self.capacity + 1)
+        return self._read_range(first, last)
+
+    def records_since(self, seq: int, limit: Optional[int] = None) -> np.ndarray:
+        """Records with sequence number > seq, oldest first (at most `limit`)"""
+        if not self._refresh():
+            return np.empty(0, dtype=RECORD_DTYPE)
+        last = int(self.header['write_seq'][0])
+        first = max(seq + 1, last - self.capacity + 1, 1)
+        if limit is not None:
+            last = min(last, first + limit - 1)
+        return self._read_range(first, last)
+
+    def latest(self, n: int) -> List[Dict]:
+        """Newest `n` readings as dicts with the same keys as the old CSV rows (plus 'seq')"""
+        return records_to_dicts(self.latest_records(n))
+
+    def since(self, seq: int, limit: Optional[int] = None) -> List[Dict]:
+        return records_to_dicts(self.records_since(seq, limit))
+
+    def export_csv(self, out_path: Path) -> int:
+        """Write every retained record to a CSV with the legacy sensor_live_data.csv columns"""
+        records = self.latest_records(self.capacity) if self._refresh() else np.empty(0, dtype=RECORD_DTYPE)
+        with open(out_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADERS)
+            for row in records_to_dicts(records):
+                writer.writerow(['' if row[col] is None else row[col] for col in CSV_HEADERS])
+        return len(records)
+
+
+def _clean(value: float) -> Optional[float]:
+    """NaN -> None so rows stay JSON-serialisable"""
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def records_to_dicts(records: np.ndarray) -> List[Dict]:
+    rows = []
+    for rec in records:
+        row = {'seq': int(rec['seq']), 'timestamp': datetime.fromtimestamp(float(rec['timestamp'])).isoformat()}
+        for feat in FEATURES:
+            row[feat] = _clean(rec[feat])
+        row['Risk'] = RISK_NAMES.get(int(rec['risk']), 'Unknown')
+        row['Confidence'] = _clean(rec['confidence'])
+        rows.append(row)
+    return rows
+
+
+def records_to_columns(records: np.ndarray) -> Dict[str, List]:
+    """Column-oriented form of records_to_dicts, for charting"""
+    columns = {
+        'seq': records['seq'].tolist(),
+        'timestamp': [datetime.fromtimestamp(ts).isoformat() for ts in records['timestamp'].tolist()],
+    }
+    for feat in FEATURES:
+        columns[feat] = [_clean(v) for v in records[feat].tolist()]
+    columns['Risk'] = [RISK_NAMES.get(code, 'Unknown') for code in records['risk'].tolist()]
+    columns['Confidence'] = [_clean(v) for v in records['confidence'].tolist()]
+    return columns
+
+
+def import_csv(csv_path: Path, store_path: Path, capacity: int = DEFAULT_CAPACITY) -> int:
+    """Seed a store from a legacy sensor_live_data.csv"""
+    store = SensorStore.open_writer(store_path, capacity=capacity)
+    count = 0
+    try:
+        with open(csv_path, newline='') as f:
+            for row in csv.DictReader(f):
+                reading = {feat: float(row[feat]) if row.get(feat) not in (None, '') else None for feat in FEATURES}
+                confidence = float(row['Confidence']) if row.get('Confidence') not in (None, '') else None
+                try:
+                    ts = datetime.fromisoformat(row['timestamp']).timestamp()
+                except (KeyError, TypeError, ValueError):
+                    ts = None
+                store.append(reading, row.get('Risk'), confidence, timestamp=ts)
+                count += 1
+    finally:
+        store.close()
+    return count
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Inspect and convert the sensor ring-buffer store')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_tail = sub.add_parser('tail', help='Print the newest readings')
+    p_tail.add_argument('store', type=Path)
+    p_tail.add_argument('-n', type=int, default=10)
+
+    p_export = sub.add_parser('export', help='Export retained readings to CSV')
+    p_export.add_argument('store', type=Path)
+    p_export.add_argument('csv', type=Path)
+
+    p_import = sub.add_parser('import', help='Append readings from a legacy CSV into a store')
+    p_import.add_argument('csv', type=Path)
+    p_import.add_argument('store', type=Path)
+    p_import.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY)
+
+    args = parser.parse_args()
+    if args.command == 'tail':
+        store = SensorStore.open_reader(args.store)
+        for row in store.latest(args.n):
+            print(row)
+    elif args.command == 'export':
+        count = SensorStore.open_reader(args.store).export_csv(args.csv)
+        print(f"✅ Exported {count} readings to {args.csv}")
+    else:
+        count = import_csv(args.csv, args.store, capacity=args.capacity)
+        print(f"✅ Imported {count} readings into {args.store}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,24 +6,127 @@ Simulates live water quality sensor data and feeds it to the forecast model.
 Use CLI commands: 'on' to start, 'off' to stop, 'status' to check, 'exit' to quit.
 """
 
-import pandas as pd
 import numpy as np
 import joblib
 import time
 import threading
+import warnings
 from pathlib import Path
 from datetime import datetime
 from typing import Optional, Dict, List
 
+from sensor_store import SensorStore
+from feature_stats import load_feature_stats, stats_path, value_ranges_from_stats
+from wq_dataset import dataset_exists
+
 # Configuration
 MODEL_PATH = Path(__file__).parent / "rf_forecast_model.joblib"
 DATA_PATH = Path(__file__).parent / "water_dataX.csv"
-SENSOR_DATA_FILE = Path(__file__).parent / "sensor_live_data.csv"
+SENSOR_DATA_FILE = Path(__file__).parent / "sensor_live_data.ring"
 UPDATE_INTERVAL = 5  # seconds between sensor readings
+FEATURES = ['Temp', 'DO', 'pH', 'Conductivity', 'BOD', 'Nitrate', 'FecalColiform', 'TotalColiform']
+
+# Fallback ranges used when water_dataX (.parquet/.csv) is unavailable
+DEFAULT_VALUE_RANGES = {
+    'Temp': {'min': 20, 'max': 35, 'mean': 28, 'std': 3},
+    'DO': {'min': 2, 'max': 10, 'mean': 5, 'std': 2},
+    'pH': {'min': 6, 'max': 9, 'mean': 7.2, 'std': 0.5},
+    'Conductivity': {'min': 50, 'max': 3000, 'mean': 500, 'std': 400},
+    'BOD': {'min': 0.5, 'max': 10, 'mean': 3, 'std': 2},
+    'Nitrate': {'min': 0.1, 'max': 50, 'mean': 5, 'std': 8},
+    'FecalColiform': {'min': 10, 'max': 10000, 'mean': 1000, 'std': 2000},
+    'TotalColiform': {'min': 50, 'max': 20000, 'mean': 3000, 'std': 4000}
+}
+
+
+def load_value_ranges(data_path: Path) -> Dict[str, Dict[str, float]]:
+    """
+    Per-feature min/max/mean/std (and quantiles) from historical data, for realistic synthetic readings.
+    Read from the statistics sidecar next to the data; recomputed only when the data changed.
+    """
+    try:
+        if dataset_exists(data_path) or stats_path(data_path).exists():
+            stats = load_feature_stats(data_path)
+            value_ranges = value_ranges_from_stats(stats)
+            for feat, ranges in value_ranges.items():
+                ranges['quantiles'] = stats['features'][feat]['quantiles']
+            print(f"✅ Loaded value ranges for {len(value_ranges)} features ({stats_path(data_path).name})")
+            return value_ranges
+        print("⚠️  Using default value ranges (data file not found)")
+    except Exception as e:
+        print(f"⚠️  Error loading data ranges: {e}. Using defaults.")
+    return {feat: dict(ranges) for feat, ranges in DEFAULT_VALUE_RANGES.items()}
+
+
+def lag_column_layout(lag_features: List[str], features: List[str], L: int):
+    """
+    Map each model column to where its value lives in a (L, features) lag window.
+    
+    Returns (lags, feature_index, station_column): for column j named
+    '{feat}_lag{k}', lags[j] = k and feature_index[j] = features.index(feat).
+    Columns that are not lag features (e.g. 'station_encoded') get -1 in both.
+    station_column is the index of 'station_encoded', or None.
+    """
+    lags = np.full(len(lag_features), -1, dtype=np.intp)
+    feature_index = np.full(len(lag_features), -1, dtype=np.intp)
+    position = {feat: i for i, feat in enumerate(features)}
+    for j, col in enumerate(lag_features):
+        feat, sep, lag = col.rpartition('_lag')
+        if sep and feat in position and lag.isdigit() and int(lag) < L:
+            lags[j] = int(lag)
+            feature_index[j] = position[feat]
+    station_column = lag_features.index('station_encoded') if 'station_encoded' in lag_features else None
+    return lags, feature_index, station_column
+
+class LagWindow:
+    """Fixed-size ring of the last `size` readings, one row per reading in FEATURES order"""
+    __slots__ = ('values', 'size', 'pos', 'count')
+    
+    def __init__(self, size: int, n_features: int):
+        self.values = np.full((size, n_features), np.nan)
+        self.size = size
+        self.pos = -1  # row holding the newest reading (lag 0)
+        self.count = 0
+    
+    def push(self, reading: Dict[str, float]):
+        self.pos = (self.pos + 1) % self.size
+        row = self.values[self.pos]
+        for i, feat in enumerate(FEATURES):
+            row[i] = reading.get(feat, np.nan)
+        if self.count < self.size:
+            self.count += 1
+    
+    def clear(self):
+        self.values.fill(np.nan)
+        self.pos = -1
+        self.count = 0
+    
+    def is_full(self) -> bool:
+        return self.count == self.size
+    
+    def __len__(self) -> int:
+        return self.count
+
+
+def validate_forecast_model(model_data) -> Dict:
+    """Check a loaded rf_forecast_model artifact has what the sensor needs; returns it unchanged"""
+    # Validate required keys
+    required_keys = ['model', 'label_encoder', 'lag_features']
+    missing_keys = [key for key in required_keys if key not in model_data]
+    if missing_keys:
+        raise KeyError(f"Model file missing required keys: {missing_keys}")
+    # Validate lag_features is not empty
+    if not model_data['lag_features'] or len(model_data['lag_features']) == 0:
+        raise ValueError("lag_features is empty or invalid")
+    return model_data
+
 
 class SyntheticSensor:
-    def __init__(self, model_path: Path, data_path: Path, sensor_data_file: Path):
-        """Initialize synthetic sensor with forecast model"""
+    def __init__(self, model_path: Path, data_path: Path, sensor_data_file: Path, model_data: Optional[Dict] = None):
+        """
+        Initialize synthetic sensor with forecast model. Pass `model_data` to share an
+        artifact that is already loaded (e.g. by the backend's model registry).
+        """
         self.model_path = model_path
         self.data_path = data_path
         self.sensor_data_file = sensor_data_file
@@ -36,141 +139,134 @@ class SyntheticSensor:
         self.station_encoder = None
         self.is_running = False
         self.sensor_thread = None
-        self.history = []  # Store recent readings for lag features
+        self.history = None  # LagWindow of recent readings for lag features
+        self.feature_buffer = None  # Reused (1, n_lag_features) model input
+        self.store = None
+        self.listeners = []  # Callbacks that receive each stored reading
+        self.model_lock = threading.Lock()  # Held while a tick uses the model, and while it is swapped
         
-        # Initialize CSV file with headers
+        # Open the ring-buffer store readings are written to
         self.init_data_file()
         
         # Load model
-        self.load_model()
+        self.load_model(model_data)
         
         # Load historical data for realistic value ranges
         self.load_data_ranges()
     
     def init_data_file(self):
-        """Initialize the sensor data CSV file with headers"""
+        """Open the sensor data ring-buffer store for appending (created if missing)"""
         try:
-            if not self.sensor_data_file.exists():
-                headers = ['timestamp', 'Temp', 'DO', 'pH', 'Conductivity', 'BOD', 'Nitrate', 
-                          'FecalColiform', 'TotalColiform', 'Risk', 'Confidence']
-                pd.DataFrame(columns=headers).to_csv(self.sensor_data_file, index=False)
-                print(f"✅ Initialized sensor data file: {self.sensor_data_file}")
-            else:
-                # Verify file has correct headers
-                try:
-                    df = pd.read_csv(self.sensor_data_file, nrows=0)
-                    expected_headers = ['timestamp', 'Temp', 'DO', 'pH', 'Conductivity', 'BOD', 'Nitrate', 
-                                       'FecalColiform', 'TotalColiform', 'Risk', 'Confidence']
-                    if list(df.columns) != expected_headers:
-                        print(f"⚠️  Warning: Sensor data file has incorrect headers. Reinitializing...")
-                        pd.DataFrame(columns=expected_headers).to_csv(self.sensor_data_file, index=False)
-                except Exception as e:
-                    print(f"⚠️  Warning: Could not verify sensor data file: {e}. Reinitializing...")
-                    headers = ['timestamp', 'Temp', 'DO', 'pH', 'Conductivity', 'BOD', 'Nitrate', 
-                              'FecalColiform', 'TotalColiform', 'Risk', 'Confidence']
-                    pd.DataFrame(columns=headers).to_csv(self.sensor_data_file, index=False)
+            self.store = SensorStore.open_writer(self.sensor_data_file)
+            print(f"✅ Opened sensor data store: {self.sensor_data_file} "
+                  f"({self.store.last_seq} readings so far, keeps last {self.store.capacity})")
         except Exception as e:
-            print(f"⚠️  Error initializing sensor data file: {e}")
+            print(f"⚠️  Error initializing sensor data store: {e}")
             raise
     
-    def load_model(self):
-        """Load the forecast model"""
-        if not self.model_path.exists():
-            raise FileNotFoundError(f"Model not found at {self.model_path}. Train the model first.")
+    def add_listener(self, callback):
+        """Register callback(row) to receive each stored reading, as returned by SensorStore.latest()"""
+        self.listeners.append(callback)
+    
+    def notify_listeners(self, seq: int):
+        """Push the reading just stored under `seq` to listeners"""
+        if not self.listeners:
+            return
+        rows = self.store.since(seq - 1, limit=1)
+        if not rows:
+            return
+        for callback in self.listeners:
+            try:
+                callback(rows[0])
+            except Exception as e:
+                print(f"⚠️  Sensor listener error: {e}")
+    
+    def load_model(self, model_data: Optional[Dict] = None):
+        """
+        Load the forecast model from model_path, or use `model_data` if given.
+        Safe to call while the sensor runs: the swap waits for the current tick.
+        """
+        if model_data is None:
+            if not self.model_path.exists():
+                raise FileNotFoundError(f"Model not found at {self.model_path}. Train the model first.")
+            try:
+                model_data = joblib.load(self.model_path)
+            except Exception as e:
+                raise RuntimeError(f"Failed to load model: {str(e)}")
         
         try:
-            model_data = joblib.load(self.model_path)
-            
-            # Validate required keys
-            required_keys = ['model', 'label_encoder', 'lag_features']
-            missing_keys = [key for key in required_keys if key not in model_data]
-            if missing_keys:
-                raise KeyError(f"Model file missing required keys: {missing_keys}")
-            
-            self.model = model_data['model']
-            self.label_encoder = model_data['label_encoder']
-            self.lag_features = model_data['lag_features']
-            self.L = model_data.get('L', 3)
-            self.H = model_data.get('H', 1)
-            self.station_col = model_data.get('station_col')
-            self.station_encoder = model_data.get('station_encoder')
-            
-            # Validate lag_features is not empty
-            if not self.lag_features or len(self.lag_features) == 0:
-                raise ValueError("lag_features is empty or invalid")
+            validate_forecast_model(model_data)
+            with self.model_lock:
+                self.model = model_data['model']
+                self.label_encoder = model_data['label_encoder']
+                self.lag_features = model_data['lag_features']
+                self.L = model_data.get('L', 3)
+                self.H = model_data.get('H', 1)
+                self.station_col = model_data.get('station_col')
+                self.station_encoder = model_data.get('station_encoder')
+                self.prepare_feature_layout()
             
             print(f"✅ Loaded forecast model: L={self.L}, H={self.H}")
             print(f"   Features: {len(self.lag_features)} lag features")
         except Exception as e:
             raise RuntimeError(f"Failed to load model: {str(e)}")
     
-    def load_data_ranges(self):
-        """Load historical data to get realistic value ranges for synthetic data"""
+    def prepare_feature_layout(self):
+        """
+        Precompute where every model column comes from so each tick fills a
+        reusable NumPy row instead of building a DataFrame.
+        """
+        self.lag_features = list(self.lag_features)
+        if self.history is None or self.history.size != self.L:
+            # Readings collected so far stay usable when a reloaded model keeps the same window
+            self.history = LagWindow(self.L, len(FEATURES))
+        lags, feature_index, station_column = lag_column_layout(self.lag_features, FEATURES, self.L)
+        self.lag_columns = np.flatnonzero(lags >= 0)
+        self.column_lags = lags[self.lag_columns]
+        self.column_features = feature_index[self.lag_columns]
+        # Columns the sensor cannot fill stay 0, as the old reindex(fill_value=0) did
+        self.feature_buffer = np.zeros((1, len(self.lag_features)))
+        if station_column is not None:
+            self.feature_buffer[0, station_column] = self.encode_station("SYNTHETIC_001")
+        self.class_labels = self.decode_classes()
+    
+    def encode_station(self, station_id: str) -> float:
+        """Ordinal code for the simulated station (0 if the encoder does not know it)"""
+        if self.station_encoder is None or not hasattr(self.station_encoder, 'transform'):
+            return 0
         try:
-            if self.data_path.exists():
-                df = pd.read_csv(self.data_path, encoding='latin1', low_memory=False)
-                # Rename columns to match expected names
-                rename_map = {
-                    'Temp': 'Temp', 'D.O. (mg/l)': 'DO', 'PH': 'pH',
-                    'CONDUCTIVITY (µmhos/cm)': 'Conductivity',
-                    'B.O.D. (mg/l)': 'BOD',
-                    'NITRATENAN N+ NITRITENANN (mg/l)': 'Nitrate',
-                    'FECAL COLIFORM (MPN/100ml)': 'FecalColiform',
-                    'TOTAL COLIFORM (MPN/100ml)Mean': 'TotalColiform'
-                }
-                df = df.rename(columns={k: v for k, v in rename_map.items() if k in df.columns})
-                
-                # Get value ranges for each feature
-                self.value_ranges = {}
-                features = ['Temp', 'DO', 'pH', 'Conductivity', 'BOD', 'Nitrate', 'FecalColiform', 'TotalColiform']
-                for feat in features:
-                    if feat in df.columns:
-                        col = pd.to_numeric(df[feat], errors='coerce').dropna()
-                        if len(col) > 0:
-                            std_val = float(col.std())
-                            # Handle case where std is 0 or NaN (single value or all same)
-                            if np.isnan(std_val) or std_val == 0:
-                                std_val = (float(col.max()) - float(col.min())) / 4.0 if col.max() != col.min() else 1.0
-                            
-                            self.value_ranges[feat] = {
-                                'min': float(col.min()),
-                                'max': float(col.max()),
-                                'mean': float(col.mean()),
-                                'std': std_val
-                            }
-                print(f"✅ Loaded value ranges for {len(self.value_ranges)} features")
-            else:
-                # Default ranges if no data file
-                self.value_ranges = {
-                    'Temp': {'min': 20, 'max': 35, 'mean': 28, 'std': 3},
-                    'DO': {'min': 2, 'max': 10, 'mean': 5, 'std': 2},
-                    'pH': {'min': 6, 'max': 9, 'mean': 7.2, 'std': 0.5},
-                    'Conductivity': {'min': 50, 'max': 3000, 'mean': 500, 'std': 400},
-                    'BOD': {'min': 0.5, 'max': 10, 'mean': 3, 'std': 2},
-                    'Nitrate': {'min': 0.1, 'max': 50, 'mean': 5, 'std': 8},
-                    'FecalColiform': {'min': 10, 'max': 10000, 'mean': 1000, 'std': 2000},
-                    'TotalColiform': {'min': 50, 'max': 20000, 'mean': 3000, 'std': 4000}
-                }
-                print("⚠️  Using default value ranges (data file not found)")
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)
+                return float(self.station_encoder.transform([[station_id]])[0][0])
+        except (ValueError, KeyError, AttributeError) as e:
+            # Station ID not in encoder or encoder error - use default
+            print(f"⚠️  Warning: Could not encode station '{station_id}': {e}. Using default value.")
         except Exception as e:
-            print(f"⚠️  Error loading data ranges: {e}. Using defaults.")
-            self.value_ranges = {
-                'Temp': {'min': 20, 'max': 35, 'mean': 28, 'std': 3},
-                'DO': {'min': 2, 'max': 10, 'mean': 5, 'std': 2},
-                'pH': {'min': 6, 'max': 9, 'mean': 7.2, 'std': 0.5},
-                'Conductivity': {'min': 50, 'max': 3000, 'mean': 500, 'std': 400},
-                'BOD': {'min': 0.5, 'max': 10, 'mean': 3, 'std': 2},
-                'Nitrate': {'min': 0.1, 'max': 50, 'mean': 5, 'std': 8},
-                'FecalColiform': {'min': 10, 'max': 10000, 'mean': 1000, 'std': 2000},
-                'TotalColiform': {'min': 50, 'max': 20000, 'mean': 3000, 'std': 4000}
-            }
+            print(f"⚠️  Warning: Station encoding error: {e}. Using default value.")
+        return 0
+    
+    def decode_classes(self) -> Optional[np.ndarray]:
+        """Risk level for each column of predict_proba, decoded once"""
+        classes = getattr(self.model, 'classes_', None)
+        if classes is None:
+            return None
+        try:
+            return np.asarray(self.label_encoder.inverse_transform(classes))
+        except Exception as e:
+            print(f"⚠️  Warning: Could not decode risk levels: {e}")
+            return np.asarray([str(c) for c in classes])
+    
+    def load_data_ranges(self):
+        """Load historical data to get realistic value ranges for synthetic data"""
+        self.value_ranges = load_value_ranges(self.data_path)
     
     def generate_sensor_reading(self) -> Dict[str, float]:
         """
         Generate a synthetic sensor reading.
         
         To better exercise the ML model we sample with multiple behaviours:
-        - baseline gaussian samples around the historical mean
+        - baseline samples from the historical distribution (inverse CDF through the
+          sidecar quantiles), or a widened gaussian around the mean without them
         - uniform sweeps that cover the full min/max span
         - extreme bursts that hug the boundaries (min / max) to trigger edge cases
         """
@@ -179,9 +275,14 @@ class SyntheticSensor:
             mode = np.random.rand()
             
             if mode < 0.45:
-                # Baseline gaussian but with a randomly inflated std so it wanders more
-                std_boost = np.random.uniform(1.0, 2.5)
-                value = np.random.normal(ranges['mean'], ranges['std'] * std_boost)
+                quantiles = ranges.get('quantiles')
+                if quantiles:
+                    # Baseline drawn from the historical distribution, skew and all
+                    value = np.interp(np.random.rand(), np.linspace(0.0, 1.0, len(quantiles)), quantiles)
+                else:
+                    # Baseline gaussian but with a randomly inflated std so it wanders more
+                    std_boost = np.random.uniform(1.0, 2.5)
+                    value = np.random.normal(ranges['mean'], ranges['std'] * std_boost)
             elif mode < 0.8:
                 # Full-span sweep using uniform sampling inside min/max
                 value = np.random.uniform(ranges['min'], ranges['max'])
@@ -199,113 +300,46 @@ class SyntheticSensor:
             reading[feat] = round(float(value), 2)
         return reading
     
-    def build_lag_features(self, current_reading: Dict[str, float]) -> Optional[pd.DataFrame]:
-        """Build lagged feature vector from history and current reading"""
-        # Add current reading to history
-        self.history.append(current_reading)
-        
-        # Keep only last L readings
-        if len(self.history) > self.L:
-            self.history = self.history[-self.L:]
+    def build_lag_features(self, current_reading: Dict[str, float]) -> Optional[np.ndarray]:
+        """Push the reading into the lag window and fill the model input row (no pandas per tick)"""
+        self.history.push(current_reading)
         
         # Need at least L readings to create lag features
-        if len(self.history) < self.L:
-            return None
-        
-        # Build lag features
-        lag_row = {}
-        features = ['Temp', 'DO', 'pH', 'Conductivity', 'BOD', 'Nitrate', 'FecalColiform', 'TotalColiform']
-        
-        for feat in features:
-            if feat not in self.value_ranges:
-                continue
-            for lag in range(self.L):
-                idx = len(self.history) - 1 - lag
-                if idx >= 0:
-                    lag_row[f'{feat}_lag{lag}'] = self.history[idx].get(feat, np.nan)
-                else:
-                    lag_row[f'{feat}_lag{lag}'] = np.nan
-        
-        # Add station encoding if available
-        if self.station_encoder is not None:
-            # Use a default station ID for synthetic data
-            station_id = "SYNTHETIC_001"
-            try:
-                # Try to transform the station ID
-                if hasattr(self.station_encoder, 'transform'):
-                    station_encoded = self.station_encoder.transform([[station_id]])[0][0]
-                    lag_row['station_encoded'] = station_encoded
-                else:
-                    # If transform doesn't exist, use a default value
-                    lag_row['station_encoded'] = 0
-            except (ValueError, KeyError, AttributeError) as e:
-                # Station ID not in encoder or encoder error - use default
-                lag_row['station_encoded'] = 0
-                print(f"⚠️  Warning: Could not encode station '{station_id}': {e}. Using default value.")
-            except Exception as e:
-                # Other errors - use default
-                lag_row['station_encoded'] = 0
-                print(f"⚠️  Warning: Station encoding error: {e}. Using default value.")
-        
-        # Create DataFrame
-        X = pd.DataFrame([lag_row])
-        
-        # Validate lag_features exists and is not empty
-        if self.lag_features is None or len(self.lag_features) == 0:
-            print("⚠️  Warning: lag_features is empty, cannot build features")
-            return None
-        
-        # Reindex to match model's expected features
-        try:
-            X = X.reindex(columns=self.lag_features, fill_value=0)
-        except Exception as e:
-            print(f"⚠️  Warning: Error reindexing features: {e}")
+        if not self.history.is_full():
             return None
         
-        return X
+        slots = (self.history.pos - self.column_lags) % self.L
+        self.feature_buffer[0, self.lag_columns] = self.history.values[slots, self.column_features]
+        return self.feature_buffer
     
-    def make_prediction(self, X: pd.DataFrame) -> Dict:
+    def make_prediction(self, X: np.ndarray) -> Dict:
         """Make forecast prediction using the model"""
         try:
             # Validate input
-            if X is None or X.empty:
+            if X is None or X.size == 0:
                 return {'error': 'Invalid input data: X is None or empty'}
             
-            # Fill missing values safely
-            try:
-                # Try median first
-                median_values = X.median()
-                X_filled = X.fillna(median_values)
-                # If median is all NaN, fill with 0
-                if X_filled.isna().any().any():
-                    X_filled = X_filled.fillna(0)
-            except Exception:
-                # Fallback: fill with 0 if median fails
-                X_filled = X.fillna(0)
-            
-            # Ensure all columns are numeric
-            for col in X_filled.columns:
-                X_filled[col] = pd.to_numeric(X_filled[col], errors='coerce').fillna(0)
-            
-            # Predict
-            prediction = self.model.predict(X_filled)[0]
-            
-            # Get risk level
-            try:
-                risk_level = self.label_encoder.inverse_transform([prediction])[0]
-            except Exception as e:
-                # Fallback: use prediction value as string
-                risk_level = str(prediction)
-                print(f"⚠️  Warning: Could not decode risk level: {e}")
+            # Missing readings: a single row has no median to fall back on, so use 0
+            np.copyto(X, 0.0, where=np.isnan(X))
             
-            # Get probabilities if available
-            confidence = None
-            if hasattr(self.model, 'predict_proba'):
-                try:
-                    probs = self.model.predict_proba(X_filled)[0]
-                    confidence = float(max(probs)) * 100
-                except Exception as e:
-                    print(f"⚠️  Warning: Could not get prediction confidence: {e}")
+            # The model was fitted on a DataFrame; a bare array with the same column order is equivalent
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)
+                if hasattr(self.model, 'predict_proba') and self.class_labels is not None:
+                    # One forest pass gives both the label and its confidence
+                    probs = self.model.predict_proba(X)[0]
+                    best = int(np.argmax(probs))
+                    risk_level = self.class_labels[best]
+                    confidence = float(probs[best]) * 100
+                else:
+                    prediction = self.model.predict(X)[0]
+                    confidence = None
+                    try:
+                        risk_level = self.label_encoder.inverse_transform([prediction])[0]
+                    except Exception as e:
+                        # Fallback: use prediction value as string
+                        risk_level = str(prediction)
+                        print(f"⚠️  Warning: Could not decode risk level: {e}")
             
             return {
                 'risk_level': risk_level,
@@ -326,12 +360,14 @@ class SyntheticSensor:
             # Generate sensor reading
             reading = self.generate_sensor_reading()
             
-            # Build lag features
-            X = self.build_lag_features(reading)
+            with self.model_lock:
+                # Build lag features
+                X = self.build_lag_features(reading)
+                
+                # Make prediction
+                prediction = self.make_prediction(X) if X is not None else None
             
             if X is not None:
-                # Make prediction
-                prediction = self.make_prediction(X)
                 
                 # Display results
                 print(f"\n[{prediction.get('timestamp', 'N/A')}] Sensor Reading:")
@@ -346,36 +382,23 @@ class SyntheticSensor:
                     if prediction.get('confidence'):
                         print(f"     Confidence: {prediction['confidence']:.1f}%")
                     
-                    # Write to CSV file for live graph
-                    self.write_to_csv(reading, prediction)
+                    # Append to the store for the API and live graph, then push to listeners
+                    seq = self.write_reading(reading, prediction)
+                    if seq is not None:
+                        self.notify_listeners(seq)
             else:
                 print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Collecting initial readings... ({len(self.history)}/{self.L})")
             
             # Wait for next reading
             time.sleep(UPDATE_INTERVAL)
     
-    def write_to_csv(self, reading: Dict[str, float], prediction: Dict):
-        """Write sensor reading and prediction to CSV file for live graph"""
+    def write_reading(self, reading: Dict[str, float], prediction: Dict) -> Optional[int]:
+        """Append sensor reading and prediction to the store, returning its sequence number"""
         try:
-            row = {
-                'timestamp': datetime.now().isoformat(),
-                'Temp': reading.get('Temp', np.nan),
-                'DO': reading.get('DO', np.nan),
-                'pH': reading.get('pH', np.nan),
-                'Conductivity': reading.get('Conductivity', np.nan),
-                'BOD': reading.get('BOD', np.nan),
-                'Nitrate': reading.get('Nitrate', np.nan),
-                'FecalColiform': reading.get('FecalColiform', np.nan),
-                'TotalColiform': reading.get('TotalColiform', np.nan),
-                'Risk': prediction.get('risk_level', 'Unknown'),
-                'Confidence': prediction.get('confidence', np.nan)
-            }
-            
-            # Append to CSV
-            df_new = pd.DataFrame([row])
-            df_new.to_csv(self.sensor_data_file, mode='a', header=False, index=False)
+            return self.store.append(reading, prediction.get('risk_level', 'Unknown'), prediction.get('confidence'))
         except Exception as e:
-            print(f"⚠️  Error writing to CSV: {e}")
+            print(f"⚠️  Error writing sensor reading: {e}")
+            return None
     
     def start(self):
         """Start the sensor"""
@@ -383,8 +406,11 @@ class SyntheticSensor:
             print("⚠️  Sensor is already running.")
             return
         
+        if self.store is None or self.store.closed:
+            self.init_data_file()
+        
         self.is_running = True
-        self.history = []  # Reset history
+        self.history.clear()  # Reset history
         self.sensor_thread = threading.Thread(target=self.sensor_loop, daemon=True)
         self.sensor_thread.start()
         print("✅ Sensor started in background thread.")
@@ -398,6 +424,9 @@ class SyntheticSensor:
         self.is_running = False
         if self.sensor_thread:
             self.sensor_thread.join(timeout=UPDATE_INTERVAL + 1)
+        # Release the writer lock so another sensor process can take over
+        if self.store is not None and (self.sensor_thread is None or not self.sensor_thread.is_alive()):
+            self.store.close()
         print("✅ Sensor stopped.")
     
     def status(self):
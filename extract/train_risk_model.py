@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Training entry point for the water risk classifier (rf_water_model.joblib)
+
+The training cells of AWARE_random_forest_updated.ipynb as a script: WHO/BIS
+Risk labels (risk_rules.py), a stratified train/test split, a hyperparameter
+search over the imputer + scaler + RandomForest pipeline, and the artifact
+backend/main.py loads ({'pipeline', 'label_encoder', 'features', 'best_params'}).
+
+Differences from the notebook cell:
+  - each CV fold's preprocessing is fitted once and cached with joblib Memory
+    (--cache-dir). Candidates reuse it instead of refitting the imputer and
+    scaler. The cache is keyed on the data, so later runs on the same data
+    reuse it too.
+  - candidates x folds run on at most --jobs worker processes with
+    single-threaded forests, instead of n_jobs=-1 at both levels
+  - --search halving uses successive halving. Every candidate is scored on a
+    small sample, and only the best 1/--factor of them go on to --factor times
+    as many rows. The last round always uses the whole training split; without
+    --n-iter the first sample is kept large enough to hold the rarest class in
+    every fold.
+  - the best parameters are refit once on the full training split with
+    --jobs threads. The saved forest predicts single-threaded (n_jobs=None),
+    which is what the backend wants for small requests.
+  - the artifact is written atomically, together with its compiled-forest
+    sidecar (compiled_forest.py), so a running backend hot-reloads both
+  - a timing report per stage
+
+Usage:
+    python train_risk_model.py                                   # water_dataX.csv -> rf_water_model.joblib
+    python train_risk_model.py --search halving --jobs 4
+    python train_risk_model.py WQ_combined_clean.csv --params rf_params.json --output /tmp/rf.joblib
+    python train_risk_model.py --no-cache --json
+
+--params takes a JSON object. Keys starting with 'clf__' replace that entry of
+the search space (a list of values). 'search', 'n_iter', 'cv', 'factor',
+'scoring', 'test_size' and 'random_state' override the matching options.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_DATA = BASE_DIR / 'water_dataX.csv'
+DEFAULT_OUTPUT = BASE_DIR / 'rf_water_model.joblib'
+DEFAULT_CACHE_DIR = BASE_DIR / '.train_cache'
+
+# The notebook's search space
+PARAM_DISTRIBUTIONS = {
+    'clf__n_estimators': [100, 200, 300, 500],
+    'clf__max_depth': [None, 8, 12, 20],
+    'clf__min_samples_split': [2, 5, 10],
+    'clf__min_samples_leaf': [1, 2, 4],
+    'clf__max_features': ['sqrt', 'log2', 0.5],
+    'clf__class_weight': [None, 'balanced']
+}
+SETTINGS = ('search', 'n_iter', 'cv', 'factor', 'scoring', 'test_size', 'random_state')
+
+
+def load_params(path: Optional[Path]):
+    """(search space, option overrides) from a --params JSON file"""
+    distributions = dict(PARAM_DISTRIBUTIONS)
+    if path is None:
+        return distributions, {}
+    with open(path) as f:
+        params = json.load(f)
+    unknown = [k for k in params if not k.startswith('clf__') and k not in SETTINGS]
+    if unknown:
+        raise ValueError(f"Unknown keys in {path}: {unknown}")
+    distributions.update({k: v if isinstance(v, list) else [v] for k, v in params.items() if k.startswith('clf__')})
+    return distributions, {k: v for k, v in params.items() if k in SETTINGS}
+
+
+def build_pipeline(numeric_cols: List[str], categorical_cols: List[str], random_state: int, memory=None):
+    """The notebook's pipeline; memory caches the fitted 'preproc' step per (data, parameters)"""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    preprocessor = ColumnTransformer([
+        ('num', Pipeline([
+            ('impute', SimpleImputer(strategy='median')),
+            ('scale', StandardScaler())
+        ]), numeric_cols),
+        ('cat', Pipeline([
+            ('impute', SimpleImputer(strategy='most_frequent')),
+            ('ohe', OneHotEncoder(handle_unknown='ignore', sparse_output=False))
+        ]), categorical_cols)
+    ])
+    return Pipeline([
+        ('preproc', preprocessor),
+        ('clf', RandomForestClassifier(random_state=random_state, n_jobs=1))
+    ], memory=memory)
+
+
+def halving_candidates(n_rows: int, rarest: int, folds: int, factor: int) -> int:
+    """
+    Default candidate count for successive halving: as many as fit in rounds whose first sample still
+    holds about `folds` rows of the rarest class, with the last round on all n_rows
+    """
+    smallest = math.ceil(folds * n_rows / max(rarest, 1))
+    halvings = int(math.floor(math.log(n_rows / smallest, factor))) if n_rows > smallest else 0
+    # factor**(halvings+1) - 1 candidates need exactly halvings+1 rounds
+    return factor ** (halvings + 1) - 1
+
+
+def make_search(pipeline, distributions: Dict, search: str, n_iter: Optional[int], cv, factor: int,
+                scoring: str, random_state: int, jobs: int):
+    if search == 'halving':
+        from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+        from sklearn.model_selection import HalvingRandomSearchCV
+        # min_resources='exhaust' sizes the first round so the last one runs on all training rows
+        return HalvingRandomSearchCV(
+            pipeline, distributions, n_candidates=n_iter, factor=factor, resource='n_samples',
+            min_resources='exhaust', scoring=scoring, cv=cv,
+            random_state=random_state, n_jobs=jobs, refit=False
+        )
+    from sklearn.model_selection import RandomizedSearchCV
+    return RandomizedSearchCV(
+        pipeline, distributions, n_iter=n_iter or 20, scoring=scoring, cv=cv,
+        random_state=random_state, n_jobs=jobs, refit=False
+    )
+
+
+def save_artifact(artifact: Dict, output: Path, compile_forest: bool) -> Dict:
+    """Write the artifact (and its compiled sidecar) so a watching backend never sees a partial file"""
+    import joblib
+
+    output = Path(output)
+    tmp_path = output.with_name(output.name + '.tmp')
+    joblib.dump(artifact, tmp_path, compress=3)
+    info = {'bytes': tmp_path.stat().st_size, 'compiled': None}
+    if compile_forest:
+        from compiled_forest import CompiledForest, compiled_path_for, parity_sample, verify_parity
+        from file_hash import file_sha256
+        compiled = CompiledForest.from_artifact(artifact)
+        verify_parity(artifact, compiled, parity_sample(compiled))
+        # The sidecar names the final file but hashes the bytes that are about to become it
+        compiled.meta.update(source=output.name, source_sha256=file_sha256(tmp_path))
+        compiled_path = compiled_path_for(output)
+        compiled.save(compiled_path)
+        info['compiled'] = str(compiled_path)
+    os.replace(tmp_path, output)
+    return info
+
+
+@contextmanager
+def timed(report: Dict, stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        report['stages'][stage] = round(time.perf_counter() - start, 3)
+
+
+def train(data: Path = DEFAULT_DATA, output: Path = DEFAULT_OUTPUT, search: str = 'random',
+          n_iter: Optional[int] = None, cv: int = 5, factor: int = 3, scoring: str = 'f1_macro',
+          test_size: float = 0.2, random_state: int = 42, jobs: Optional[int] = None,
+          cache_dir: Optional[Path] = DEFAULT_CACHE_DIR, params: Optional[Path] = None,
+          compile_forest: bool = True, verbose: int = 0) -> Dict:
+    """Run every stage and return the report (timings per stage, search summary, test metrics)"""
+    import warnings
+
+    distributions, overrides = load_params(params)
+    search = overrides.get('search', search)
+    n_iter = overrides.get('n_iter', n_iter)
+    cv = overrides.get('cv', cv)
+    factor = overrides.get('factor', factor)
+    scoring = overrides.get('scoring', scoring)
+    test_size = overrides.get('test_size', test_size)
+    random_state = overrides.get('random_state', random_state)
+    jobs = jobs or min(4, os.cpu_count() or 1)
+
+    report = {'data': str(data), 'output': str(output), 'stages': {}}
+    with timed(report, 'import'):
+        from joblib import Memory
+        from sklearn.base import clone
+        from sklearn.metrics import accuracy_score, classification_report, f1_score
+        from sklearn.model_selection import StratifiedKFold, train_test_split
+        from sklearn.preprocessing import LabelEncoder
+
+        from risk_rules import RiskRules
+        from wq_dataset import FEATURES, load_dataset
+
+    with timed(report, 'load'):
+        df = load_dataset(data)
+
+    with timed(report, 'label'):
+        # The updated notebook's config: worst parameter, at least two parameters present
+        df['Risk'] = RiskRules().label(df)
+        dropped = int(df['Risk'].isna().sum())
+        df = df[df['Risk'].notna()].reset_index(drop=True)
+        le = LabelEncoder()
+        y = le.fit_transform(df['Risk'].astype(str))
+        features = [f for f in FEATURES if f in df.columns]
+        X = df[features].copy()
+        class_counts = {str(c): int(n) for c, n in zip(le.classes_, np.bincount(y))}
+    report['rows'] = {'labelled': len(df), 'dropped_unlabelled': dropped, 'classes': class_counts}
+
+    with timed(report, 'split'):
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=test_size, random_state=random_state, stratify=y
+        )
+        folds = min(cv, max(2, int(np.bincount(y_train).min())))  # adaptive, like the notebook
+        splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=random_state)
+        if search == 'halving' and not n_iter:
+            n_iter = halving_candidates(len(y_train), int(np.bincount(y_train).min()), folds, factor)
+
+    memory = Memory(location=str(cache_dir), verbose=0) if cache_dir else None
+    pipeline = build_pipeline(features, [], random_state, memory=memory)
+    searcher = make_search(pipeline, distributions, search, n_iter, splitter, factor, scoring, random_state, jobs)
+    searcher.verbose = verbose
+    with timed(report, 'search'), warnings.catch_warnings():
+        # Memory warns when it cannot hash an estimator quickly; that only costs speed
+        warnings.filterwarnings('ignore', message='Persisting input arguments took')
+        searcher.fit(X_train, y_train)
+    results = searcher.cv_results_
+    # Halving scores the survivors again in every round; count what actually ran
+    per_round = list(searcher.n_candidates_) if search == 'halving' else [len(results['params'])]
+    report['search'] = {
+        'method': search,
+        'candidates': int(per_round[0]),
+        'folds': folds,
+        'fits': int(sum(per_round) * folds),
+        'jobs': jobs,
+        'cached_preprocessing': memory is not None,
+        'best_score': round(float(searcher.best_score_), 4),
+        'best_params': searcher.best_params_,
+        'mean_fit_s': round(float(np.mean(results['mean_fit_time'])), 4),
+    }
+    if search == 'halving':
+        report['search']['rounds'] = [
+            {'candidates': int(c), 'rows': int(r)} for c, r in zip(searcher.n_candidates_, searcher.n_resources_)
+        ]
+
+    with timed(report, 'refit'):
+        best = clone(pipeline).set_params(memory=None, **searcher.best_params_)
+        best.set_params(clf__n_jobs=jobs).fit(X_train, y_train)
+        best.set_params(clf__n_jobs=None)
+
+    with timed(report, 'evaluate'):
+        y_pred = best.predict(X_test)
+        report['test'] = {
+            'rows': int(len(y_test)),
+            'accuracy': round(float(accuracy_score(y_test, y_pred)), 4),
+            'f1_macro': round(float(f1_score(y_test, y_pred, average='macro')), 4),
+            'report': classification_report(y_test, y_pred, target_names=[str(c) for c in le.classes_],
+                                            zero_division=0),
+        }
+
+    artifact = {
+        'pipeline': best,
+        'label_encoder': le,
+        'features': features,
+        'best_params': searcher.best_params_,
+    }
+    with timed(report, 'save'):
+        report['artifact'] = save_artifact(artifact, output, compile_forest)
+    report['total_s'] = round(sum(report['stages'].values()), 3)
+    return report
+
+
+def print_report(report: Dict):
+    s = report['search']
+    print(f"Data: {report['data']}  ({report['rows']['labelled']} labelled rows, "
+          f"{report['rows']['dropped_unlabelled']} dropped; classes {report['rows']['classes']})")
+    print(f"Search: {s['method']}, {s['candidates']} candidates x {s['folds']} folds ({s['fits']} fits) "
+          f"on {s['jobs']} worker(s), "
+          f"preprocessing cache {'on' if s['cached_preprocessing'] else 'off'}")
+    for round_ in s.get('rounds', []):
+        print(f"  round: {round_['candidates']:>3} candidates on {round_['rows']} rows")
+    print(f"  best CV score {s['best_score']}: {s['best_params']}")
+    print(f"Test: accuracy {report['test']['accuracy']}, f1_macro {report['test']['f1_macro']} "
+          f"on {report['test']['rows']} rows")
+    print(report['test']['report'])
+    print(f"{'Stage':<10} {'Time':>8}")
+    for stage, seconds in report['stages'].items():
+        print(f"{stage:<10} {seconds:>7.2f}s")
+    print(f"{'total':<10} {report['total_s']:>7.2f}s")
+    compiled = report['artifact']['compiled']
+    print(f"✅ Saved {report['output']} ({report['artifact']['bytes'] / 1e6:.1f} MB)"
+          + (f" and {Path(compiled).name}" if compiled else ""))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Train the water risk classifier (rf_water_model.joblib)')
+    parser.add_argument('data', type=Path, nargs='?', default=DEFAULT_DATA, help='Training dataset (CSV/Parquet)')
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument('--search', choices=['random', 'halving'], default='random')
+    parser.add_argument('--n-iter', type=int, default=None,
+                        help='Candidates (default: 20 for random; for halving, as many as rounds that start with '
+                             'every class in every fold allow)')
+    parser.add_argument('--cv', type=int, default=5, help='CV folds (fewer if a class is smaller)')
+    parser.add_argument('--factor', type=int, default=3, help='Successive-halving factor')
+    parser.add_argument('--scoring', default='f1_macro')
+    parser.add_argument('--jobs', type=int, default=None, help='Worker processes for the search (default: min(4, CPUs))')
+    parser.add_argument('--cache-dir', type=Path, default=DEFAULT_CACHE_DIR, help='joblib Memory cache for fold preprocessing')
+    parser.add_argument('--no-cache', action='store_true', help='Refit the preprocessing for every candidate')
+    parser.add_argument('--params', type=Path, default=None, help='Search space / option overrides (JSON)')
+    parser.add_argument('--no-compile', action='store_true', help='Do not export the compiled-forest sidecar')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    parser.add_argument('-v', '--verbose', type=int, default=0, help='Search verbosity')
+    args = parser.parse_args(argv)
+
+    if not args.data.exists():
+        print(f"❌ {args.data} not found", file=sys.stderr)
+        return 1
+    report = train(args.data, args.output, search=args.search, n_iter=args.n_iter, cv=args.cv, factor=args.factor,
+                   scoring=args.scoring, jobs=args.jobs, cache_dir=None if args.no_cache else args.cache_dir,
+                   params=args.params, compile_forest=not args.no_compile, verbose=args.verbose)
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
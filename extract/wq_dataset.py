@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Typed columnar copies of the water-quality datasets
+
+WQ_combined_clean.csv and water_dataX.csv are plain CSV: every load re-infers
+types from strings and every consumer re-applies its own column renames. This
+module gives them one canonical form:
+
+  - column names mapped to the names the models use (Temp, DO, pH, ...);
+    columns that map to the same name (e.g. 'Station Code' / 'STN Code' from
+    different PDF tables) are coalesced into one
+  - the measurement columns (and Year) coerced to float64 once, text columns
+    to the pandas string dtype
+  - stored as Parquet (or Feather) next to the CSV, e.g. water_dataX.parquet
+
+load_dataset() reads the columnar copy when it is present and not older than
+the CSV, and otherwise parses the CSV and canonicalizes it the same way, so
+both paths return the same frame. Pass columns=[...] to read only those
+columns (the synthetic sensor needs just the 8 model features).
+
+Parquet and Feather need pyarrow (`pip install pyarrow`); without it the CSV
+is used.
+
+Usage:
+    python wq_dataset.py convert water_dataX.csv                  # -> water_dataX.parquet
+    python wq_dataset.py convert WQ_combined_clean.csv --format feather
+    python wq_dataset.py info water_dataX.csv
+"""
+
+import argparse
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+
+FEATURES = ['Temp', 'DO', 'pH', 'Conductivity', 'BOD', 'Nitrate', 'FecalColiform', 'TotalColiform']
+NUMERIC_COLUMNS = FEATURES + ['Year']
+FORMATS = {'parquet': '.parquet', 'feather': '.feather'}
+
+# Normalized source name (lower case, single spaces) -> canonical name.
+# Covers water_dataX.csv and the table headers merge_clean.py produces from the CPCB PDF.
+CANONICAL_NAMES = {
+    'temp': 'Temp', 'temperature': 'Temp', 'temperature (°c)': 'Temp',
+    'do': 'DO', 'd.o. (mg/l)': 'DO', 'dissolved oxygen': 'DO', 'dissolved oxygen (mg/l)': 'DO',
+    'ph': 'pH',
+    'conductivity': 'Conductivity', 'conductivity (µmhos/cm)': 'Conductivity', 'conductivity (µmho/cm)': 'Conductivity',
+    'bod': 'BOD', 'b.o.d. (mg/l)': 'BOD', 'bod (mg/l)': 'BOD',
+    'nitrate': 'Nitrate', 'nitratenan n+ nitritenann (mg/l)': 'Nitrate',
+    'nitrate n (mg/l)': 'Nitrate', 'nitraten (mg/l)': 'Nitrate',
+    'fecalcoliform': 'FecalColiform', 'fecal coliform (mpn/100ml)': 'FecalColiform',
+    'totalcoliform': 'TotalColiform', 'total coliform (mpn/100ml)': 'TotalColiform',
+    'total coliform (mpn/100ml)mean': 'TotalColiform',
+    'station code': 'StationCode', 'stn code': 'StationCode', 'stationcode': 'StationCode',
+    'locations': 'MonitoringLocation', 'monitoring location': 'MonitoringLocation',
+    'state': 'State', 'state name': 'State',
+    'year': 'Year',
+}
+
+
+def normalize_name(name) -> str:
+    name = str(name).replace('﻿', '')
+    # latin1-decoded UTF-8 'µ' and the micro sign both become plain µ
+    name = name.replace('Âµ', 'µ').replace('μ', 'µ')
+    return re.sub(r'\s+', ' ', name).strip().lower()
+
+
+def canonical_name(name) -> str:
+    return CANONICAL_NAMES.get(normalize_name(name), str(name))
+
+
+def canonicalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply canonical column names (coalescing duplicates left to right) and coerce numeric columns"""
+    groups: Dict[str, List] = {}
+    for col in df.columns:
+        groups.setdefault(canonical_name(col), []).append(col)
+
+    out = {}
+    for name, sources in groups.items():
+        col = df[sources[0]]
+        for other in sources[1:]:
+            # the PDF tables fill different source columns, so take the first non-blank value
+            col = col.where(col.notna() & (col.astype(str).str.strip() != ''), df[other])
+        out[name] = col
+    df = pd.DataFrame(out, index=df.index)
+
+    for name in df.columns:
+        if name in NUMERIC_COLUMNS:
+            df[name] = pd.to_numeric(df[name], errors='coerce').astype('float64')
+        elif df[name].dtype == object:
+            # free text; one string type per column so Arrow and CSV loads agree
+            df[name] = df[name].astype('string')
+    return df
+
+
+def read_raw_csv(path: Path, **kwargs) -> pd.DataFrame:
+    """CSV as strings (types come from canonicalize, not inference); UTF-8, else latin1 like water_dataX.csv"""
+    try:
+        return pd.read_csv(path, encoding='utf-8', dtype=str, **kwargs)
+    except UnicodeDecodeError:
+        return pd.read_csv(path, encoding='latin1', dtype=str, **kwargs)
+
+
+def columnar_engine_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def columnar_path(csv_path: Path, fmt: str = 'parquet') -> Path:
+    return Path(csv_path).with_suffix(FORMATS[fmt])
+
+
+def find_columnar(csv_path: Path) -> Optional[Path]:
+    """Columnar copy of csv_path that is safe to read instead of it, or None"""
+    csv_path = Path(csv_path)
+    if not columnar_engine_available():
+        return None
+    for fmt in FORMATS:
+        path = columnar_path(csv_path, fmt)
+        if path.exists():
+            # a CSV edited after the copy was written wins
+            if csv_path.exists() and path.stat().st_mtime < csv_path.stat().st_mtime:
+                continue
+            return path
+    return None
+
+
+def dataset_exists(csv_path: Path) -> bool:
+    csv_path = Path(csv_path)
+    return csv_path.exists() or find_columnar(csv_path) is not None
+
+
+def write_columnar(df: pd.DataFrame, csv_path: Path, fmt: str = 'parquet',
+                   canonical: bool = False) -> Optional[Path]:
+    """
+    Write the canonical, typed form of df next to csv_path. Returns the written path,
+    or None if pyarrow is not installed (the CSV then stays the only copy).
+    """
+    if not columnar_engine_available():
+        return None
+    if not canonical:
+        df = canonicalize(df)
+    df = df.reset_index(drop=True)
+
+    path = columnar_path(csv_path, fmt)
+    tmp_path = path.with_name(path.name + '.tmp')
+    if fmt == 'parquet':
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_feather(tmp_path)
+    tmp_path.replace(path)
+    return path
+
+
+def convert_csv(csv_path: Path, fmt: str = 'parquet') -> Optional[Path]:
+    """Write the typed columnar copy of an existing CSV; None if pyarrow is not installed"""
+    if not columnar_engine_available():
+        return None
+    return write_columnar(canonicalize(read_raw_csv(csv_path)), csv_path, fmt=fmt, canonical=True)
+
+
+def load_dataset(csv_path: Path, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Canonical, typed dataset for csv_path, read from its columnar copy when available.
+    `columns` (canonical names) restricts the read to those columns; missing ones are skipped.
+    """
+    csv_path = Path(csv_path)
+    path = find_columnar(csv_path)
+    if path is not None:
+        if columns is None:
+            read_columns = None
+        else:
+            import pyarrow.parquet as pq
+            import pyarrow.feather as pf
+            schema = pq.read_schema(path) if path.suffix == '.parquet' else pf.read_table(path, columns=[]).schema
+            read_columns = [c for c in columns if c in schema.names]
+        if path.suffix == '.parquet':
+            return pd.read_parquet(path, columns=read_columns)
+        return pd.read_feather(path, columns=read_columns)
+
+    if columns is None:
+        return canonicalize(read_raw_csv(csv_path))
+    # Project on the CSV too: map the requested canonical names back to the raw header
+    header = read_raw_csv(csv_path, nrows=0).columns
+    wanted = set(columns)
+    usecols = [col for col in header if canonical_name(col) in wanted]
+    df = canonicalize(read_raw_csv(csv_path, usecols=usecols))
+    return df[[c for c in columns if c in df.columns]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Typed columnar copies of the water-quality CSV datasets')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    convert = sub.add_parser('convert', help='Write the canonical typed Parquet/Feather copy of a CSV')
+    convert.add_argument('csv', type=Path)
+    convert.add_argument('--format', choices=sorted(FORMATS), default='parquet')
+
+    info = sub.add_parser('info', help='Show which copy load_dataset() would read and its columns')
+    info.add_argument('csv', type=Path)
+
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        path = convert_csv(args.csv, fmt=args.format)
+        if path is None:
+            parser.exit(1, "pyarrow is not installed: pip install pyarrow\n")
+        print(f"Wrote {path} {load_dataset(args.csv).shape}")
+    else:
+        path = find_columnar(args.csv)
+        df = load_dataset(args.csv)
+        print(f"Source: {path or args.csv}")
+        print(f"Shape: {df.shape}")
+        print(df.dtypes.to_string())
+
+
+if __name__ == "__main__":
+    main()
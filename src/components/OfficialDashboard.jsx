@@ -2,10 +2,11 @@ import { useEffect, useMemo, useRef, useState } from 'react'
 import Navbar from './Navbar'
 import './OfficialDashboard.css'
 import { fetchAshaReports, fetchEmergencyReports, deleteAshaReport, deleteEmergencyReport } from '../services/reportService'
-import { startSensors, stopSensors, getSensorStatus, startLiveGraph, stopLiveGraph, getGraphStatus, getSensorData, predictWaterQuality, getGraphImageUrl } from '../services/sensorService'
+import { startSensors, stopSensors, getSensorStatus, startLiveGraph, stopLiveGraph, getGraphStatus, getSensorData, predictWaterQuality, getGraphImageUrl, subscribeSensorStream } from '../services/sensorService'
 import { jsPDF } from 'jspdf'
 
 const DEFAULT_CENTER = { lat: 30.7333, lng: 76.7794 }
+const MAX_SENSOR_READINGS = 50
 
 const loadGoogleMaps = () =>
   new Promise((resolve, reject) => {
@@ -89,11 +90,13 @@ function OfficialDashboard() {
   const [mlPredictionResult, setMlPredictionResult] = useState(null)
   const [mlLoading, setMlLoading] = useState(false)
   const [sensorData, setSensorData] = useState([])
+  const [streamConnected, setStreamConnected] = useState(false)
   const [showSidebar, setShowSidebar] = useState(true)
 
   const mapRef = useRef(null)
   const mapInstance = useRef(null)
   const mapMarkers = useRef([])
+  const sensorsRunningRef = useRef(false)
 
   const OFFICIAL_CREDENTIALS = useMemo(
     () => ({ username: 'user', password: '12345' }),
@@ -127,15 +130,47 @@ function OfficialDashboard() {
     fetchData()
   }, [isAuthenticated])
 
+  // Live sensor readings and status pushed by the backend; polling below is only a fallback
+  useEffect(() => {
+    if (!isAuthenticated) return
+
+    const unsubscribe = subscribeSensorStream({
+      onOpen: () => setStreamConnected(true),
+      onError: () => setStreamConnected(false),
+      onStatus: (status) => {
+        sensorsRunningRef.current = status.running
+        setSensorsRunning(status.running)
+      },
+      onReading: (reading) => {
+        if (!sensorsRunningRef.current) return // Only show readings while sensors run
+        setSensorData(prev => {
+          const lastSeq = prev.length > 0 ? prev[prev.length - 1].seq : null
+          if (lastSeq === reading.seq) return prev
+          // A lower sequence number means the reading store was recreated and numbering restarted
+          if (lastSeq !== null && reading.seq < lastSeq) return [reading]
+          return [...prev, reading].slice(-MAX_SENSOR_READINGS)
+        })
+      }
+    })
+    return () => {
+      if (unsubscribe) unsubscribe()
+      setStreamConnected(false)
+    }
+  }, [isAuthenticated])
+
   // Check sensor and graph status on mount and periodically
   useEffect(() => {
     if (!isAuthenticated) return
 
     const checkStatus = async () => {
       try {
-        const sensorStatus = await getSensorStatus()
+        // Sensor status arrives on the stream while it is connected
+        if (!streamConnected) {
+          const sensorStatus = await getSensorStatus()
+          sensorsRunningRef.current = sensorStatus.running
+          setSensorsRunning(sensorStatus.running)
+        }
         const graphStatus = await getGraphStatus()
-        setSensorsRunning(sensorStatus.running)
         setGraphRunning(graphStatus.running)
       } catch (err) {
         console.error('Error checking status:', err)
@@ -145,14 +180,15 @@ function OfficialDashboard() {
     checkStatus()
     const interval = setInterval(checkStatus, 5000) // Check every 5 seconds
     return () => clearInterval(interval)
-  }, [isAuthenticated])
+  }, [isAuthenticated, streamConnected])
 
-  // Fetch sensor data periodically when sensors are running
+  // Fetch sensor data periodically when sensors are running and the stream is unavailable
   useEffect(() => {
     if (!isAuthenticated || !sensorsRunning) {
       setSensorData([]) // Clear data when sensors stop
       return
     }
+    if (streamConnected) return // Readings arrive on the stream
 
     const fetchSensorData = async () => {
       try {
@@ -168,25 +204,17 @@ function OfficialDashboard() {
     // Then fetch every 5 seconds (matching sensor update interval)
     const interval = setInterval(fetchSensorData, 5000)
     return () => clearInterval(interval)
-  }, [isAuthenticated, sensorsRunning])
+  }, [isAuthenticated, sensorsRunning, streamConnected])
 
-  // Refresh graph image when graph is running
+  // Refresh graph image when graph is running and a newer reading arrived
+  const latestSensorSeq = sensorData.length > 0 ? sensorData[sensorData.length - 1].seq : null
   useEffect(() => {
     if (!isAuthenticated || !graphRunning) {
       setGraphImageUrl('')
       return
     }
-
-    const updateGraphImage = () => {
-      // Update image URL with timestamp to force refresh
-      setGraphImageUrl(getGraphImageUrl())
-    }
-
-    // Update immediately and then every 2 seconds
-    updateGraphImage()
-    const interval = setInterval(updateGraphImage, 2000)
-    return () => clearInterval(interval)
-  }, [isAuthenticated, graphRunning])
+    setGraphImageUrl(getGraphImageUrl(latestSensorSeq))
+  }, [isAuthenticated, graphRunning, latestSensorSeq])
 
   useEffect(() => {
     setReportIndex(0)
@@ -506,9 +534,11 @@ function OfficialDashboard() {
       setError('')
       setSensorData([]) // Clear previous data
       const result = await startSensors()
+      sensorsRunningRef.current = true
       setSensorsRunning(true)
       console.log('Sensors started:', result)
-      // Start fetching data immediately
+      // Readings arrive on the stream; otherwise start fetching data immediately
+      if (streamConnected) return
       const fetchData = async () => {
         try {
           const data = await getSensorData()
@@ -521,6 +551,7 @@ function OfficialDashboard() {
       fetchData()
     } catch (err) {
       setError('Failed to start sensors: ' + err.message)
+      sensorsRunningRef.current = false
       setSensorsRunning(false)
       console.error('Error starting sensors:', err)
     }
@@ -529,6 +560,7 @@ function OfficialDashboard() {
   const handleStopSensors = async () => {
     try {
       await stopSensors()
+      sensorsRunningRef.current = false
       setSensorsRunning(false)
       setError('')
     } catch (err) {
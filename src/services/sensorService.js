@@ -109,9 +109,38 @@ export const getSensorData = async () => {
   }
 }
 
-export const getGraphImageUrl = () => {
-  // Return URL with timestamp to prevent caching
-  return `${API_BASE_URL}/api/graph/image?t=${Date.now()}`
+/**
+ * Subscribe to live sensor readings and sensor status pushed by the backend (Server-Sent Events).
+ * EventSource reconnects on its own and resumes after the last reading it received.
+ * Returns an unsubscribe function, or null if the browser has no EventSource support.
+ */
+export const subscribeSensorStream = ({ onReading, onStatus, onOpen, onError } = {}) => {
+  if (typeof EventSource === 'undefined') return null
+
+  const source = new EventSource(`${API_BASE_URL}/api/sensor-stream`)
+  source.addEventListener('reading', (event) => {
+    try {
+      onReading?.(JSON.parse(event.data))
+    } catch (error) {
+      console.error('Error parsing sensor reading:', error)
+    }
+  })
+  source.addEventListener('status', (event) => {
+    try {
+      onStatus?.(JSON.parse(event.data))
+    } catch (error) {
+      console.error('Error parsing sensor status:', error)
+    }
+  })
+  source.onopen = () => onOpen?.()
+  source.onerror = (error) => onError?.(error)
+
+  return () => source.close()
+}
+
+export const getGraphImageUrl = (version) => {
+  // The URL changes only when a newer reading exists; unchanged frames are revalidated with ETags (304)
+  return version != null ? `${API_BASE_URL}/api/graph/image?v=${version}` : `${API_BASE_URL}/api/graph/image`
 }
 
 export const predictWaterQuality = async (data) => {
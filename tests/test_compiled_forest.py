@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from compiled_forest import CompiledForest, parity_sample, sklearn_predict_proba, verify_parity
+
+FEATURES = ['Temp', 'DO', 'pH', 'Conductivity']
+
+
+def training_data(seed=0, n_rows=600, missing=0.1):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, len(FEATURES))) * [5, 2, 0.8, 300] + [25, 6, 7.5, 800]
+    score = (X[:, 1] < 5).astype(int) + (np.abs(X[:, 2] - 7.5) > 0.7) + (X[:, 3] > 1000)
+    labels = np.array(['Low', 'Medium', 'High', 'High'])[score]
+    X[rng.random(X.shape) < missing] = np.nan
+    return X, labels
+
+
+@pytest.fixture(scope='module')
+def pipeline_artifact():
+    import pandas as pd
+
+    X, labels = training_data()
+    le = LabelEncoder()
+    y = le.fit_transform(labels)
+    preproc = ColumnTransformer([
+        ('num', Pipeline([('impute', SimpleImputer(strategy='median')), ('scale', StandardScaler())]), FEATURES),
+    ])
+    pipeline = Pipeline([
+        ('preproc', preproc),
+        ('clf', RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0)),
+    ])
+    pipeline.fit(pd.DataFrame(X, columns=FEATURES), y)
+    return {'pipeline': pipeline, 'label_encoder': le, 'features': FEATURES}
+
+
+@pytest.fixture(scope='module')
+def raw_artifact():
+    # No imputer: sklearn routes NaNs itself (missing_go_to_left), which the compiled forest must follow
+    X, labels = training_data(seed=1)
+    le = LabelEncoder()
+    y = le.fit_transform(labels)
+    forest = RandomForestClassifier(n_estimators=25, max_depth=10, random_state=0).fit(X, y)
+    return {'model': forest, 'label_encoder': le, 'features': FEATURES}
+
+
+def with_nans(X, seed=3, fraction=0.1):
+    X = X.copy()
+    X[np.random.default_rng(seed).random(X.shape) < fraction] = np.nan
+    return X
+
+
+def test_pipeline_forest_matches_sklearn(pipeline_artifact):
+    compiled = CompiledForest.from_artifact(pipeline_artifact)
+    X = parity_sample(compiled)
+    assert np.isnan(X).any()
+    np.testing.assert_array_equal(compiled.predict_proba(X), sklearn_predict_proba(pipeline_artifact, X))
+    verify_parity(pipeline_artifact, compiled, X)
+
+
+def test_raw_forest_follows_missing_value_routing(raw_artifact):
+    compiled = CompiledForest.from_artifact(raw_artifact)
+    assert compiled.missing_left is not None and compiled.missing_left.any()
+    X = with_nans(parity_sample(compiled))
+    np.testing.assert_array_equal(compiled.predict_proba(X), sklearn_predict_proba(raw_artifact, X))
+    np.testing.assert_array_equal(compiled.predict(X), raw_artifact['model'].predict(X))
+
+
+def test_saved_forest_matches_sklearn(raw_artifact, tmp_path):
+    path = tmp_path / 'model.forest.npz'
+    CompiledForest.from_artifact(raw_artifact).save(path)
+    compiled = CompiledForest.load(path)
+    X = with_nans(parity_sample(compiled))
+    np.testing.assert_array_equal(compiled.predict_proba(X), sklearn_predict_proba(raw_artifact, X))
+
+
+def test_interleaved_children_layout(raw_artifact):
+    # model_bundle.py stores left/right as one interleaved 'children' array
+    compiled = CompiledForest.from_artifact(raw_artifact)
+    arrays = {key: getattr(compiled, key) for key in ('feature', 'threshold', 'missing_left', 'proba', 'roots')}
+    children = np.empty(2 * len(compiled.left), dtype=compiled.left.dtype)
+    children[0::2], children[1::2] = compiled.left, compiled.right
+    arrays.update(children=children, max_depth=np.asarray(compiled.max_depth), classes=compiled.classes_)
+    rebuilt = CompiledForest(arrays, compiled.features, compiled.meta)
+    X = with_nans(parity_sample(compiled))
+    np.testing.assert_array_equal(rebuilt.predict_proba(X), compiled.predict_proba(X))
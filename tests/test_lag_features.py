@@ -0,0 +1,30 @@
+import pandas as pd
+import pytest
+
+from lag_features import FEATURES, build_lagged_dataset, build_lagged_dataset_loop, synthetic_readings
+
+
+@pytest.fixture(scope='module')
+def readings():
+    return synthetic_readings(600, 12, seed=1)
+
+
+@pytest.mark.parametrize('L,H', [(3, 1), (1, 1), (4, 2), (2, 0)])
+@pytest.mark.parametrize('station_col', ['StationCode', None])
+def test_matches_notebook_loop(readings, L, H, station_col):
+    expected = build_lagged_dataset_loop(readings, FEATURES, L, H, station_col)
+    actual = build_lagged_dataset(readings, FEATURES, L, H, station_col)
+    assert len(actual) > 0
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=True)
+
+
+def test_station_shorter_than_window_yields_no_rows():
+    df = synthetic_readings(40, 20, seed=2, missing=0.0)
+    actual = build_lagged_dataset(df, FEATURES, L=30, H=1, station_col='StationCode')
+    assert len(actual) == 0
+    assert len(build_lagged_dataset_loop(df, FEATURES, L=30, H=1, station_col='StationCode')) == 0
+
+
+def test_rejects_invalid_window(readings):
+    with pytest.raises(ValueError):
+        build_lagged_dataset(readings, FEATURES, L=0, H=1)